@@ -2,8 +2,17 @@ __version__ = "2.0.0"
 
 from . import errors
 from .client import Client
+from .async_client import AsyncClient
 from .interpreter import Interpreter
+from .compiled_tree import CompiledTree
+from .flat_tree import FlatTree
+from .codegen import GeneratedTree
 from .time import Time
+from .tree_cache import TreeCache
+from .tree_store import TreeStore
+from .adaptive_chunks import AdaptiveChunksSize
+from .retry import RetryPolicy
+from .metrics import Metrics
 from .formatters import format_property, format_decision_rules
 from .reducer import reduce_decision_rules
 from .tree_utils import (
@@ -16,9 +25,18 @@ from .tree_utils import (
 
 __all__ = [
     "Client",
+    "AsyncClient",
     "errors",
     "Interpreter",
+    "CompiledTree",
+    "FlatTree",
+    "GeneratedTree",
     "Time",
+    "TreeCache",
+    "TreeStore",
+    "AdaptiveChunksSize",
+    "RetryPolicy",
+    "Metrics",
     "format_property",
     "format_decision_rules",
     "reduce_decision_rules",
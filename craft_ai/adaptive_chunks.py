@@ -0,0 +1,127 @@
+import threading
+
+from collections import deque
+
+
+class AdaptiveChunksSize(object):
+    """Number of operations sent in each request of `add_agent_operations`,
+    adapted to each agent, to be given to a client as its
+    `adaptiveChunksSize` configuration.
+
+    The size of the chunks of an agent grows while their requests take less
+    than `target_latency_ms`, shrinks when they take longer, and is halved when
+    a chunk is too large for the API or timed out on its side, the chunk being
+    split in halves sent again. The size then grows by halves of the gap to
+    the size of the smallest failed chunk, never reaching it.
+
+    The same instance can be shared by several clients and threads.
+    """
+
+    def __init__(
+        self,
+        initial_size=200,
+        min_size=1,
+        max_size=10000,
+        target_latency_ms=1000,
+        growth_factor=1.5,
+        max_history=1000,
+    ):
+        """
+        :param int initial_size: Optional. The size of the first chunk of an
+        agent.
+        :default initial_size: 200.
+        :param int min_size: Optional. The minimum size of the chunks.
+        :default min_size: 1.
+        :param int max_size: Optional. The maximum size of the chunks.
+        :default max_size: 10000.
+        :param float target_latency_ms: Optional. The time a request should
+        take, in milliseconds.
+        :default target_latency_ms: 1000.
+        :param float growth_factor: Optional. The factor applied to the size
+        after a request quicker than the target.
+        :default growth_factor: 1.5.
+        :param int max_history: Optional. The number of sent chunks kept in
+        the history.
+        :default max_history: 1000.
+        """
+        self.initial_size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency_ms = target_latency_ms
+        self.growth_factor = growth_factor
+        self.splits = 0
+        # agent id -> current size of its chunks
+        self._sizes = {}
+        # agent id -> size of its smallest failed chunk
+        self._failed_sizes = {}
+        self._history = deque(maxlen=max_history)
+        self._lock = threading.Lock()
+
+    def _bound(self, size):
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def size(self, agent_id):
+        """Get the size of the next chunk of operations of an agent.
+
+        :param str agent_id: the id of the agent.
+
+        :rtype: int.
+        """
+        with self._lock:
+            return self._sizes.get(agent_id, self._bound(self.initial_size))
+
+    def record_success(self, agent_id, size, latency_ms):
+        """Adapts the size of the chunks of an agent to the time taken to add
+        a chunk of `size` operations."""
+        with self._lock:
+            current_size = self._sizes.get(agent_id, self._bound(self.initial_size))
+            if latency_ms > self.target_latency_ms:
+                # Shrinks in proportion to the latency, at most by half
+                new_size = max(
+                    size * self.target_latency_ms / latency_ms, current_size / 2
+                )
+                self._sizes[agent_id] = self._bound(min(current_size, new_size))
+            elif size >= current_size:
+                # Only a full chunk tells that bigger chunks are quick enough
+                new_size = current_size * self.growth_factor
+                failed_size = self._failed_sizes.get(agent_id)
+                if failed_size is not None:
+                    # Approaches the size of the failed chunk by halves
+                    new_size = min(new_size, (current_size + failed_size) // 2)
+                self._sizes[agent_id] = self._bound(max(current_size, new_size))
+            self._history.append(
+                {"agent_id": agent_id, "size": size, "latency_ms": latency_ms}
+            )
+
+    def record_failure(self, agent_id, size):
+        """Halves the size of the chunks of an agent after a chunk of `size`
+        operations was too large."""
+        with self._lock:
+            current_size = self._sizes.get(agent_id, self._bound(self.initial_size))
+            self._sizes[agent_id] = self._bound(min(current_size, size) // 2)
+            self._failed_sizes[agent_id] = min(
+                size, self._failed_sizes.get(agent_id, size)
+            )
+            self.splits += 1
+            self._history.append({"agent_id": agent_id, "size": size, "split": True})
+
+    def history(self):
+        """Get the last chunks sent, from the oldest.
+
+        :return: the "agent_id" and "size" of each chunk, along with the
+        "latency_ms" of its request once added, or "split" when it was too
+        large.
+        :rtype: list of dict.
+        """
+        with self._lock:
+            return list(self._history)
+
+    def stats(self):
+        """Get the current chunk size of each agent.
+
+        :return: the "sizes" of the chunks of each agent, by agent id, and the
+        number of chunks "splits" in halves.
+        :rtype: dict.
+        """
+        with self._lock:
+            return {"sizes": dict(self._sizes), "splits": self.splits}
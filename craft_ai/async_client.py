@@ -0,0 +1,854 @@
+import asyncio
+import datetime
+import json
+import time
+
+from .client import Client, USER_AGENT, current_time_ms
+from .constants import DEFAULT_DECISION_TREE_VERSION
+from .errors import (
+    CraftAiBadRequestError,
+    CraftAiError,
+    CraftAiLongRequestTimeOutError,
+    CraftAiPayloadTooLargeError,
+    CraftAiRequestTimeOutError,
+)
+from .helpers import extract_operations_count_from_message
+from .json_encoders import join_json_array
+from .metrics import count_page, instrumented
+
+try:
+    import aiohttp
+
+    CRAFTAI_ASYNC_ENABLED = True
+except ImportError:
+    aiohttp = None
+    CRAFTAI_ASYNC_ENABLED = False
+
+# Same as aiohttp's default connections limit
+DEFAULT_MAX_CONCURRENT_REQUESTS = 100
+
+
+class _Response(object):
+    """Body and metadata of a response, read once the request is done."""
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self._body = body
+
+    def json(self):
+        return json.loads(self._body)
+
+
+class AsyncClient(Client):
+    """Client class for craft ai's API using asyncio.
+
+    It has the same configuration and methods as `craft_ai.Client`, requests
+    are sent with aiohttp and methods are coroutines, except the `iter_*`
+    methods returning asynchronous iterators. Up to
+    `maxConcurrentRequests` requests, 100 by default, are sent at the same time
+    over pooled connections.
+
+    The client should be closed once done, or used as an asynchronous
+    context manager::
+
+        async with craft_ai.AsyncClient({"token": token}) as client:
+            agent = await client.get_agent(agent_id)
+    """
+
+    def __init__(self, cfg):
+        if aiohttp is None:
+            raise CraftAiError(
+                "AsyncClient can only be used with aiohttp installed,"
+                " install craft-ai with the 'async' extra."
+            )
+        self._session = None
+        self._semaphore = None
+        self._refresh_tasks = set()
+        super(AsyncClient, self).__init__(cfg)
+
+    @Client.config.setter
+    def config(self, cfg):
+        if self._session is not None:
+            raise CraftAiError(
+                "Unable to change the configuration of an AsyncClient once a"
+                " request has been sent."
+            )
+        max_concurrent_requests = cfg.get("maxConcurrentRequests")
+        max_in_flight_chunks = cfg.get("maxInFlightChunks")
+        Client.config.fset(self, cfg)
+        if not isinstance(max_concurrent_requests, int) or max_concurrent_requests < 1:
+            self._config["maxConcurrentRequests"] = DEFAULT_MAX_CONCURRENT_REQUESTS
+        if not isinstance(max_in_flight_chunks, int) or max_in_flight_chunks < 1:
+            # The chunks of operations of an agent are sent one after the other
+            self._config["maxInFlightChunks"] = 1
+
+    # Requests are sent with aiohttp, no requests session is needed
+    def _create_requests_session(self):
+        return None
+
+    def _configure_requests_session(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Closes the connections of the client, stopping the refreshes of
+        stored decision trees."""
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._semaphore = None
+
+    ####################
+    # Requests methods #
+    ####################
+
+    def _get_session(self):
+        # The session is created in the event loop running the requests
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.config["maxConcurrentRequests"],
+                force_close=not self.config["keepAlive"],
+            )
+            connect_timeout, read_timeout = self._timeout()
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=None, sock_connect=connect_timeout, sock_read=read_timeout
+                ),
+                headers={
+                    "Authorization": "Bearer " + self.config.get("token"),
+                    "User-Agent": USER_AGENT,
+                },
+            )
+            self._semaphore = asyncio.Semaphore(self.config["maxConcurrentRequests"])
+        return self._session
+
+    async def _request(self, method, url, params=None, data=None, headers=None):
+        """Sends a request and reads its response.
+
+        :return: the response, with the same `status_code`, `headers` and
+        `json()` as a response from requests.
+        """
+        session = self._get_session()
+        if params is not None:
+            # As with requests, parameters set to None are not sent
+            params = {
+                key: str(value) for key, value in params.items() if value is not None
+            }
+        headers = dict(headers or {})
+        if data is not None:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+
+        retry_policy = self._config["retryPolicy"]
+        start = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                async with self._semaphore:
+                    async with session.request(
+                        method,
+                        url,
+                        params=params,
+                        data=data,
+                        headers=headers,
+                        proxy=self.config.get("proxy"),
+                    ) as resp:
+                        body = await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if not retry_policy.should_retry_error(method, attempt):
+                    self._record_request(method, url, data, start, attempt, error=err)
+                    raise
+                await asyncio.sleep(retry_policy.backoff(attempt))
+            else:
+                if not retry_policy.should_retry_status(resp.status, attempt):
+                    break
+                await asyncio.sleep(
+                    retry_policy.backoff(attempt, resp.headers.get("Retry-After"))
+                )
+            attempt += 1
+        self._record_request(method, url, data, start, attempt, resp.status, len(body))
+        compressed = "Content-Encoding" in resp.headers
+        self._compression_stats.record_response(
+            len(body),
+            # The size of the body as received is only known from its length
+            int(resp.headers.get("Content-Length", len(body)))
+            if compressed
+            else len(body),
+            compressed,
+        )
+        return _Response(resp.status, resp.headers, body)
+
+    async def _send(self, method, url, **kwargs):
+        return self._decode_response(await self._request(method, url, **kwargs))
+
+    def _dump(self, payload, entity_type):
+        try:
+            return self._encode_json(payload)
+        except TypeError as err:
+            raise CraftAiBadRequestError(
+                "Invalid configuration or {} id given. {}".format(
+                    entity_type, err.__str__()
+                )
+            )
+
+    #################
+    # Agent methods #
+    #################
+
+    @instrumented
+    async def create_agent(self, configuration, agent_id=""):
+        """Create an agent, see `craft_ai.Client.create_agent`."""
+        payload = {"configuration": configuration}
+
+        if agent_id != "":
+            # Raises an error when agent_id is invalid
+            self._check_entity_id(agent_id)
+
+            payload["id"] = agent_id
+
+        return await self._send(
+            "POST",
+            "{}/agents".format(self._base_url),
+            data=self._dump(payload, "agent"),
+        )
+
+    @instrumented
+    async def create_agents_bulk(self, payload):
+        """Create a group of agents, see `craft_ai.Client.create_agents_bulk`."""
+        # Check all ids, raise an error if all ids are invalid
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_agents,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        # Send the json of the agents with valid id
+        valid_agents = await self._create_and_send_json_bulk(
+            join_json_array(valid_jsons),
+            "{}/bulk/agents".format(self._base_url),
+            "POST",
+        )
+
+        if invalid_indices == []:
+            return valid_agents
+
+        # Put the valid and invalid agents in their original index
+        return self._recreate_list_with_indices(
+            valid_indices, valid_agents, invalid_indices, invalid_agents
+        )
+
+    @instrumented
+    async def get_agent(self, agent_id):
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        return await self._send("GET", "{}/agents/{}".format(self._base_url, agent_id))
+
+    @instrumented
+    async def list_agents(self):
+        agents = await self._send("GET", "{}/agents".format(self._base_url))
+
+        return agents["agentsList"]
+
+    @instrumented
+    async def delete_agent(self, agent_id):
+        """Delete an agent, see `craft_ai.Client.delete_agent`."""
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        try:
+            return await self._send(
+                "DELETE", "{}/agents/{}".format(self._base_url, agent_id)
+            )
+        finally:
+            self._invalidate_decision_trees(agent_id)
+
+    @instrumented
+    async def delete_agents_bulk(self, payload):
+        """Delete a group of agents, see `craft_ai.Client.delete_agents_bulk`."""
+        # Check all ids, raise an error if all ids are invalid
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_agents,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        # Send the json of the agents with valid id
+        valid_agents = await self._create_and_send_json_bulk(
+            join_json_array(valid_jsons),
+            "{}/bulk/agents".format(self._base_url),
+            "DELETE",
+        )
+        for i in valid_indices:
+            self._invalidate_decision_trees(payload[i]["id"])
+
+        if invalid_indices == []:
+            return valid_agents
+
+        # Put the valid and invalid agents in their original index
+        return self._recreate_list_with_indices(
+            valid_indices, valid_agents, invalid_indices, invalid_agents
+        )
+
+    @instrumented
+    async def get_shared_agent_inspector_url(self, agent_id, timestamp=None):
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        url = await self._send(
+            "GET", "{}/agents/{}/shared".format(self._base_url, agent_id)
+        )
+
+        if timestamp is not None:
+            return "{}?t={}".format(url["shortUrl"], str(timestamp))
+
+        return url["shortUrl"]
+
+    @instrumented
+    async def delete_shared_agent_inspector_url(self, agent_id):
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        return await self._send(
+            "DELETE", "{}/agents/{}/shared".format(self._base_url, agent_id)
+        )
+
+    ####################
+    # Generator method #
+    ####################
+
+    @instrumented
+    async def create_generator(self, configuration, generator_id=""):
+        """Create a generator, see `craft_ai.Client.create_generator`."""
+        payload = {"configuration": configuration}
+
+        if generator_id != "":
+            # Raises an error when generator_id is invalid
+            self._check_entity_id(generator_id)
+
+            payload["id"] = generator_id
+
+        return await self._send(
+            "POST",
+            "{}/generators".format(self._base_url),
+            data=self._dump(payload, "generator"),
+        )
+
+    @instrumented
+    async def get_generator(self, generator_id):
+        # Raises an error when generator_id is invalid
+        self._check_entity_id(generator_id)
+
+        return await self._send(
+            "GET", "{}/generators/{}".format(self._base_url, generator_id)
+        )
+
+    @instrumented
+    async def list_generators(self):
+        generators = await self._send("GET", "{}/generators".format(self._base_url))
+
+        return generators["generatorsList"]
+
+    @instrumented
+    async def delete_generator(self, generator_id):
+        """Delete a generator, see `craft_ai.Client.delete_generator`."""
+        # Raises an error when generator_id is invalid
+        self._check_entity_id(generator_id)
+
+        try:
+            return await self._send(
+                "DELETE", "{}/generators/{}".format(self._base_url, generator_id)
+            )
+        finally:
+            self._invalidate_decision_trees(generator_id, "generator")
+
+    @instrumented
+    async def get_generator_decision_tree(
+        self, generator_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
+    ):
+        """Get generator decision tree, see
+        `craft_ai.Client.get_generator_decision_tree`."""
+        # Raises an error when generator_id is invalid
+        self._check_entity_id(generator_id)
+
+        return await self._through_decision_tree_cache(
+            lambda: self._through_decision_tree_store(
+                lambda: self._get_decision_tree(
+                    "{}/generators/{}/tree".format(self._base_url, generator_id),
+                    timestamp,
+                    version,
+                ),
+                generator_id,
+                timestamp,
+                version,
+                "generator",
+            ),
+            generator_id,
+            timestamp,
+            version,
+            "generator",
+        )
+
+    @instrumented
+    async def get_generator_operations(self, generator_id, start=None, end=None):
+        return [
+            operation
+            async for operation in self.iter_generator_operations(
+                generator_id, start, end
+            )
+        ]
+
+    ###################
+    # Context methods #
+    ###################
+
+    @instrumented
+    async def add_agent_operations(self, agent_id, operations):
+        """Add operations to an agent, see `craft_ai.Client.add_agent_operations`.
+
+        Up to `maxInFlightChunks` chunks of operations, 1 by default, are sent
+        at the same time.
+        """
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        added_operations_count = sum(
+            await self._gather_in_order(
+                lambda chunk: self._add_operations_chunk(agent_id, chunk),
+                self._chunk_operations(operations, agent_id),
+                self.config["maxInFlightChunks"],
+            )
+        )
+
+        return {
+            "message": f'Successfully added {added_operations_count} operation(s) to \
+                the agent "{self.config["owner"]}/{self.config["project"]}/{agent_id}" context.',
+            "added_operations_count": added_operations_count,
+        }
+
+    async def _add_operations_chunk(self, agent_id, operations):
+        """Sends a chunk of operations, see
+        `craft_ai.Client._add_operations_chunk`."""
+        adaptive_chunks_size = self._config["adaptiveChunksSize"]
+        json_pl = self._dump_operations_chunk(operations)
+        start = time.perf_counter()
+        try:
+            added_operations_count = await self._post_agent_operations(
+                agent_id, json_pl
+            )
+        except (CraftAiPayloadTooLargeError, CraftAiRequestTimeOutError):
+            if adaptive_chunks_size is None or len(operations) < 2:
+                raise
+            adaptive_chunks_size.record_failure(agent_id, len(operations))
+            half = len(operations) // 2
+            return await self._add_operations_chunk(
+                agent_id, operations[:half]
+            ) + await self._add_operations_chunk(agent_id, operations[half:])
+        if adaptive_chunks_size is not None:
+            adaptive_chunks_size.record_success(
+                agent_id, len(operations), (time.perf_counter() - start) * 1000
+            )
+        return added_operations_count
+
+    async def _post_agent_operations(self, agent_id, json_pl):
+        body, headers = self._upload_body(json_pl)
+        decoded_response = await self._send(
+            "POST",
+            "{}/agents/{}/context".format(self._base_url, agent_id),
+            data=body,
+            headers=headers,
+        )
+        self._invalidate_decision_trees(agent_id, latest_only=True)
+        return extract_operations_count_from_message(decoded_response["message"])
+
+    @instrumented
+    async def add_agents_operations_bulk(self, payload):
+        """Add operations to a group of agents, see
+        `craft_ai.Client.add_agents_operations_bulk`.
+
+        Chunks of agents are sent concurrently.
+        """
+        # Check all ids, raise an error if all ids are invalid. The operations
+        # are checked while serializing each chunk.
+        valid_indices, _, _, _ = self._check_entity_id_bulk(
+            payload, check_serializable=False
+        )
+        valid_payload = [payload[i] for i in valid_indices]
+
+        responses = []
+        for chunk_responses in await self._gather_in_order(
+            self._add_agents_operations_chunk,
+            self._chunk_agents_operations(valid_payload),
+        ):
+            responses += chunk_responses
+
+        if responses == []:
+            raise CraftAiBadRequestError("Invalid or empty set of operations given")
+
+        return responses
+
+    async def _add_agents_operations_chunk(self, chunk):
+        start = time.perf_counter()
+        if len(chunk) > 1:
+            try:
+                json_pl = self._dump_agents_operations(chunk)
+            except TypeError as err:
+                raise CraftAiBadRequestError(
+                    "Error while dumping the payload into json"
+                    "format when converting it for the bulk request. {}".format(
+                        err.__str__()
+                    )
+                )
+            body, headers = self._upload_body(json_pl)
+            decoded_response = await self._send(
+                "POST",
+                "{}/bulk/context".format(self._base_url),
+                data=body,
+                headers=headers,
+            )
+            for agent in chunk:
+                self._invalidate_decision_trees(agent["id"], latest_only=True)
+            responses = [
+                {
+                    **r,
+                    "added_operations_count": extract_operations_count_from_message(
+                        r["message"]
+                    ),
+                }
+                for r in decoded_response
+            ]
+        elif chunk:
+            add_agent_operations_response = await self.add_agent_operations(
+                chunk[0]["id"], chunk[0]["operations"]
+            )
+            responses = [
+                {"id": chunk[0]["id"], "status": 201, **add_agent_operations_response}
+            ]
+        else:
+            return []
+
+        chunk_latency_ms = (time.perf_counter() - start) * 1000
+        for response in responses:
+            response["chunk_latency_ms"] = chunk_latency_ms
+        return responses
+
+    @instrumented
+    async def get_agent_operations(self, agent_id, start=None, end=None):
+        return [
+            operation
+            async for operation in self.iter_agent_operations(agent_id, start, end)
+        ]
+
+    @instrumented
+    async def get_agent_states(self, agent_id, start=None, end=None):
+        return [state async for state in self.iter_agent_states(agent_id, start, end)]
+
+    @instrumented
+    async def get_agent_state(self, agent_id, timestamp):
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        return await self._send(
+            "GET",
+            "{}/agents/{}/context/state?t={}".format(
+                self._base_url, agent_id, timestamp
+            ),
+        )
+
+    def _iter_pages(self, url, params, by_page=False, prefetch_pages=0):
+        pages = self._get_pages(url, params, prefetch_pages)
+        return pages if by_page else self._chain_pages(pages)
+
+    @staticmethod
+    async def _chain_pages(pages):
+        try:
+            async for page in pages:
+                for item in page:
+                    yield item
+        finally:
+            await pages.aclose()
+
+    async def _get_pages(self, url, params, prefetch_pages=0):
+        if prefetch_pages > 0:
+            responses = self._prefetch_pages(url, params, prefetch_pages)
+        else:
+            responses = self._request_pages(url, params)
+        async for resp in responses:
+            page = self._decode_response(resp)
+            count_page()
+            yield page
+
+    async def _request_pages(self, url, params):
+        while url is not None:
+            resp = await self._request("GET", url, params=params)
+            yield resp
+            url = resp.headers.get("x-craft-ai-next-page-url")
+            params = None
+
+    async def _prefetch_pages(self, url, params, prefetch_pages):
+        """Yields the responses of the pages, a task requesting up to
+        `prefetch_pages` pages ahead of the yielded one."""
+        buffer = asyncio.Queue(prefetch_pages)
+
+        async def request_pages():
+            try:
+                async for resp in self._request_pages(url, params):
+                    await buffer.put((resp, None))
+                await buffer.put((None, None))
+            except Exception as err:  # pylint: disable=broad-except
+                await buffer.put((None, err))
+
+        task = asyncio.ensure_future(request_pages())
+        try:
+            while True:
+                resp, err = await buffer.get()
+                if err is not None:
+                    raise err
+                if resp is None:
+                    return
+                yield resp
+        finally:
+            task.cancel()
+
+    #########################
+    # Decision tree methods #
+    #########################
+
+    @instrumented
+    async def get_agent_decision_tree(
+        self, agent_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
+    ):
+        """Get decision tree, see `craft_ai.Client.get_agent_decision_tree`."""
+        # Raises an error when agent_id is invalid
+        self._check_entity_id(agent_id)
+
+        return await self._through_decision_tree_cache(
+            lambda: self._through_decision_tree_store(
+                lambda: self._get_decision_tree(
+                    "{}/agents/{}/decision/tree".format(self._base_url, agent_id),
+                    timestamp,
+                    version,
+                ),
+                agent_id,
+                timestamp,
+                version,
+            ),
+            agent_id,
+            timestamp,
+            version,
+        )
+
+    async def _through_decision_tree_cache(
+        self, get_decision_tree, entity_id, timestamp, version, entity_type="agent"
+    ):
+        cache = self._config["decisionTreeCache"]
+        if cache is None:
+            return await get_decision_tree()
+
+        decision_tree = cache.get(entity_id, timestamp, version, entity_type)
+        if decision_tree is None:
+            decision_tree = await get_decision_tree()
+            cache.set(decision_tree, entity_id, timestamp, version, entity_type)
+        return decision_tree
+
+    async def _through_decision_tree_store(
+        self, get_decision_tree, entity_id, timestamp, version, entity_type="agent"
+    ):
+        store = self._config["decisionTreeStore"]
+        if store is None or timestamp is not None:
+            return await get_decision_tree()
+
+        decision_tree = store.get(entity_id, version, entity_type)
+        if decision_tree is None:
+            decision_tree = await get_decision_tree()
+            store.set(decision_tree, entity_id, version, entity_type)
+        elif store.start_refresh(entity_id, version, entity_type):
+            task = asyncio.ensure_future(
+                self._refresh_stored_decision_tree(
+                    get_decision_tree, entity_id, version, entity_type
+                )
+            )
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        return decision_tree
+
+    async def _refresh_stored_decision_tree(
+        self, get_decision_tree, entity_id, version, entity_type
+    ):
+        store = self._config["decisionTreeStore"]
+        succeeded = False
+        try:
+            decision_tree = await get_decision_tree()
+            store.set(decision_tree, entity_id, version, entity_type)
+            succeeded = True
+        except Exception:
+            # The stored tree is refreshed again the next time it is used
+            return
+        finally:
+            store.end_refresh(entity_id, version, entity_type, succeeded)
+        self._cache_refreshed_decision_tree(
+            decision_tree, entity_id, version, entity_type
+        )
+
+    async def _get_decision_tree(self, url, timestamp, version):
+        if isinstance(version, int):
+            version = str(version)
+
+        # Convert datetime to timestamp
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = time.mktime(timestamp.timetuple())
+
+        # If we give no timestamp the default behaviour is to give
+        # the tree from the latest timestamp
+        if timestamp is None:
+            req_url = "{}?".format(url)
+        else:
+            req_url = "{}?t={}".format(url, timestamp)
+
+        return await self._retry_long_request(
+            lambda: self._send(
+                "GET", req_url, headers={"x-craft-ai-tree-version": version}
+            )
+        )
+
+    @instrumented
+    async def get_agents_decision_trees_bulk(
+        self, payload, version=DEFAULT_DECISION_TREE_VERSION
+    ):
+        """Get a group of decision trees, see
+        `craft_ai.Client.get_agents_decision_trees_bulk`.
+
+        The batches of trees are all requested at the same time."""
+        if isinstance(version, int):
+            version = str(version)
+
+        # Check all ids, raise an error if all ids are invalid
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_dts,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        valid_dts = []
+        for batch_dts in await self._gather_in_order(
+            lambda batch: self._get_decision_trees_batch(batch, version),
+            self._batch_decision_trees_requests(valid_jsons),
+        ):
+            valid_dts += batch_dts
+
+        if invalid_indices == []:
+            return valid_dts
+
+        # Put the valid and invalid decision trees in their original index
+        return self._recreate_list_with_indices(
+            valid_indices, valid_dts, invalid_indices, invalid_dts
+        )
+
+    async def _get_decision_trees_batch(self, jsons, version):
+        """Gets the trees of a batch of agents, see
+        `craft_ai.Client._get_decision_trees_batch`."""
+        decision_trees = [None] * len(jsons)
+        pending = list(range(len(jsons)))
+        start = current_time_ms()
+        attempt = 1
+        while True:
+            try:
+                response = await self._create_and_send_json_bulk(
+                    join_json_array([jsons[i] for i in pending]),
+                    "{}/bulk/decision_tree".format(self._base_url),
+                    "POST",
+                    headers={"x-craft-ai-tree-version": version},
+                )
+            except CraftAiLongRequestTimeOutError as err:
+                pending_error = err
+            else:
+                pending = self._merge_decision_trees(decision_trees, pending, response)
+                if not pending:
+                    return decision_trees
+                pending_error = decision_trees[pending[0]]["error"]
+            delay = self._pending_decision_trees_delay(
+                decision_trees, pending, start, attempt, pending_error
+            )
+            if delay is None:
+                return decision_trees
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _retry_long_request(self, send):
+        """Sends again a request while it is timing out on craft ai's side, up
+        to `decisionTreeRetrievalTimeout` milliseconds."""
+        if self._config["decisionTreeRetrievalTimeout"] is False:
+            # Don't retry
+            return await send()
+
+        start = current_time_ms()
+        attempt = 1
+        while True:
+            try:
+                return await send()
+            except CraftAiLongRequestTimeOutError as err:
+                delay = self._long_request_delay(start, attempt, err)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    ###########
+    # Helpers #
+    ###########
+
+    @staticmethod
+    async def _gather_in_order(function, iterable, max_in_flight=None):
+        """Awaits `function(item)` for each item of `iterable`, returns the
+        results in order.
+
+        An item is processed only once the one `max_in_flight` items before it
+        is done, all of the items are processed at the same time by default.
+
+        :raises Exception: the error of the first call that failed, no item is
+        processed once one of the calls failed.
+        """
+        results = []
+        in_flight = []
+        try:
+            for item in iterable:
+                if max_in_flight and len(in_flight) >= max_in_flight:
+                    results.append(await in_flight.pop(0))
+                # Stop as soon as one of the calls failed
+                for task in in_flight:
+                    if task.done() and task.exception() is not None:
+                        task.result()
+                in_flight.append(asyncio.ensure_future(function(item)))
+            while in_flight:
+                results.append(await in_flight.pop(0))
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            # Wait for the cancelled tasks to end
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+        return results
+
+    async def _create_and_send_json_bulk(
+        self, json_pl, req_url, request_type="POST", headers=None
+    ):
+        """Do a request to the URL with a json payload and process the response,
+        see `craft_ai.Client._create_and_send_json_bulk`."""
+        if request_type not in ["POST", "DELETE"]:
+            raise CraftAiBadRequestError(
+                "Request for the bulk API should be either a POST or DELETE" "request"
+            )
+
+        agents = await self._send(request_type, req_url, data=json_pl, headers=headers)
+        return self._decode_response_bulk(agents)
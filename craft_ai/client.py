@@ -2,16 +2,22 @@
 # cf. https://stackoverflow.com/a/28854227
 from __future__ import absolute_import
 
-import json
+import contextvars
+import queue
+import threading
 import time
 import datetime
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from platform import python_implementation, python_version
 from urllib.parse import urlparse
 
 import requests
 
 from . import __version__ as pkg_version
+from .adaptive_chunks import AdaptiveChunksSize
+from .compression import DEFAULT_COMPRESSION_MIN_BYTES, CompressionStats, gzip_body
 from .constants import AGENT_ID_PATTERN, DEFAULT_DECISION_TREE_VERSION
 from .errors import (
     CraftAiCredentialsError,
@@ -21,10 +27,18 @@ from .errors import (
     CraftAiInternalError,
     CraftAiLongRequestTimeOutError,
     CraftAiNetworkError,
+    CraftAiPayloadTooLargeError,
+    CraftAiRequestTimeOutError,
 )
 from .helpers import extract_operations_count_from_message
 from .interpreter import Interpreter
+from .json_encoders import JsonEncoder, join_json_array
 from .jwt_decode import jwt_decode
+from .metrics import Metrics, count_page, endpoint_of, instrumented
+from .retry import RetryPolicy
+from .tree_cache import TreeCache
+from .transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, TransportAdapter
+from .tree_store import TreeStore
 
 USER_AGENT = "craft-ai-client-python/{} [{} {}]".format(
     pkg_version, python_implementation(), python_version()
@@ -43,14 +57,24 @@ def current_time_ms():
 
 
 class Client(object):
-    """Client class for craft ai's API"""
+    """Client class for craft ai's API
+
+    A client can be shared by several threads, its requests only differing by
+    their own headers and its connections being pooled. Up to `poolMaxsize`
+    connections to craft ai are kept open, 10 by default or
+    `maxConcurrentRequests` when it is greater, threads waiting for a
+    connection opening a new one that isn't kept, and `poolConnections` pools
+    of connections are kept for different hosts. The configuration of a
+    client must not be changed while other threads use it.
+    """
 
     def __init__(self, cfg):
         self._base_url = ""
         self._headers = {}
         self._config = {}
+        self._compression_stats = CompressionStats()
         # Requests session: connection pooling and base configuration for all requests
-        self._requests_session = requests.Session()
+        self._requests_session = self._create_requests_session()
 
         try:
             self.config = cfg
@@ -89,10 +113,63 @@ class Client(object):
             )
         if not isinstance(cfg.get("operationsChunksSize"), int):
             cfg["operationsChunksSize"] = 200
+        if (
+            not isinstance(cfg.get("decisionTreesBulkSize"), int)
+            or cfg["decisionTreesBulkSize"] < 1
+        ):
+            cfg["decisionTreesBulkSize"] = 100
+        if not isinstance(cfg.get("adaptiveChunksSize"), AdaptiveChunksSize):
+            cfg["adaptiveChunksSize"] = None
+        if "retryPolicy" in cfg and cfg["retryPolicy"] is None:
+            # The backoff still spaces out the requests of the trees being computed
+            cfg["retryPolicy"] = RetryPolicy(max_attempts=1)
+        elif not isinstance(cfg.get("retryPolicy"), RetryPolicy):
+            cfg["retryPolicy"] = RetryPolicy()
+        if not isinstance(cfg.get("metrics"), Metrics):
+            cfg["metrics"] = None
+        if (
+            not isinstance(cfg.get("maxConcurrentRequests"), int)
+            or cfg["maxConcurrentRequests"] < 1
+        ):
+            cfg["maxConcurrentRequests"] = 1
+        if (
+            not isinstance(cfg.get("maxInFlightChunks"), int)
+            or cfg["maxInFlightChunks"] < 1
+        ):
+            cfg["maxInFlightChunks"] = cfg["maxConcurrentRequests"]
+        if not isinstance(cfg.get("decisionTreeCache"), TreeCache):
+            cfg["decisionTreeCache"] = None
+        if not isinstance(cfg.get("decisionTreeStore"), TreeStore):
+            cfg["decisionTreeStore"] = None
+        if not callable(getattr(cfg.get("jsonEncoder"), "dumps", None)):
+            cfg["jsonEncoder"] = JsonEncoder()
+        if not isinstance(cfg.get("compressRequests"), bool):
+            cfg["compressRequests"] = False
+        if not isinstance(cfg.get("compressRequestsMinBytes"), int):
+            cfg["compressRequestsMinBytes"] = DEFAULT_COMPRESSION_MIN_BYTES
         if cfg.get("decisionTreeRetrievalTimeout") is not False and not isinstance(
             cfg.get("decisionTreeRetrievalTimeout"), int
         ):
             cfg["decisionTreeRetrievalTimeout"] = 1000 * 60 * 5  # 5 minutes
+        if cfg.get("connectTimeout") is not False and not isinstance(
+            cfg.get("connectTimeout"), (int, float)
+        ):
+            cfg["connectTimeout"] = DEFAULT_CONNECT_TIMEOUT
+        if cfg.get("readTimeout") is not False and not isinstance(
+            cfg.get("readTimeout"), (int, float)
+        ):
+            cfg["readTimeout"] = DEFAULT_READ_TIMEOUT
+        if not isinstance(cfg.get("keepAlive"), bool):
+            cfg["keepAlive"] = True
+        if not isinstance(cfg.get("tcpKeepAliveIdle"), int):
+            cfg["tcpKeepAliveIdle"] = None
+        if (
+            not isinstance(cfg.get("transportMaxRetries"), int)
+            or cfg["transportMaxRetries"] < 0
+        ):
+            cfg["transportMaxRetries"] = 0
+        if not callable(cfg.get("transportAdapter")):
+            cfg["transportAdapter"] = TransportAdapter
         if not isinstance(cfg.get("url"), str):
             cfg["url"] = "https://beta.craft.ai"
         if cfg.get("url").endswith("/"):
@@ -116,20 +193,57 @@ class Client(object):
                     """ without a scheme. Cannot configure"""
                     """ the proxy."""
                 )
-            proxies = {}
-            proxies[scheme] = cfg.get("proxy")
-            self._requests_session.proxies = proxies
+        if (
+            not isinstance(cfg.get("poolConnections"), int)
+            or cfg["poolConnections"] < 1
+        ):
+            cfg["poolConnections"] = requests.adapters.DEFAULT_POOLSIZE
+        if not isinstance(cfg.get("poolMaxsize"), int) or cfg["poolMaxsize"] < 1:
+            # Keep a connection for each of the concurrent requests
+            cfg["poolMaxsize"] = max(
+                requests.adapters.DEFAULT_POOLSIZE, cfg["maxConcurrentRequests"]
+            )
+        self._configure_requests_session()
+
+    def _create_requests_session(self):
+        session = requests.Session()
+        session.hooks["response"].append(self._record_response)
+        return session
+
+    def _configure_requests_session(self):
+        """Applies the configuration of the client to its requests session."""
+        cfg = self._config
+        if cfg.get("proxy"):
+            scheme = urlparse(cfg["url"]).scheme
+            self._requests_session.proxies = {scheme: cfg["proxy"]}
+        adapter_kwargs = {
+            "pool_connections": cfg["poolConnections"],
+            "pool_maxsize": cfg["poolMaxsize"],
+            "max_retries": cfg["transportMaxRetries"],
+        }
+        if cfg["tcpKeepAliveIdle"] is not None:
+            adapter_kwargs["tcp_keep_alive_idle"] = cfg["tcpKeepAliveIdle"]
+        adapter = cfg["transportAdapter"](**adapter_kwargs)
+        # Closes the connections pooled with the previous configuration
+        for previous_adapter in self._requests_session.adapters.values():
+            previous_adapter.close()
+        self._requests_session.mount("https://", adapter)
+        self._requests_session.mount("http://", adapter)
         # Headers have to be set here to avoid multiple definitions
         # of the 'Authorization' header if config is modified
         base_headers = {}
         base_headers["Authorization"] = "Bearer " + self.config.get("token")
         base_headers["User-Agent"] = USER_AGENT
+        if not cfg["keepAlive"]:
+            # Closes the connection after each response instead of pooling it
+            base_headers["Connection"] = "close"
         self._requests_session.headers = base_headers
 
     #################
     # Agent methods #
     #################
 
+    @instrumented
     def create_agent(self, configuration, agent_id=""):
         """Create an agent.
 
@@ -159,19 +273,20 @@ class Client(object):
             payload["id"] = agent_id
 
         try:
-            json_pl = json.dumps(payload)
+            json_pl = self._encode_json(payload)
         except TypeError as err:
             raise CraftAiBadRequestError(
                 "Invalid configuration or agent id given. {}".format(err.__str__())
             )
 
         req_url = "{}/agents".format(self._base_url)
-        resp = self._requests_session.post(req_url, headers=ct_header, data=json_pl)
+        resp = self._request("POST", req_url, headers=ct_header, data=json_pl)
 
         agent = self._decode_response(resp)
 
         return agent
 
+    @instrumented
     def create_agents_bulk(self, payload):
         """Create a group of agents.
 
@@ -188,13 +303,16 @@ class Client(object):
         configurations are invalid.
         """
         # Check all ids, raise an error if all ids are invalid
-        valid_indices, invalid_indices, invalid_agents = self._check_entity_id_bulk(
-            payload
-        )
-
-        # Create the json file with the agents with valid id and send it
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_agents,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        # Send the json of the agents with valid id
         valid_agents = self._create_and_send_json_bulk(
-            [payload[i] for i in valid_indices],
+            join_json_array(valid_jsons),
             "{}/bulk/agents".format(self._base_url),
             "POST",
         )
@@ -207,26 +325,29 @@ class Client(object):
             valid_indices, valid_agents, invalid_indices, invalid_agents
         )
 
+    @instrumented
     def get_agent(self, agent_id):
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
         req_url = "{}/agents/{}".format(self._base_url, agent_id)
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         agent = self._decode_response(resp)
 
         return agent
 
+    @instrumented
     def list_agents(self):
 
         req_url = "{}/agents".format(self._base_url)
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         agents = self._decode_response(resp)
 
         return agents["agentsList"]
 
+    @instrumented
     def delete_agent(self, agent_id):
         """Delete an agent.
 
@@ -241,12 +362,14 @@ class Client(object):
         self._check_entity_id(agent_id)
 
         req_url = "{}/agents/{}".format(self._base_url, agent_id)
-        resp = self._requests_session.delete(req_url)
+        resp = self._request("DELETE", req_url)
+        self._invalidate_decision_trees(agent_id)
 
         decoded_resp = self._decode_response(resp)
 
         return decoded_resp
 
+    @instrumented
     def delete_agents_bulk(self, payload):
         """Delete a group of agents
 
@@ -262,16 +385,21 @@ class Client(object):
         :raises CraftAiBadRequestError: If all of the ids are invalid.
         """
         # Check all ids, raise an error if all ids are invalid
-        valid_indices, invalid_indices, invalid_agents = self._check_entity_id_bulk(
-            payload
-        )
-
-        # Create the json file with the agents with valid id and send it
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_agents,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        # Send the json of the agents with valid id
         valid_agents = self._create_and_send_json_bulk(
-            [payload[i] for i in valid_indices],
+            join_json_array(valid_jsons),
             "{}/bulk/agents".format(self._base_url),
             "DELETE",
         )
+        for i in valid_indices:
+            self._invalidate_decision_trees(payload[i]["id"])
 
         if invalid_indices == []:
             return valid_agents
@@ -281,12 +409,13 @@ class Client(object):
             valid_indices, valid_agents, invalid_indices, invalid_agents
         )
 
+    @instrumented
     def get_shared_agent_inspector_url(self, agent_id, timestamp=None):
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
         req_url = "{}/agents/{}/shared".format(self._base_url, agent_id)
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         url = self._decode_response(resp)
 
@@ -295,12 +424,13 @@ class Client(object):
 
         return url["shortUrl"]
 
+    @instrumented
     def delete_shared_agent_inspector_url(self, agent_id):
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
         req_url = "{}/agents/{}/shared".format(self._base_url, agent_id)
-        resp = self._requests_session.delete(req_url)
+        resp = self._request("DELETE", req_url)
 
         decoded_resp = self._decode_response(resp)
 
@@ -310,6 +440,7 @@ class Client(object):
     # Generator method #
     ####################
 
+    @instrumented
     def create_generator(self, configuration, generator_id=""):
         """ Create a generator.
 
@@ -335,39 +466,42 @@ class Client(object):
             payload["id"] = generator_id
 
         try:
-            json_pl = json.dumps(payload)
+            json_pl = self._encode_json(payload)
         except TypeError as err:
             raise CraftAiBadRequestError(
                 "Invalid configuration or generator id given. {}".format(err.__str__())
             )
 
         req_url = "{}/generators".format(self._base_url)
-        resp = self._requests_session.post(req_url, headers=ct_header, data=json_pl)
+        resp = self._request("POST", req_url, headers=ct_header, data=json_pl)
 
         generator = self._decode_response(resp)
 
         return generator
 
+    @instrumented
     def get_generator(self, generator_id):
         # Raises an error when generator_id is invalid
         self._check_entity_id(generator_id)
 
         req_url = "{}/generators/{}".format(self._base_url, generator_id)
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         generator = self._decode_response(resp)
 
         return generator
 
+    @instrumented
     def list_generators(self):
 
         req_url = "{}/generators".format(self._base_url)
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         generators = self._decode_response(resp)
 
         return generators["generatorsList"]
 
+    @instrumented
     def delete_generator(self, generator_id):
         """ Delete a generator
 
@@ -380,7 +514,8 @@ class Client(object):
         self._check_entity_id(generator_id)
 
         req_url = "{}/generators/{}".format(self._base_url, generator_id)
-        resp = self._requests_session.delete(req_url)
+        resp = self._request("DELETE", req_url)
+        self._invalidate_decision_trees(generator_id, "generator")
 
         decoded_resp = self._decode_response(resp)
 
@@ -405,8 +540,6 @@ class Client(object):
         :return: decision tree.
         :rtype: dict.
         """
-        self._requests_session.headers["x-craft-ai-tree-version"] = version
-
         # If we give no timestamp the default behaviour is to give the tree
         # from the latest timestamp
         if timestamp is None:
@@ -416,12 +549,15 @@ class Client(object):
                 self._base_url, generator_id, timestamp
             )
 
-        resp = self._requests_session.get(req_url)
+        resp = self._request(
+            "GET", req_url, headers={"x-craft-ai-tree-version": version}
+        )
 
         decision_tree = self._decode_response(resp)
 
         return decision_tree
 
+    @instrumented
     def get_generator_decision_tree(
         self, generator_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
     ):
@@ -453,53 +589,66 @@ class Client(object):
 
         # Raises an error when generator_id is invalid
         self._check_entity_id(generator_id)
-        if self._config["decisionTreeRetrievalTimeout"] is False:
-            # Don't retry
-            return self._get_generator_decision_tree(generator_id, timestamp, version)
-
-        start = current_time_ms()
-        while True:
-            now = current_time_ms()
-            if now - start > self._config["decisionTreeRetrievalTimeout"]:
-                # Client side timeout
-                raise CraftAiLongRequestTimeOutError()
-            try:
-                return self._get_generator_decision_tree(
-                    generator_id, timestamp, version
-                )
-            except CraftAiLongRequestTimeOutError:
-                # Do nothing and continue.
-                continue
-
-    def _get_generator_operations_pages(self, url, ops_list):
-        if url is None:
-            return ops_list
-
-        resp = self._requests_session.get(url)
-
-        new_ops_list = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
 
-        return self._get_generator_operations_pages(
-            next_page_url, ops_list + new_ops_list
+        return self._through_decision_tree_cache(
+            lambda: self._through_decision_tree_store(
+                lambda: self._retry_long_request(
+                    lambda: self._get_generator_decision_tree(
+                        generator_id, timestamp, version
+                    )
+                ),
+                generator_id,
+                timestamp,
+                version,
+                "generator",
+            ),
+            generator_id,
+            timestamp,
+            version,
+            "generator",
         )
 
+    @instrumented
     def get_generator_operations(self, generator_id, start=None, end=None):
-        # Raises an error when generator_id is invalid
-        self._check_entity_id(generator_id)
+        return list(self.iter_generator_operations(generator_id, start, end))
 
-        req_url = "{}/generators/{}/context".format(self._base_url, generator_id)
-        req_params = {"start": start, "end": end}
-        resp = self._requests_session.get(req_url, params=req_params)
+    @instrumented
+    def iter_generator_operations(
+        self, generator_id, start=None, end=None, by_page=False, prefetch_pages=0
+    ):
+        """Iterate over the operations of a generator, each page of operations
+        being requested once the previous one has been iterated over.
 
-        initial_ops_list = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+        :param str generator_id: the id of the generator whose operations to
+        get. It must be an str containing only characters in "a-zA-Z0-9_-" and
+        must be between 1 and 36 characters.
+        :param int start: Optional. The timestamp of the first operation.
+        :param int end: Optional. The timestamp of the last operation.
+        :param bool by_page: Optional. Whether to iterate over the lists of
+        operations of each page instead of the operations.
+        :default by_page: False.
+        :param int prefetch_pages: Optional. The number of pages requested in
+        a background thread ahead of the iterated page.
+        :default prefetch_pages: 0, each page is requested once the previous
+        one has been iterated over.
+
+        :return: the operations, or the pages of operations.
+        :rtype: iterator.
+        """
+        # Raises an error when generator_id is invalid
+        self._check_entity_id(generator_id)
 
-        return self._get_generator_operations_pages(next_page_url, initial_ops_list)
+        return self._iter_pages(
+            "{}/generators/{}/context".format(self._base_url, generator_id),
+            {"start": start, "end": end},
+            by_page,
+            prefetch_pages,
+        )
 
     ###################
     # Context methods #
     ###################
+    @instrumented
     def add_agent_operations(self, agent_id, operations):
         """Add operations to an agent.
 
@@ -519,98 +668,271 @@ class Client(object):
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
-        # Extra header in addition to the main session's
-        ct_header = {"Content-Type": "application/json; charset=utf-8"}
-        offset = 0
-        added_operations_count = 0
+        added_operations_count = self._add_agent_operations_chunks(
+            agent_id, self._chunk_operations(operations, agent_id)
+        )
 
-        is_looping = True
+        return {
+            "message": f'Successfully added {added_operations_count} operation(s) to \
+                the agent "{self.config["owner"]}/{self.config["project"]}/{agent_id}" context.',
+            "added_operations_count": added_operations_count,
+        }
 
-        while is_looping:
-            next_offset = offset + self.config["operationsChunksSize"]
+    def _add_agent_operations_chunks(self, agent_id, chunks):
+        """Tool for the function add_agent_operations. It sends a request for
+        each chunk of operations, over up to `maxConcurrentRequests` threads.
 
-            try:
-                json_pl = json.dumps(operations[offset:next_offset])
-            except TypeError as err:
-                raise CraftAiBadRequestError(
-                    "Invalid configuration or agent id given. {}".format(err.__str__())
-                )
+        Chunks are sent in order, and a chunk is never sent while the one
+        `maxInFlightChunks` chunks before it hasn't been added yet.
 
-            req_url = "{}/agents/{}/context".format(self._base_url, agent_id)
-            resp = self._requests_session.post(req_url, headers=ct_header, data=json_pl)
-            decoded_response = self._decode_response(resp)
+        :param str agent_id: the id of the agent.
+        :param chunks: the lists of operations to send.
+        :type chunks: iterable of list
 
-            added_operations_count += extract_operations_count_from_message(
-                decoded_response["message"]
+        :return: the number of added operations.
+        :rtype: int
+
+        :raises CraftAiError: the error of the first chunk that could not be
+        added, no other chunk is sent once one failed.
+        """
+        return sum(
+            self._map_concurrently(
+                lambda chunk: self._add_operations_chunk(agent_id, chunk),
+                chunks,
+                self.config["maxInFlightChunks"],
             )
+        )
 
-            if next_offset >= len(operations):
-                is_looping = False
+    def _add_operations_chunk(self, agent_id, operations):
+        """Sends a chunk of operations, returns the number of added operations.
+
+        With `adaptiveChunksSize`, the time taken to add the chunk adapts the
+        size of the next chunks, and a chunk too large for the API is split in
+        halves sent one after the other.
+        """
+        adaptive_chunks_size = self._config["adaptiveChunksSize"]
+        json_pl = self._dump_operations_chunk(operations)
+        start = time.perf_counter()
+        try:
+            added_operations_count = self._post_agent_operations(agent_id, json_pl)
+        except (CraftAiPayloadTooLargeError, CraftAiRequestTimeOutError):
+            if adaptive_chunks_size is None or len(operations) < 2:
+                raise
+            adaptive_chunks_size.record_failure(agent_id, len(operations))
+            half = len(operations) // 2
+            return self._add_operations_chunk(
+                agent_id, operations[:half]
+            ) + self._add_operations_chunk(agent_id, operations[half:])
+        if adaptive_chunks_size is not None:
+            adaptive_chunks_size.record_success(
+                agent_id, len(operations), (time.perf_counter() - start) * 1000
+            )
+        return added_operations_count
 
+    def _chunk_operations(self, operations, agent_id=None):
+        """Yields the chunks of `operationsChunksSize` operations to send, at
+        least one, possibly empty, chunk is sent.
+
+        With `adaptiveChunksSize`, the size of each chunk is the size adapted
+        to the agent when the chunk is sent.
+        """
+        adaptive_chunks_size = self._config["adaptiveChunksSize"]
+        offset = 0
+        while True:
+            if adaptive_chunks_size is not None and agent_id is not None:
+                chunk_size = adaptive_chunks_size.size(agent_id)
+            else:
+                chunk_size = self.config["operationsChunksSize"]
+            next_offset = offset + chunk_size
+            yield operations[offset:next_offset]
+            if next_offset >= len(operations):
+                break
             offset = next_offset
 
-        return {
-            "message": f'Successfully added {added_operations_count} operation(s) to \
-                the agent "{self.config["owner"]}/{self.config["project"]}/{agent_id}" context.',
-            "added_operations_count": added_operations_count,
-        }
+    def _dump_operations_chunk(self, operations):
+        """Serializes a chunk of operations in json."""
+        try:
+            return self._dump_operations(operations)
+        except TypeError as err:
+            raise CraftAiBadRequestError(
+                "Invalid configuration or agent id given. {}".format(err.__str__())
+            )
+
+    def _encode_json(self, payload):
+        """Serializes a payload in json, in bytes, with the `jsonEncoder` of
+        the client.
+
+        :raises TypeError: if the payload can't be serialized in json.
+        """
+        return self._config["jsonEncoder"].dumps(payload)
+
+    def _dump_operations(self, operations):
+        return self._encode_json(operations)
+
+    def _dump_agents_operations(self, agents):
+        """Serializes agents and their operations in json."""
+        return self._encode_json(agents)
+
+    def _upload_body(self, json_pl):
+        """Gives the body of a request uploading operations serialized in
+        json, gzipped from `compressRequestsMinBytes` bytes when
+        `compressRequests` is enabled, and the extra headers to send it."""
+        if isinstance(json_pl, str):
+            json_pl = json_pl.encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        body, content_encoding = json_pl, None
+        if self._config["compressRequests"]:
+            body, content_encoding = gzip_body(
+                json_pl, self._config["compressRequestsMinBytes"]
+            )
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
+        self._compression_stats.record_request(
+            len(json_pl), len(body), content_encoding is not None
+        )
+        return body, headers
+
+    def _record_response(self, response, *args, **kwargs):
+        """Counts the bytes of a response body, as received and once
+        decompressed by requests."""
+        body_size = len(response.content)
+        compressed = "Content-Encoding" in response.headers
+        self._compression_stats.record_response(
+            body_size, response.raw.tell() if compressed else body_size, compressed
+        )
+
+    def compression_stats(self):
+        """Get the counters of the compression of the requests uploading
+        operations and of the responses, see `compressRequests`.
+
+        :return: the number of uploaded "requests" and of "compressed_requests",
+        the "request_bytes" of their bodies and the "request_sent_bytes" once
+        compressed, the number of "responses" and of "compressed_responses",
+        the "response_bytes" of their decompressed bodies and the
+        "response_received_bytes" of their bodies as received.
+        :rtype: dict.
+        """
+        return self._compression_stats.to_dict()
+
+    def _post_agent_operations(self, agent_id, json_pl):
+        """Sends a chunk of operations serialized in json, returns the number
+        of added operations."""
+        body, headers = self._upload_body(json_pl)
+        req_url = "{}/agents/{}/context".format(self._base_url, agent_id)
+        resp = self._request("POST", req_url, headers=headers, data=body)
+        decoded_response = self._decode_response(resp)
+        self._invalidate_decision_trees(agent_id, latest_only=True)
+
+        return extract_operations_count_from_message(decoded_response["message"])
 
     def _add_agents_operations_bulk(self, chunked_data):
         """Tool for the function add_agents_operations_bulk. It send the requests to
-        add the operations to the agents.
+        add the operations to the agents, over up to `maxConcurrentRequests`
+        threads.
 
         :param list chunked_data: list of list of the agents and their operations
         to add. Each chunk can be requested at the same time.
 
         :return: list of agents containing a message about the added
-        operations.
+        operations, in the order of the chunks. `chunk_latency_ms` is the
+        time taken to add the operations of the chunk of each agent.
         :rtype: list of dict.
 
         :raises CraftAiBadRequestError: if the input is not of the right form.
         """
-        url = "{}/bulk/context".format(self._base_url)
-        ct_header = {"Content-Type": "application/json; charset=utf-8"}
-
         responses = []
-        for chunk in chunked_data:
-            if len(chunk) > 1:
-                try:
-                    json_pl = json.dumps(chunk)
-                except TypeError as err:
-                    raise CraftAiBadRequestError(
-                        "Error while dumping the payload into json"
-                        "format when converting it for the bulk request. {}".format(
-                            err.__str__()
-                        )
-                    )
-                resp = self._requests_session.post(url, headers=ct_header, data=json_pl)
-                decoded_response = self._decode_response(resp)
-                responses += [
-                    {
-                        **r,
-                        "added_operations_count": extract_operations_count_from_message(
-                            r["message"]
-                        ),
-                    }
-                    for r in decoded_response
-                ]
-            elif chunk:
-                add_agent_operations_response = self.add_agent_operations(
-                    chunk[0]["id"], chunk[0]["operations"]
-                )
-                responses.append(
-                    {
-                        "id": chunk[0]["id"],
-                        "status": 201,
-                        **add_agent_operations_response,
-                    }
-                )
+        for chunk_responses in self._map_concurrently(
+            self._add_agents_operations_chunk, chunked_data
+        ):
+            responses += chunk_responses
 
         if responses == []:
             raise CraftAiBadRequestError("Invalid or empty set of operations given")
 
         return responses
 
+    def _add_agents_operations_chunk(self, chunk):
+        """Adds the operations of a chunk of agents, returns the response for
+        each agent."""
+        start = time.perf_counter()
+        if len(chunk) > 1:
+            try:
+                json_pl = self._dump_agents_operations(chunk)
+            except TypeError as err:
+                raise CraftAiBadRequestError(
+                    "Error while dumping the payload into json"
+                    "format when converting it for the bulk request. {}".format(
+                        err.__str__()
+                    )
+                )
+            body, headers = self._upload_body(json_pl)
+            url = "{}/bulk/context".format(self._base_url)
+            resp = self._request("POST", url, headers=headers, data=body)
+            decoded_response = self._decode_response(resp)
+            for agent in chunk:
+                self._invalidate_decision_trees(agent["id"], latest_only=True)
+            responses = [
+                {
+                    **r,
+                    "added_operations_count": extract_operations_count_from_message(
+                        r["message"]
+                    ),
+                }
+                for r in decoded_response
+            ]
+        elif chunk:
+            add_agent_operations_response = self.add_agent_operations(
+                chunk[0]["id"], chunk[0]["operations"]
+            )
+            responses = [
+                {"id": chunk[0]["id"], "status": 201, **add_agent_operations_response}
+            ]
+        else:
+            return []
+
+        chunk_latency_ms = (time.perf_counter() - start) * 1000
+        for response in responses:
+            response["chunk_latency_ms"] = chunk_latency_ms
+        return responses
+
+    def _map_concurrently(self, function, iterable, max_in_flight=None):
+        """Yields `function(item)` for each item of `iterable`, in order.
+
+        Up to `maxConcurrentRequests` calls are run at the same time, in
+        threads, an item being processed only once the one `max_in_flight`
+        items before it is done.
+
+        :raises Exception: the error of the first call that failed, no item is
+        processed once one of the calls failed.
+        """
+        if self.config["maxConcurrentRequests"] == 1:
+            for item in iterable:
+                yield function(item)
+            return
+
+        max_in_flight = max_in_flight or self.config["maxConcurrentRequests"]
+        with ThreadPoolExecutor(self.config["maxConcurrentRequests"]) as executor:
+            in_flight = deque()
+            try:
+                for item in iterable:
+                    if len(in_flight) >= max_in_flight:
+                        yield in_flight.popleft().result()
+                    # Stop as soon as one of the calls failed
+                    for future in in_flight:
+                        if future.done() and future.exception() is not None:
+                            future.result()
+                    in_flight.append(
+                        # The requests are counted in the call of the caller
+                        executor.submit(contextvars.copy_context().run, function, item)
+                    )
+                while in_flight:
+                    yield in_flight.popleft().result()
+            finally:
+                # The running calls are waited for when leaving the executor
+                for future in in_flight:
+                    future.cancel()
+
+    @instrumented
     def add_agents_operations_bulk(self, payload):
         """Add operations to a group of agents.
 
@@ -629,10 +951,26 @@ class Client(object):
         :raises CraftAiBadRequestError: if all of the ids are invalid or
         referenced non existing agents or one of the operations is invalid.
         """
-        # Check all ids, raise an error if all ids are invalid
-        valid_indices, _, _ = self._check_entity_id_bulk(payload)
+        # Check all ids, raise an error if all ids are invalid. The operations
+        # are checked while serializing each chunk.
+        valid_indices, _, _, _ = self._check_entity_id_bulk(
+            payload, check_serializable=False
+        )
         valid_payload = [payload[i] for i in valid_indices]
 
+        return self._add_agents_operations_bulk(
+            self._chunk_agents_operations(valid_payload)
+        )
+
+    def _chunk_agents_operations(self, valid_payload):
+        """Groups the agents in chunks of at most `operationsChunksSize`
+        operations, an agent with more operations being alone in its chunk.
+
+        :param list valid_payload: the agents and their operations.
+
+        :return: list of list of the agents and their operations.
+        :rtype: list.
+        """
         chunked_data = []
         current_chunk = []
         current_chunk_size = 0
@@ -656,56 +994,151 @@ class Client(object):
         if current_chunk:
             chunked_data.append(current_chunk)
 
-        return self._add_agents_operations_bulk(chunked_data)
-
-    def _get_agent_operations_pages(self, url, ops_list):
-        if url is None:
-            return ops_list
-
-        resp = self._requests_session.get(url)
+        return chunked_data
 
-        new_ops_list = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+    @instrumented
+    def get_agent_operations(self, agent_id, start=None, end=None):
+        return list(self.iter_agent_operations(agent_id, start, end))
 
-        return self._get_agent_operations_pages(next_page_url, ops_list + new_ops_list)
+    @instrumented
+    def iter_agent_operations(
+        self, agent_id, start=None, end=None, by_page=False, prefetch_pages=0
+    ):
+        """Iterate over the operations of an agent, each page of operations
+        being requested once the previous one has been iterated over.
 
-    def get_agent_operations(self, agent_id, start=None, end=None):
+        :param str agent_id: the id of the agent whose operations to get. It
+        must be an str containing only characters in "a-zA-Z0-9_-" and
+        must be between 1 and 36 characters.
+        :param int start: Optional. The timestamp of the first operation.
+        :param int end: Optional. The timestamp of the last operation.
+        :param bool by_page: Optional. Whether to iterate over the lists of
+        operations of each page instead of the operations.
+        :default by_page: False.
+        :param int prefetch_pages: Optional. The number of pages requested in
+        a background thread ahead of the iterated page.
+        :default prefetch_pages: 0, each page is requested once the previous
+        one has been iterated over.
+
+        :return: the operations, or the pages of operations.
+        :rtype: iterator.
+        """
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
-        req_url = "{}/agents/{}/context".format(self._base_url, agent_id)
-        req_params = {"start": start, "end": end}
-        resp = self._requests_session.get(req_url, params=req_params)
-
-        initial_ops_list = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
-
-        return self._get_agent_operations_pages(next_page_url, initial_ops_list)
-
-    def _get_agent_states_pages(self, url, states):
-        if url is None:
-            return states
-
-        resp = self._requests_session.get(url)
+        return self._iter_pages(
+            "{}/agents/{}/context".format(self._base_url, agent_id),
+            {"start": start, "end": end},
+            by_page,
+            prefetch_pages,
+        )
 
-        new_states = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+    @instrumented
+    def get_agent_states(self, agent_id, start=None, end=None):
+        return list(self.iter_agent_states(agent_id, start, end))
 
-        return self._get_agent_states_pages(next_page_url, states + new_states)
+    @instrumented
+    def iter_agent_states(
+        self, agent_id, start=None, end=None, by_page=False, prefetch_pages=0
+    ):
+        """Iterate over the states of an agent, each page of states being
+        requested once the previous one has been iterated over.
 
-    def get_agent_states(self, agent_id, start=None, end=None):
+        :param str agent_id: the id of the agent whose states to get. It
+        must be an str containing only characters in "a-zA-Z0-9_-" and
+        must be between 1 and 36 characters.
+        :param int start: Optional. The timestamp of the first state.
+        :param int end: Optional. The timestamp of the last state.
+        :param bool by_page: Optional. Whether to iterate over the lists of
+        states of each page instead of the states.
+        :default by_page: False.
+        :param int prefetch_pages: Optional. The number of pages requested in
+        a background thread ahead of the iterated page.
+        :default prefetch_pages: 0, each page is requested once the previous
+        one has been iterated over.
+
+        :return: the states, or the pages of states.
+        :rtype: iterator.
+        """
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
 
-        req_url = "{}/agents/{}/context/state/history".format(self._base_url, agent_id)
-        req_params = {"start": start, "end": end}
-        resp = self._requests_session.get(req_url, params=req_params)
-
-        initial_states_history = self._decode_response(resp)
-        next_page_url = resp.headers.get("x-craft-ai-next-page-url")
+        return self._iter_pages(
+            "{}/agents/{}/context/state/history".format(self._base_url, agent_id),
+            {"start": start, "end": end},
+            by_page,
+            prefetch_pages,
+        )
 
-        return self._get_agent_states_pages(next_page_url, initial_states_history)
+    def _iter_pages(self, url, params, by_page=False, prefetch_pages=0):
+        """Iterates over the content of the pages of a paginated resource, or
+        over the pages themselves when `by_page` is True."""
+        pages = self._get_pages(url, params, prefetch_pages)
+        return pages if by_page else self._chain_pages(pages)
 
+    @staticmethod
+    def _chain_pages(pages):
+        try:
+            for page in pages:
+                yield from page
+        finally:
+            # Stops requesting pages when the iteration stops early
+            pages.close()
+
+    def _get_pages(self, url, params, prefetch_pages=0):
+        """Yields the content of each page, following the next page urls."""
+        if prefetch_pages > 0:
+            responses = self._prefetch_pages(url, params, prefetch_pages)
+        else:
+            responses = self._request_pages(url, params)
+        for resp in responses:
+            page = self._decode_response(resp)
+            count_page()
+            yield page
+
+    def _request_pages(self, url, params):
+        while url is not None:
+            resp = self._request("GET", url, params=params)
+            yield resp
+            url = resp.headers.get("x-craft-ai-next-page-url")
+            # The next page url already has the query parameters
+            params = None
+
+    def _prefetch_pages(self, url, params, prefetch_pages):
+        """Yields the responses of the pages, a background thread requesting
+        up to `prefetch_pages` pages ahead of the yielded one."""
+        buffer = queue.Queue(prefetch_pages)
+        stopped = threading.Event()
+
+        def request_pages():
+            try:
+                for resp in self._request_pages(url, params):
+                    buffer.put((resp, None))
+                    if stopped.is_set():
+                        return
+                buffer.put((None, None))
+            except Exception as err:  # pylint: disable=broad-except
+                buffer.put((None, err))
+
+        # The requests are counted in the call iterating over the pages
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(request_pages,), daemon=True
+        ).start()
+        try:
+            while True:
+                resp, err = buffer.get()
+                if err is not None:
+                    raise err
+                if resp is None:
+                    return
+                yield resp
+        finally:
+            stopped.set()
+            # Makes room for the response the thread may be waiting to buffer
+            while not buffer.empty():
+                buffer.get_nowait()
+
+    @instrumented
     def get_agent_state(self, agent_id, timestamp):
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
@@ -713,7 +1146,7 @@ class Client(object):
         req_url = "{}/agents/{}/context/state?t={}".format(
             self._base_url, agent_id, timestamp
         )
-        resp = self._requests_session.get(req_url)
+        resp = self._request("GET", req_url)
 
         context_state = self._decode_response(resp)
 
@@ -742,8 +1175,6 @@ class Client(object):
         :return: decision tree.
         :rtype: dict.
         """
-        self._requests_session.headers["x-craft-ai-tree-version"] = version
-
         # If we give no timestamp the default behaviour is to give
         # the tree from the latest timestamp
         if timestamp is None:
@@ -753,12 +1184,15 @@ class Client(object):
                 self._base_url, agent_id, timestamp
             )
 
-        resp = self._requests_session.get(req_url)
+        resp = self._request(
+            "GET", req_url, headers={"x-craft-ai-tree-version": version}
+        )
 
         decision_tree = self._decode_response(resp)
 
         return decision_tree
 
+    @instrumented
     def get_agent_decision_tree(
         self, agent_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
     ):
@@ -790,56 +1224,32 @@ class Client(object):
 
         # Raises an error when agent_id is invalid
         self._check_entity_id(agent_id)
-        if self._config["decisionTreeRetrievalTimeout"] is False:
-            # Don't retry
-            return self._get_agent_decision_tree(agent_id, timestamp, version)
-
-        start = current_time_ms()
-        while True:
-            now = current_time_ms()
-            if now - start > self._config["decisionTreeRetrievalTimeout"]:
-                # Client side timeout
-                raise CraftAiLongRequestTimeOutError()
-            try:
-                return self._get_agent_decision_tree(agent_id, timestamp, version)
-            except CraftAiLongRequestTimeOutError:
-                # Do nothing and continue.
-                continue
-
-    def _get_agents_decision_trees_bulk(
-        self, payload, valid_indices, invalid_indices, invalid_dts
-    ):
-        """Tool for the function get_agents_decision_trees_bulk.
-
-        :param list payload: contains the informations necessary for getting
-        the trees. Its form is the same than for the function.
-        get_agents_decision_trees_bulk.
-        :param list valid_indices: list of the indices of the valid agent id.
-        :param list invalid_indices: list of the indices of the valid agent id.
-        :param list invalid_dts: list of the invalid agent id.
 
-        :return: decision trees.
-        :rtype: list of dict.
-        """
-        valid_dts = self._create_and_send_json_bulk(
-            [payload[i] for i in valid_indices],
-            "{}/bulk/decision_tree".format(self._base_url),
-            "POST",
-        )
-
-        if invalid_indices == []:
-            return valid_dts
-
-        # Put the valid and invalid decision trees in their original index
-        return self._recreate_list_with_indices(
-            valid_indices, valid_dts, invalid_indices, invalid_dts
+        return self._through_decision_tree_cache(
+            lambda: self._through_decision_tree_store(
+                lambda: self._retry_long_request(
+                    lambda: self._get_agent_decision_tree(agent_id, timestamp, version)
+                ),
+                agent_id,
+                timestamp,
+                version,
+            ),
+            agent_id,
+            timestamp,
+            version,
         )
 
+    @instrumented
     def get_agents_decision_trees_bulk(
         self, payload, version=DEFAULT_DECISION_TREE_VERSION
     ):
         """Get a group of decision trees.
 
+        The trees are requested in batches of `decisionTreesBulkSize` agents,
+        up to `maxConcurrentRequests` batches at the same time. The trees
+        still being computed by craft ai are requested again, up to
+        `decisionTreeRetrievalTimeout` milliseconds.
+
         :param list payload: contains the informations necessary for getting
         the trees. It's in the form [{"id": agent_id, "timestamp": timestamp}]
         With id a str containing only characters in "a-zA-Z0-9_-" and must be
@@ -849,46 +1259,313 @@ class Client(object):
         :type version: str or int.
         :default version: default version of the tree.
 
-        :return: Decision trees.
+        :return: Decision trees, in the order of the payload. A tree still
+        being computed after `decisionTreeRetrievalTimeout` milliseconds has a
+        CraftAiLongRequestTimeOutError as its "error".
         :rtype: list of dict.
 
         :raises CraftAiBadRequestError: if all of the ids are invalid or
         referenced non existing agents or all of the timestamp are invalid.
-        :raises CraftAiLongRequestTimeOutError: if the API doesn't get
-        the tree in the time given by the configuration.
+        :raises CraftAiLongRequestTimeOutError: if the API doesn't answer
+        for a batch of trees in the time given by the configuration.
         """
         if isinstance(version, int):
             version = str(version)
-        self._requests_session.headers["x-craft-ai-tree-version"] = version
 
         # Check all ids, raise an error if all ids are invalid
-        valid_indices, invalid_indices, invalid_dts = self._check_entity_id_bulk(
-            payload
+        (
+            valid_indices,
+            invalid_indices,
+            invalid_dts,
+            valid_jsons,
+        ) = self._check_entity_id_bulk(payload)
+
+        valid_dts = []
+        for batch_dts in self._map_concurrently(
+            lambda batch: self._get_decision_trees_batch(batch, version),
+            self._batch_decision_trees_requests(valid_jsons),
+        ):
+            valid_dts += batch_dts
+
+        if invalid_indices == []:
+            return valid_dts
+
+        # Put the valid and invalid decision trees in their original index
+        return self._recreate_list_with_indices(
+            valid_indices, valid_dts, invalid_indices, invalid_dts
         )
 
+    def _batch_decision_trees_requests(self, jsons):
+        """Yields the batches of at most `decisionTreesBulkSize` agents whose
+        trees are requested together.
+
+        :param list jsons: the json of each agent of the bulk payload.
+        """
+        batch_size = self.config["decisionTreesBulkSize"]
+        for offset in range(0, len(jsons), batch_size):
+            yield jsons[offset : offset + batch_size]
+
+    def _get_decision_trees_batch(self, jsons, version):
+        """Gets the trees of a batch of agents, requesting again only the trees
+        still being computed, see `get_agents_decision_trees_bulk`.
+
+        :param list jsons: the json of each agent of the batch.
+        :param str version: version of the trees to get.
+
+        :return: the decision tree of each agent, in order.
+        :rtype: list of dict.
+        """
+        decision_trees = [None] * len(jsons)
+        pending = list(range(len(jsons)))
+        start = current_time_ms()
+        attempt = 1
+        while True:
+            try:
+                response = self._create_and_send_json_bulk(
+                    join_json_array([jsons[i] for i in pending]),
+                    "{}/bulk/decision_tree".format(self._base_url),
+                    "POST",
+                    headers={"x-craft-ai-tree-version": version},
+                )
+            except CraftAiLongRequestTimeOutError as err:
+                pending_error = err
+            else:
+                pending = self._merge_decision_trees(decision_trees, pending, response)
+                if not pending:
+                    return decision_trees
+                pending_error = decision_trees[pending[0]]["error"]
+            delay = self._pending_decision_trees_delay(
+                decision_trees, pending, start, attempt, pending_error
+            )
+            if delay is None:
+                return decision_trees
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _merge_decision_trees(decision_trees, pending, response):
+        """Puts the trees of a response for the `pending` agents in their
+        position, returns the positions of the trees still being computed."""
+        still_pending = []
+        for position, decision_tree in zip(pending, response):
+            decision_trees[position] = decision_tree
+            if isinstance(decision_tree.get("error"), CraftAiLongRequestTimeOutError):
+                still_pending.append(position)
+        return still_pending
+
+    def _pending_decision_trees_delay(
+        self, decision_trees, pending, start, attempt, pending_error
+    ):
+        """Gives the delay before requesting again the trees still being
+        computed, None if they are not requested again.
+
+        :raises CraftAiLongRequestTimeOutError: if some of the pending trees
+        never got an answer.
+        """
+        try:
+            if self._config["decisionTreeRetrievalTimeout"] is False:
+                raise pending_error
+            return self._long_request_delay(start, attempt, pending_error)
+        except CraftAiLongRequestTimeOutError:
+            if any(decision_trees[position] is None for position in pending):
+                raise
+            return None
+
+    def _retry_long_request(self, send):
+        """Sends again a request while it is timing out on craft ai's side, up
+        to `decisionTreeRetrievalTimeout` milliseconds.
+
+        The request is sent again after the backoff of the `retryPolicy`, or
+        the delay given by the `Retry-After` header of the response.
+
+        :param send: function sending the request and returning its result.
+
+        :raises CraftAiLongRequestTimeOutError: if the request still times out
+        after `decisionTreeRetrievalTimeout` milliseconds.
+        """
         if self._config["decisionTreeRetrievalTimeout"] is False:
             # Don't retry
-            return self._get_agents_decision_trees_bulk(
-                payload, valid_indices, invalid_indices, invalid_dts
-            )
+            return send()
+
         start = current_time_ms()
+        attempt = 1
         while True:
-            now = current_time_ms()
-            if now - start > self._config["decisionTreeRetrievalTimeout"]:
-                # Client side timeout
-                raise CraftAiLongRequestTimeOutError()
             try:
-                return self._get_agents_decision_trees_bulk(
-                    payload, valid_indices, invalid_indices, invalid_dts
-                )
-            except CraftAiLongRequestTimeOutError:
-                # Do nothing and continue.
-                continue
+                return send()
+            except CraftAiLongRequestTimeOutError as err:
+                delay = self._long_request_delay(start, attempt, err)
+            time.sleep(delay)
+            attempt += 1
+
+    def _long_request_delay(self, start, attempt, err):
+        """Gives the delay before sending again a request that timed out on
+        craft ai's side, in seconds.
+
+        :raises CraftAiLongRequestTimeOutError: if the request would be sent
+        again after `decisionTreeRetrievalTimeout` milliseconds.
+        """
+        retry_after = (err.metadata or {}).get("retry_after")
+        delay = self._config["retryPolicy"].backoff(attempt, retry_after)
+        remaining_ms = (
+            start + self._config["decisionTreeRetrievalTimeout"] - current_time_ms()
+        )
+        if delay * 1000 > remaining_ms:
+            # Client side timeout
+            raise CraftAiLongRequestTimeOutError()
+        return delay
+
+    def _through_decision_tree_cache(
+        self, get_decision_tree, entity_id, timestamp, version, entity_type="agent"
+    ):
+        """Gets a decision tree from the `decisionTreeCache` if it is
+        configured, the tree being retrieved with `get_decision_tree` and
+        cached when it is not there."""
+        cache = self._config["decisionTreeCache"]
+        if cache is None:
+            return get_decision_tree()
+
+        decision_tree = cache.get(entity_id, timestamp, version, entity_type)
+        if decision_tree is None:
+            decision_tree = get_decision_tree()
+            cache.set(decision_tree, entity_id, timestamp, version, entity_type)
+        return decision_tree
+
+    def _through_decision_tree_store(
+        self, get_decision_tree, entity_id, timestamp, version, entity_type="agent"
+    ):
+        """Gets the latest decision tree from the `decisionTreeStore` if it is
+        configured and refreshes it in the background, the tree being
+        retrieved with `get_decision_tree` and stored when it is not there."""
+        store = self._config["decisionTreeStore"]
+        if store is None or timestamp is not None:
+            return get_decision_tree()
+
+        decision_tree = store.get(entity_id, version, entity_type)
+        if decision_tree is None:
+            decision_tree = get_decision_tree()
+            store.set(decision_tree, entity_id, version, entity_type)
+        else:
+            store.refresh(
+                get_decision_tree,
+                entity_id,
+                version,
+                entity_type,
+                lambda refreshed_tree: self._cache_refreshed_decision_tree(
+                    refreshed_tree, entity_id, version, entity_type
+                ),
+            )
+        return decision_tree
+
+    def _cache_refreshed_decision_tree(
+        self, decision_tree, entity_id, version, entity_type
+    ):
+        if self._config["decisionTreeCache"] is not None:
+            self._config["decisionTreeCache"].set(
+                decision_tree, entity_id, None, version, entity_type
+            )
+
+    def _invalidate_decision_trees(
+        self, entity_id, entity_type="agent", latest_only=False
+    ):
+        """Removes the trees of an entity from the `decisionTreeCache`, and from
+        the `decisionTreeStore` unless only the latest trees are outdated."""
+        if self._config["decisionTreeCache"] is not None:
+            self._config["decisionTreeCache"].invalidate(
+                entity_id, entity_type, latest_only
+            )
+        if self._config["decisionTreeStore"] is not None and not latest_only:
+            self._config["decisionTreeStore"].remove(entity_id, entity_type)
 
     @staticmethod
     def decide(tree, *args):
         return Interpreter.decide(tree, args)
 
+    def _request(self, method, url, **kwargs):
+        """Sends a request with the session of the client, sending it again as
+        long as the `retryPolicy` tells to.
+
+        :param str method: the method of the request.
+        :param str url: the URL to request.
+
+        The other parameters are given to the session.
+
+        :return: the response.
+        :rtype: requests.Response.
+
+        :raises requests.RequestException: the error of the last attempt when
+        the request could not be sent.
+        """
+        kwargs.setdefault("timeout", self._timeout())
+        retry_policy = self._config["retryPolicy"]
+        start = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                resp = self._requests_session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if not retry_policy.should_retry_error(method, attempt):
+                    self._record_request(
+                        method, url, kwargs.get("data"), start, attempt, error=err
+                    )
+                    raise
+                time.sleep(retry_policy.backoff(attempt))
+            else:
+                if not retry_policy.should_retry_status(resp.status_code, attempt):
+                    self._record_request(
+                        method,
+                        url,
+                        kwargs.get("data"),
+                        start,
+                        attempt,
+                        resp.status_code,
+                        len(resp.content),
+                    )
+                    return resp
+                time.sleep(
+                    retry_policy.backoff(attempt, resp.headers.get("Retry-After"))
+                )
+            attempt += 1
+
+    def _record_request(
+        self,
+        method,
+        url,
+        data,
+        start,
+        attempts,
+        status_code=None,
+        response_bytes=0,
+        error=None,
+    ):
+        """Records a request in the `metrics` of the client, once its last
+        attempt is done."""
+        metrics = self._config.get("metrics")
+        if metrics is None:
+            return
+        metrics.record_request(
+            {
+                "type": "request",
+                "method": method,
+                "url": url,
+                "endpoint": endpoint_of(url, self._base_url),
+                "status_code": status_code,
+                "latency_ms": 1000 * (time.perf_counter() - start),
+                "attempts": attempts,
+                "retries": attempts - 1,
+                "request_bytes": len(data) if data is not None else 0,
+                "response_bytes": response_bytes,
+                "error": None if error is None else type(error).__name__,
+            }
+        )
+
+    def _timeout(self):
+        """Gives the connect and read timeouts of the requests, in seconds,
+        None when disabled."""
+        return tuple(
+            None if self._config[key] is False else self._config[key] / 1000
+            for key in ("connectTimeout", "readTimeout")
+        )
+
     @staticmethod
     def _parse_body(response):
         try:
@@ -910,17 +1587,29 @@ class Client(object):
         """
         status_code = response.status_code
 
-        message = "Status code " + str(status_code)
+        # The body is parsed once, an invalid body being an error only for a
+        # successful response
         try:
-            message = Client._parse_body(response)["message"]
-        except (CraftAiInternalError, KeyError, TypeError):
-            pass
+            body = Client._parse_body(response)
+        except CraftAiInternalError:
+            if status_code in [200, 201, 204, 207]:
+                raise
+            body = None
 
         if status_code in [200, 201, 204, 207]:
-            return Client._parse_body(response)
-        else:
-            raise Client._get_error_from_status(status_code, message)
-        return None
+            return body
+
+        message = "Status code " + str(status_code)
+        try:
+            message = body["message"]
+        except (KeyError, TypeError):
+            pass
+        err = Client._get_error_from_status(status_code, message)
+        err.metadata = {
+            "status_code": status_code,
+            "retry_after": response.headers.get("Retry-After"),
+        }
+        raise err
 
     @staticmethod
     def _decode_response_bulk(response_bulk):
@@ -972,7 +1661,7 @@ class Client(object):
         elif status_code == 404:
             err = CraftAiNotFoundError(message)
         elif status_code == 413:
-            err = CraftAiBadRequestError("Given payload is too large")
+            err = CraftAiPayloadTooLargeError("Given payload is too large")
         elif status_code == 500:
             err = CraftAiInternalError(message)
         elif status_code == 503:
@@ -982,7 +1671,7 @@ class Client(object):
                 """persists please contact us at support@craft.ai"""
             )
         elif status_code == 504:
-            err = CraftAiBadRequestError("Request has timed out")
+            err = CraftAiRequestTimeOutError("Request has timed out")
         else:
             err = CraftAiUnknownError(message)
 
@@ -1002,19 +1691,24 @@ class Client(object):
 
     def _check_entity_id_bulk(self, payload, check_serializable=True):
         """Checks that all the given agent ids are valid non-empty strings
-        and if the agents are serializable.
+        and if the agents are serializable, serializing each agent once.
 
         :param list payload: list of dictionnary which represents an agent.
+        :param bool check_serializable: Optional. Whether to serialize the
+        agents with a valid id in json.
+        :default check_serializable: True.
 
         :return: list of the agents with valid ids, list of the agents with
-        invalid ids, list of the dictionnaries with valid ids.
-        :rtype: list, list, list of dict.
+        invalid ids, list of the errors of the invalid agents, list of the
+        json of the valid agents, empty if they aren't serialized.
+        :rtype: list, list, list of dict, list of bytes.
 
         :raise CraftAiBadRequestError: If all the agents are invalid.
         """
         invalid_agent_indices = []
         valid_agent_indices = []
         invalid_payload = []
+        valid_jsons = []
         for index, agent in enumerate(payload):
             # Check if the agent ID is valid
             try:
@@ -1032,7 +1726,7 @@ class Client(object):
                 if check_serializable:
                     # Check if the agent is serializable
                     try:
-                        json.dumps([agent])
+                        valid_jsons.append(self._encode_json(agent))
                     except TypeError as err:
                         invalid_agent_indices.append(index)
                         invalid_payload.append({"id": agent["id"], "error": err})
@@ -1044,7 +1738,7 @@ class Client(object):
         if len(invalid_agent_indices) == len(payload):
             raise CraftAiBadRequestError(ERROR_ID_MESSAGE)
 
-        return valid_agent_indices, invalid_agent_indices, invalid_payload
+        return valid_agent_indices, invalid_agent_indices, invalid_payload, valid_jsons
 
     @staticmethod
     def _recreate_list_with_indices(indices1, values1, indices2, values2):
@@ -1073,41 +1767,33 @@ class Client(object):
             full_list[index] = values2[i]
         return full_list
 
-    def _create_and_send_json_bulk(self, payload, req_url, request_type="POST"):
-        """Create a json, do a request to the URL and process the response.
+    def _create_and_send_json_bulk(
+        self, json_pl, req_url, request_type="POST", headers=None
+    ):
+        """Do a request to the URL with a json payload and process the response.
 
-        :param list payload: contains the informations necessary for the action.
-        It's a list of dictionnary.
+        :param bytes json_pl: the json of the informations necessary for the
+        action, a list of dictionnary.
         :param str req_url: URL to request with the payload.
         :param str request_type: type of request, either "POST" or "DELETE".
         :default request_type: "POST".
+        :param dict headers: Optional. Extra headers of the request.
 
         :return: response of the request.
         :rtype: list of dict.
 
-        :raises CraftAiBadRequestError: if the payload doesn't have the
-        correct form to be transformed into a json or request_type is
-        neither "POST" or "DELETE".
+        :raises CraftAiBadRequestError: if request_type is neither "POST" or
+        "DELETE".
         """
         # Extra header in addition to the main session's
         ct_header = {"Content-Type": "application/json; charset=utf-8"}
-
-        try:
-            json_pl = json.dumps(payload)
-        except TypeError as err:
-            raise CraftAiBadRequestError(
-                "Error while dumping the payload into json"
-                "format when converting it for the bulk request. {}".format(
-                    err.__str__()
-                )
-            )
+        if headers is not None:
+            ct_header.update(headers)
 
         if request_type == "POST":
-            resp = self._requests_session.post(req_url, headers=ct_header, data=json_pl)
+            resp = self._request("POST", req_url, headers=ct_header, data=json_pl)
         elif request_type == "DELETE":
-            resp = self._requests_session.delete(
-                req_url, headers=ct_header, data=json_pl
-            )
+            resp = self._request("DELETE", req_url, headers=ct_header, data=json_pl)
         else:
             raise CraftAiBadRequestError(
                 "Request for the bulk API should be either a POST or DELETE" "request"
@@ -0,0 +1,233 @@
+import functools
+import math
+
+from craft_ai.compiled_tree import CompiledTree, _copy_result, _is_number
+from craft_ai.interpreter_v2 import InterpreterV2
+from craft_ai.operators import OPERATORS_V2
+
+# Number of distinct generated sources whose code is kept compiled
+COMPILED_SOURCES_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=COMPILED_SOURCES_CACHE_SIZE)
+def _compile_source(source):
+    """Compiles a generated source once, the trees with the same decision
+    rules sharing their code."""
+    return compile(source, "<craft_ai generated tree>", "exec")
+
+
+def _copy_decision(result):
+    """Copies a decision computed once, its distribution included."""
+    decision = _copy_result(result)
+    if isinstance(decision.get("distribution"), list):
+        decision["distribution"] = list(decision["distribution"])
+    return decision
+
+
+def _literal(value):
+    """Gives the source of a constant that can be inlined, None otherwise."""
+    if value is None or type(value) in (int, str, bool):
+        return repr(value)
+    if type(value) is float and math.isfinite(value):
+        return repr(value)
+    return None
+
+
+class _SourceWriter(object):
+    def __init__(self):
+        self.lines = []
+        # The objects the generated code refers to, by name
+        self.namespace = {
+            "_copy_result": _copy_result,
+            "_copy_decision": _copy_decision,
+        }
+        self._variables = {}
+        # The variables of the properties needing to know whether their value
+        # is defined, or hashable
+        self.defined = set()
+        self.hashable = set()
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def constant(self, value):
+        name = "_k{}".format(len(self.namespace))
+        self.namespace[name] = value
+        return name
+
+    def value(self, value):
+        """Gives the source of a constant, inlined when possible."""
+        literal = _literal(value)
+        return literal if literal is not None else self.constant(value)
+
+    def variable(self, property_name):
+        """Gives the index of the local variables of a property."""
+        if property_name not in self._variables:
+            self._variables[property_name] = len(self._variables)
+        return self._variables[property_name]
+
+    def reset_variables(self):
+        variables = self._variables
+        self._variables = {}
+        return variables
+
+
+def _condition(writer, property_name, operator_function, operand, operator):
+    """Gives the source of the test of a decision rule, evaluated as the
+    operator function would."""
+    index = writer.variable(property_name)
+    value = "p{}".format(index)
+    # Whether the value is neither None nor {}, as checked by `safe_op`
+    defined = "d{}".format(index)
+    if operator == OPERATORS_V2["IS"]:
+        return "{} == {}".format(value, writer.value(operand))
+    if operator in (OPERATORS_V2["GTE"], OPERATORS_V2["LT"]) and _is_number(operand):
+        writer.defined.add(index)
+        return "{} and {} {} {}".format(defined, value, operator, writer.value(operand))
+    if (
+        operator == OPERATORS_V2["IN_INTERVAL"]
+        and isinstance(operand, (list, tuple))
+        and len(operand) == 2
+        and all(_is_number(bound) for bound in operand)
+        and all(_literal(bound) is not None for bound in operand)
+    ):
+        lower, upper = (_literal(bound) for bound in operand)
+        writer.defined.add(index)
+        if operand[0] < operand[1]:
+            return "{} and {} >= {} and {} < {}".format(
+                defined, value, lower, value, upper
+            )
+        return "{} and ({} >= {} or {} < {})".format(
+            defined, value, lower, value, upper
+        )
+    if operator == OPERATORS_V2["IN_MULTI"] and isinstance(operand, (list, tuple)):
+        try:
+            values = frozenset(operand)
+        except TypeError:
+            return "{} in {}".format(value, writer.constant(operand))
+        # Unhashable values, such as {}, are equal to none of the operands
+        writer.hashable.add(index)
+        return "h{} and {} in {}".format(index, value, writer.constant(values))
+    return "{}({}, {})".format(
+        writer.constant(operator_function), value, writer.constant(operand)
+    )
+
+
+def _write_node(writer, node, indent, output_values, output_type):
+    if node.branches is None:
+        if node.error is not None:
+            writer.emit(indent, "raise {}()".format(writer.constant(node.error)))
+        else:
+            writer.emit(
+                indent, "return _copy_result({})".format(writer.constant(node.result))
+            )
+        return
+
+    for branch_index, branch in enumerate(node.branches):
+        property_name, operator_function, operand, child, operator = branch
+        writer.emit(
+            indent,
+            "{} {}:".format(
+                "if" if branch_index == 0 else "elif",
+                _condition(writer, property_name, operator_function, operand, operator),
+            ),
+        )
+        _write_node(writer, child, indent + 1, output_values, output_type)
+
+    writer.emit(indent, "else:")
+    distribution = functools.partial(
+        CompiledTree._distribution_v2, node, output_values, output_type
+    )
+    try:
+        # The distribution of a node doesn't depend on the context
+        result = distribution()
+    except Exception:  # pylint: disable=broad-except
+        # Raised again when the decision is taken
+        writer.emit(indent + 1, "return {}()".format(writer.constant(distribution)))
+    else:
+        writer.emit(
+            indent + 1, "return _copy_decision({})".format(writer.constant(result))
+        )
+
+
+def generate_source(roots):
+    """Generates the source of the function taking the decisions of the
+    compiled roots of a V2 tree.
+
+    :param list roots: the name, compiled root, output values and output type
+    of each output.
+
+    :return: the source of a `decide` function taking a checked context and
+    giving the decision of each output, and the objects it refers to.
+    :rtype: str, dict.
+    """
+    writer = _SourceWriter()
+    outputs = []
+    for output_index, (output_name, root, output_values, output_type) in enumerate(
+        roots
+    ):
+        body = _SourceWriter()
+        body.namespace = writer.namespace
+        _write_node(body, root, 1, output_values, output_type)
+        writer.emit(0, "def _decide_{}(context):".format(output_index))
+        # Each value of the context is read once
+        for property_name, index in body.reset_variables().items():
+            writer.emit(
+                1, "p{} = context.get({})".format(index, writer.value(property_name))
+            )
+            if index in body.defined:
+                writer.emit(1, "d{0} = p{0} is not None and p{0} != {{}}".format(index))
+            if index in body.hashable:
+                writer.emit(1, "h{0} = p{0}.__hash__ is not None".format(index))
+        writer.lines.extend(body.lines)
+        writer.emit(0, "")
+        outputs.append(
+            "{}: _decide_{}(context)".format(writer.value(output_name), output_index)
+        )
+    writer.emit(0, "def decide(context):")
+    writer.emit(1, "return {{{}}}".format(", ".join(outputs)))
+    return "\n".join(writer.lines) + "\n", writer.namespace
+
+
+class GeneratedTree(CompiledTree):
+    """Decision tree compiled to a Python function, the fastest way to take a
+    single decision.
+
+    The decision rules of a V2 tree are generated as nested `if` statements on
+    the values of the context, their operands being inlined, and the
+    decisions of its leaves, as well as the distributions of the nodes where no
+    rule matches, are computed once. The generated source is compiled once,
+    trees with the same decision rules sharing their code.
+
+    Decisions are the same as the ones of `craft_ai.Interpreter.decide` for the
+    same tree, context and time. Decisions of V1 trees, and of trees too deep
+    to be compiled by Python, are taken as by `craft_ai.CompiledTree`.
+
+    :param dict tree: decision tree, as retrieved from
+    `craft_ai.Client.get_agent_decision_tree`.
+
+    :raise CraftAiDecisionError: if the tree format is invalid or if one of its
+    decision rules uses an unknown operator.
+    """
+
+    def __init__(self, tree):
+        super(GeneratedTree, self).__init__(tree)
+        self.source = None
+        self._function = None
+        if self._roots is None or self._interpreter is not InterpreterV2:
+            return
+
+        source, namespace = generate_source(self._roots)
+        try:
+            code = _compile_source(source)
+        except (RecursionError, MemoryError, SyntaxError):
+            # Too deeply nested for the compiler
+            return
+        exec(code, namespace)  # pylint: disable=exec-used
+        self.source = source
+        self._function = namespace["decide"]
+
+    def _decide_outputs(self, context):
+        if self._function is None:
+            return super(GeneratedTree, self)._decide_outputs(context)
+        return self._function(context)
@@ -0,0 +1,603 @@
+import bisect
+import math
+
+from craft_ai.errors import CraftAiDecisionError, CraftAiNullDecisionError
+from craft_ai.interpreter import Interpreter
+from craft_ai.interpreter_v1 import (
+    InterpreterV1,
+    _DECISION_VERSION as _DECISION_VERSION_V1,
+    _VALUE_VALIDATORS as _VALUE_VALIDATORS_V1,
+)
+from craft_ai.interpreter_v2 import (
+    InterpreterV2,
+    _DECISION_VERSION as _DECISION_VERSION_V2,
+    _VALUE_VALIDATORS as _VALUE_VALIDATORS_V2,
+)
+from craft_ai.operators import (
+    OPERATORS_V1,
+    OPERATORS_FUNCTION_V1,
+    OPERATORS_V2,
+    OPERATORS_FUNCTION_V2,
+)
+from craft_ai.time import Time
+from craft_ai.timezones import get_timezone_key, timezone_offset_in_standard_format
+from craft_ai.types import GENERATED_TIME_TYPES
+
+_ABSENT = object()
+# Returned by an index for a context value it can't look up
+_UNINDEXED = object()
+# Distribution of a node not computed yet
+_UNCOMPUTED = object()
+# Distribution of a node whose subtree raises an error
+_FAILED = object()
+# Operators of the rules matching the values in an interval
+_INTERVAL_OPERATORS = (
+    OPERATORS_V2["IN_INTERVAL"],
+    OPERATORS_V2["GTE"],
+    OPERATORS_V2["LT"],
+)
+# Operators of the rules matching given values
+_VALUE_OPERATORS = (OPERATORS_V2["IS"], OPERATORS_V2["IN_MULTI"])
+
+
+class _CompiledNode(object):
+    """A node of a compiled decision tree.
+
+    Leaves hold their final decision, splits hold their branches as
+    ``(property, operator_function, operand, child, operator)`` tuples.
+    """
+
+    __slots__ = (
+        "branches",
+        "index",
+        "result",
+        "error",
+        "tree",
+        "path",
+        "rules",
+        "ancestors",
+        "distribution",
+    )
+
+    def __init__(self, tree, path, rules, ancestors):
+        self.branches = None
+        # Index of the branches, when they can be looked up without a scan
+        self.index = None
+        self.result = None
+        self.error = None
+        # Raw node, only kept to compute a distribution when no branch matches
+        self.tree = tree
+        self.path = path
+        self.rules = rules
+        self.ancestors = ancestors
+        # Distribution of the subtree, computed once no branch matched
+        self.distribution = _UNCOMPUTED
+
+
+def _propagate_error(err, ancestors):
+    """Reproduces the way the recursive interpreters enrich a decision error
+    raised in a node with the decision rules of its ancestors."""
+    if not ancestors:
+        return err
+    metadata = err.metadata
+    for decision_rule in reversed(ancestors):
+        if decision_rule:
+            metadata["decision_rules"].insert(0, decision_rule)
+    return CraftAiDecisionError(err.message, metadata)
+
+
+def _format_rule(decision_rule):
+    return {
+        "property": decision_rule["property"],
+        "operator": decision_rule["operator"],
+        "operand": decision_rule["operand"],
+    }
+
+
+def _copy_result(result):
+    return dict(
+        result, decision_rules=[dict(rule) for rule in result["decision_rules"]]
+    )
+
+
+def _wrap_result_v1(result, rules):
+    final_result = {
+        "predicted_value": result["predicted_value"],
+        "confidence": result["confidence"],
+        "decision_rules": rules + result["decision_rules"],
+    }
+    if result.get("standard_deviation", None) is not None:
+        final_result["standard_deviation"] = result.get("standard_deviation")
+    return final_result
+
+
+def _wrap_result_v2(result, rules):
+    final_result = {
+        "predicted_value": result["predicted_value"],
+        "confidence": result["confidence"],
+        "decision_rules": rules + result["decision_rules"],
+        "nb_samples": result["nb_samples"],
+        "decision_path": result["decision_path"],
+    }
+    if result.get("standard_deviation", None) is not None:
+        final_result["standard_deviation"] = result.get("standard_deviation")
+    if result.get("min") is not None:
+        final_result["min"] = result.get("min")
+    if result.get("max") is not None:
+        final_result["max"] = result.get("max")
+    if result.get("distribution"):
+        final_result["distribution"] = result.get("distribution")
+    return final_result
+
+
+def _deferred(err):
+    return lambda: err
+
+
+def _is_number(value):
+    # NaN is never ordered, the branches are scanned for it
+    return type(value) in (int, float, bool) and value == value
+
+
+class _IntervalIndex(object):
+    """Index of branches whose rules are intervals of the same property.
+
+    Every interval is closed on its lower bound and open on its upper one,
+    `[in[` intervals whose lower bound isn't below their upper bound wrapping
+    around. The operands thus split the values in regions where the same
+    branch matches: below the lowest operand, then from each operand to the
+    next one. The matching child of each region is found once by scanning the
+    branches for a value of the region, a value's region being found by
+    bisection of the sorted operands.
+    """
+
+    __slots__ = ("property_name", "bounds", "children")
+
+    def __init__(self, property_name, bounds, children):
+        self.property_name = property_name
+        self.bounds = bounds
+        self.children = children
+
+    @staticmethod
+    def build(branches):
+        """Gives the index of the branches, None if they aren't all intervals
+        of the same property with number operands."""
+        property_name = branches[0][0]
+        bounds = set()
+        for branch_property, _, operand, _, operator in branches:
+            if branch_property != property_name or operator not in _INTERVAL_OPERATORS:
+                return None
+            operands = operand if operator == OPERATORS_V2["IN_INTERVAL"] else [operand]
+            if not isinstance(operands, (list, tuple)) or not all(
+                _is_number(value) for value in operands
+            ):
+                return None
+            bounds.update(operands)
+        bounds = sorted(bounds)
+        children = [
+            _scan(branches, {property_name: value}) for value in [-math.inf] + bounds
+        ]
+        return _IntervalIndex(property_name, bounds, children)
+
+    def lookup(self, context):
+        """Gives the matching child for the value of the context, None if no
+        branch matches, `_UNINDEXED` if the value isn't a number."""
+        value = context.get(self.property_name)
+        if not _is_number(value):
+            return _UNINDEXED
+        return self.children[bisect.bisect_right(self.bounds, value)]
+
+
+def _scan(branches, context):
+    """Gives the child of the first matching branch, None if none matches."""
+    for property_name, operator_function, operand, child, _ in branches:
+        if operator_function(context.get(property_name), operand):
+            return child
+    return None
+
+
+class _ValueIndex(object):
+    """Index of branches whose rules match given values of the same property,
+    `is` and `in` rules, the matching child of each value being found in a
+    dict."""
+
+    __slots__ = ("property_name", "children")
+
+    def __init__(self, property_name, children):
+        self.property_name = property_name
+        self.children = children
+
+    @staticmethod
+    def build(branches):
+        """Gives the index of the branches, None if they don't all match
+        hashable values of the same property."""
+        property_name = branches[0][0]
+        children = {}
+        for branch_property, _, operand, child, operator in branches:
+            if branch_property != property_name or operator not in _VALUE_OPERATORS:
+                return None
+            operands = operand if operator == OPERATORS_V2["IN_MULTI"] else [operand]
+            if not isinstance(operands, (list, tuple)):
+                return None
+            try:
+                for value in operands:
+                    # The first matching branch takes precedence
+                    children.setdefault(value, child)
+            except TypeError:
+                return None
+        return _ValueIndex(property_name, children)
+
+    def lookup(self, context):
+        """Gives the matching child for the value of the context, None if no
+        branch matches, `_UNINDEXED` if the value isn't hashable."""
+        try:
+            return self.children.get(context.get(self.property_name))
+        except TypeError:
+            return _UNINDEXED
+
+
+def _build_index(branches):
+    """Gives the index of the branches of a node, None if they can only be
+    scanned."""
+    return _IntervalIndex.build(branches) or _ValueIndex.build(branches)
+
+
+class CompiledTree(object):
+    """Decision tree compiled once to take many decisions.
+
+    The tree format is validated and the operators of every decision rule are
+    resolved when the instance is created. Leaves results and decision rules
+    lists are precomputed so that `decide` only has to walk the compiled nodes.
+
+    :param dict tree: decision tree, as retrieved from
+    `craft_ai.Client.get_agent_decision_tree`.
+
+    :raise CraftAiDecisionError: if the tree format is invalid or if one of its
+    decision rules uses an unknown operator.
+    """
+
+    def __init__(self, tree):
+        bare_tree, configuration, tree_version = Interpreter._parse_tree(tree)
+        self._interpreter = Interpreter._get_interpreter(tree_version)
+        self._bare_tree = bare_tree
+        self.configuration = configuration
+        self.version = tree_version
+
+        if configuration == {}:
+            # Nothing to compile, decisions are delegated to the interpreter
+            self._roots = None
+            return
+
+        context = configuration["context"]
+        self._context_properties = [
+            p for p in context if p not in configuration["output"]
+        ]
+        self._generated_properties = [
+            (p, context[p]["type"])
+            for p in self._context_properties
+            if context[p]["type"] in GENERATED_TIME_TYPES
+            and context[p].get("is_generated", True)
+        ]
+        self._timezone_key = get_timezone_key(context)
+        value_validators = (
+            _VALUE_VALIDATORS_V2
+            if self._interpreter is InterpreterV2
+            else _VALUE_VALIDATORS_V1
+        )
+        self._validators = [
+            (
+                p,
+                value_validators.get(context[p]["type"]),
+                self._interpreter is InterpreterV2 and context[p].get("is_optional"),
+            )
+            for p in self._context_properties
+        ]
+
+        self._roots = []
+        for output in configuration.get("output"):
+            root = bare_tree[output]
+            if self._interpreter is InterpreterV2:
+                compiled_root = self._compile_v2(root, ["0"], [], [])
+                output_type = configuration["context"][output]["type"]
+                self._roots.append(
+                    (output, compiled_root, root.get("output_values"), output_type)
+                )
+            else:
+                compiled_root = self._compile_v1(root, [], [])
+                self._roots.append((output, compiled_root, None, None))
+
+    def decide(self, context, time=None):
+        """Take a decision.
+
+        The result is the same as the one of `craft_ai.Interpreter.decide`
+        for the same tree, context and time, the given context is not modified.
+
+        :param dict context: context in which the decision is taken.
+        :param craft_ai.Time time: Optional. Used to generate the time
+        properties of the context.
+
+        :return: decision.
+        :rtype: dict.
+
+        :raise CraftAiDecisionError: if the context is invalid or if no
+        decision can be taken.
+        """
+        if self._roots is None:
+            args = (context,) if time is None else (context, time)
+            return Interpreter._decide(
+                self.configuration, self._bare_tree, args, self._interpreter
+            )
+
+        if self._generated_properties and isinstance(time, Time):
+            time_dict = time.to_dict()
+            context = dict(context)
+            for property_name, property_type in self._generated_properties:
+                context[property_name] = time_dict[property_type]
+        context = {p: context[p] for p in self._context_properties if p in context}
+
+        decide_context = context
+        if self._timezone_key in context:
+            decide_context = context.copy()
+            decide_context[self._timezone_key] = timezone_offset_in_standard_format(
+                context[self._timezone_key]
+            )
+        self._check_context(decide_context)
+
+        version = (
+            _DECISION_VERSION_V2
+            if self._interpreter is InterpreterV2
+            else _DECISION_VERSION_V1
+        )
+        return {
+            "output": self._decide_outputs(decide_context),
+            "_version": version,
+            "context": context,
+        }
+
+    ####################
+    # Internal helpers #
+    ####################
+
+    def _decide_outputs(self, context):
+        """Gives the decision of each output for a checked context."""
+        output = {}
+        if self._interpreter is InterpreterV2:
+            for output_name, root, output_values, output_type in self._roots:
+                output[output_name] = self._decide_v2(
+                    root, context, output_values, output_type
+                )
+        else:
+            for output_name, root, _, _ in self._roots:
+                output[output_name] = self._decide_v1(root, context)
+        return output
+
+    def _check_context(self, context):
+        allow_none = self._interpreter is InterpreterV2
+        for property_name, validator, is_optional in self._validators:
+            value = context.get(property_name, _ABSENT)
+            if value is None and allow_none:
+                continue
+            if (
+                value is _ABSENT
+                or value is None
+                or not (
+                    validator is None
+                    or validator(value)
+                    or (is_optional and value == {})
+                )
+            ):
+                # Let the interpreter build the detailed error message
+                self._interpreter._check_context(self.configuration, context)
+                return
+
+    def _compile_v2(self, tree, path, rules, ancestors):
+        node = _CompiledNode(tree, path, rules, ancestors)
+        children = tree.get("children")
+        if not (children is not None and len(children)):
+            if not path[1:]:
+                prediction = tree.get("prediction")
+                if prediction is None:
+                    prediction = tree
+                if prediction.get("value") is None:
+                    node.error = lambda: CraftAiNullDecisionError(
+                        """Unable to take decision: the decision tree is not based"""
+                        """ on any context operations."""
+                    )
+                    return node
+            try:
+                result = InterpreterV2._decide_recursion(tree, {}, None, None, path)
+            except CraftAiDecisionError as err:
+                decision_rule = tree.get("decision_rule")
+                message = err.message
+                node.error = lambda: _propagate_error(
+                    CraftAiNullDecisionError(
+                        message, {"decision_rules": [decision_rule]}
+                    ),
+                    ancestors,
+                )
+                return node
+            except Exception as err:  # pylint: disable=broad-except
+                node.error = _deferred(err)
+                return node
+            node.result = _wrap_result_v2(result, rules) if rules else result
+            return node
+
+        node.branches = []
+        for child_index, child in enumerate(children):
+            decision_rule = child["decision_rule"]
+            operator = decision_rule["operator"]
+            if not isinstance(operator, str) or operator not in OPERATORS_V2.values():
+                raise CraftAiDecisionError(
+                    """Invalid decision tree format, {} is not a valid"""
+                    """ decision operator.""".format(operator)
+                )
+            compiled_child = self._compile_v2(
+                child,
+                path + [str(child_index)],
+                rules + [_format_rule(decision_rule)],
+                ancestors + [tree.get("decision_rule")],
+            )
+            node.branches.append(
+                (
+                    decision_rule["property"],
+                    OPERATORS_FUNCTION_V2[operator],
+                    decision_rule["operand"],
+                    compiled_child,
+                    operator,
+                )
+            )
+        node.index = _build_index(node.branches)
+        return node
+
+    def _compile_v1(self, tree, rules, ancestors):
+        node = _CompiledNode(tree, None, rules, ancestors)
+        children = tree.get("children")
+        if not ("children" in tree and len(children)):
+            predicted_value = tree.get("predicted_value")
+            if predicted_value is None:
+                if not ancestors:
+                    node.error = lambda: CraftAiNullDecisionError(
+                        """Unable to take decision: the decision tree is not based"""
+                        """ on any context operations.""",
+                    )
+                    return node
+                decision_rule = tree.get("decision_rule")
+                node.error = lambda: _propagate_error(
+                    CraftAiNullDecisionError(
+                        """Unable to take decision: the decision tree has no valid"""
+                        """ predicted value for the given context.""",
+                        {"decision_rules": [decision_rule]},
+                    ),
+                    ancestors,
+                )
+                return node
+            result = InterpreterV1._decide_recursion(tree, {})
+            node.result = _wrap_result_v1(result, rules) if rules else result
+            return node
+
+        node.branches = []
+        for child in children:
+            decision_rule = child["decision_rule"]
+            operator = decision_rule["operator"]
+            if not isinstance(operator, str) or operator not in OPERATORS_V1.values():
+                raise CraftAiDecisionError(
+                    """Invalid decision tree format, {} is not a valid"""
+                    """ decision operator.""".format(operator)
+                )
+            compiled_child = self._compile_v1(
+                child,
+                rules + [_format_rule(decision_rule)],
+                ancestors + [tree.get("decision_rule")],
+            )
+            node.branches.append(
+                (
+                    decision_rule["property"],
+                    OPERATORS_FUNCTION_V1[operator],
+                    decision_rule["operand"],
+                    compiled_child,
+                    operator,
+                )
+            )
+        node.index = _build_index(node.branches)
+        return node
+
+    @staticmethod
+    def _decide_v2(node, context, output_values, output_type):
+        while node.branches is not None:
+            child = _UNINDEXED
+            if node.index is not None:
+                child = node.index.lookup(context)
+            if child is _UNINDEXED:
+                child = _scan(node.branches, context)
+            if child is None:
+                return CompiledTree._distribution_v2(node, output_values, output_type)
+            node = child
+        if node.error is not None:
+            raise node.error()
+        return _copy_result(node.result)
+
+    @staticmethod
+    def _distribution_v2(node, output_values, output_type):
+        try:
+            result = InterpreterV2._format_distribution(
+                CompiledTree._subtree_distribution_v2(node, output_type),
+                output_values,
+                output_type,
+                list(node.path),
+            )
+        except CraftAiDecisionError as err:
+            raise _propagate_error(err, node.ancestors)
+        return _wrap_result_v2(result, node.rules) if node.rules else result
+
+    @staticmethod
+    def _subtree_distribution_v2(node, output_type):
+        """Gives the distribution, or mean, size and standard deviation, of
+        the subtree of a node, aggregated from the ones of its children the
+        first time it is needed."""
+        distribution = node.distribution
+        if distribution is _UNCOMPUTED:
+            try:
+                if node.branches is None:
+                    distribution = InterpreterV2._distribution(node.tree, output_type)
+                else:
+                    distribution = InterpreterV2._mean_distribution(
+                        [
+                            CompiledTree._subtree_distribution_v2(child, output_type)
+                            for _, _, _, child, _ in node.branches
+                        ],
+                        output_type,
+                    )
+            except Exception:  # pylint: disable=broad-except
+                distribution = _FAILED
+            node.distribution = distribution
+        if distribution is _FAILED:
+            # Raises the error of the subtree as the interpreter does
+            return InterpreterV2._distribution(node.tree, output_type)
+        return distribution
+
+    @staticmethod
+    def _decide_v1(node, context):
+        while node.branches is not None:
+            if node.index is not None:
+                child = node.index.lookup(context)
+                if child is not _UNINDEXED and child is not None:
+                    node = child
+                    continue
+            for property_name, operator_function, operand, child, _ in node.branches:
+                context_value = context.get(property_name)
+                if context_value is None:
+                    raise _propagate_error(
+                        CraftAiDecisionError(
+                            """Unable to take decision, """
+                            """property '{}' is missing from the given context.""".format(
+                                property_name
+                            )
+                        ),
+                        node.ancestors,
+                    )
+                if operator_function(context_value, operand):
+                    node = child
+                    break
+            else:
+                decision_rule = node.tree.get("decision_rule")
+                property_name = node.branches[0][0]
+                raise _propagate_error(
+                    CraftAiNullDecisionError(
+                        """Unable to take decision: value '{}' for property '{}' doesn't"""
+                        """ validate any of the decision rules.""".format(
+                            context.get(property_name), property_name
+                        ),
+                        {
+                            "decision_rules": [decision_rule]
+                            if decision_rule is not None
+                            else [],
+                            "expected_values": [branch[2] for branch in node.branches],
+                            "property": property_name,
+                            "value": context.get(property_name),
+                        },
+                    ),
+                    node.ancestors,
+                )
+        if node.error is not None:
+            raise node.error()
+        return _copy_result(node.result)
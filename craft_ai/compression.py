@@ -0,0 +1,81 @@
+import gzip
+import threading
+
+# Compressing a small body takes more time than it saves
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+# Good trade-off between the time taken and the size of the body
+COMPRESSION_LEVEL = 6
+
+
+def gzip_body(body, min_bytes=DEFAULT_COMPRESSION_MIN_BYTES):
+    """Gzips the body of a request when it is big enough.
+
+    :param bytes body: the body of the request.
+    :param int min_bytes: Optional. The size from which the body is
+    compressed.
+    :default min_bytes: 1024.
+
+    :return: the body to send, and its `Content-Encoding`, None if the body
+    isn't compressed.
+    :rtype: bytes, str.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if len(body) < min_bytes:
+        return body, None
+    return gzip.compress(body, COMPRESSION_LEVEL), "gzip"
+
+
+class CompressionStats(object):
+    """Counters of the bytes of the request bodies sent by a client, and of
+    the response bodies it received, before and after their compression.
+
+    The counters can be updated from several threads.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.compressed_requests = 0
+        self.request_bytes = 0
+        self.request_sent_bytes = 0
+        self.responses = 0
+        self.compressed_responses = 0
+        self.response_bytes = 0
+        self.response_received_bytes = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, body_size, sent_size, compressed):
+        with self._lock:
+            self.requests += 1
+            self.compressed_requests += int(compressed)
+            self.request_bytes += body_size
+            self.request_sent_bytes += sent_size
+
+    def record_response(self, body_size, received_size, compressed):
+        with self._lock:
+            self.responses += 1
+            self.compressed_responses += int(compressed)
+            self.response_bytes += body_size
+            self.response_received_bytes += received_size
+
+    def to_dict(self):
+        """Get the counters.
+
+        :return: the number of uploaded "requests" and of "compressed_requests",
+        the "request_bytes" of their bodies and the "request_sent_bytes" once
+        compressed, the number of "responses" and of "compressed_responses",
+        the "response_bytes" of their decompressed bodies and the
+        "response_received_bytes" of their bodies as received.
+        :rtype: dict.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "compressed_requests": self.compressed_requests,
+                "request_bytes": self.request_bytes,
+                "request_sent_bytes": self.request_sent_bytes,
+                "responses": self.responses,
+                "compressed_responses": self.compressed_responses,
+                "response_bytes": self.response_bytes,
+                "response_received_bytes": self.response_received_bytes,
+            }
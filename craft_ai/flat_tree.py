@@ -0,0 +1,338 @@
+import copy
+import json
+
+from array import array
+from collections.abc import Mapping
+
+from craft_ai.errors import CraftAiDecisionError
+from craft_ai.operators import OPERATORS_V2
+
+# Codes of the operators, the index of each one
+OPERATOR_CODES = (
+    OPERATORS_V2["IS"],
+    OPERATORS_V2["IN_INTERVAL"],
+    OPERATORS_V2["GTE"],
+    OPERATORS_V2["LT"],
+    OPERATORS_V2["IN_MULTI"],
+)
+# Keys of the nodes stored in the arrays, the others being in their payload
+_STRUCTURE_KEYS = ("children", "decision_rule")
+# Keys of the predictions of V2 trees stored in the arrays
+_PREDICTION_KEYS = frozenset(("value", "confidence", "distribution", "nb_samples"))
+# Integers stored in the distribution array are exactly represented by floats
+_MAX_EXACT_INTEGER = 2 ** 53
+_INT32_RANGE = (-(2 ** 31), 2 ** 31)
+
+
+def _distribution_values(values):
+    """Gives whether numbers can be stored in a float array and given back
+    as they are, and whether they are integers, None if they can't."""
+    if all(type(value) is float for value in values):
+        return False
+    if all(type(value) is int and abs(value) <= _MAX_EXACT_INTEGER for value in values):
+        return True
+    return None
+
+
+def _prediction_layout(prediction):
+    """Gives the layout of a prediction of a V2 tree that can be stored in the
+    arrays, None if it can't be given back as it is from them.
+
+    The layout is the order of the keys of the prediction, the keys of its
+    distribution, or its length when it is a list, and whether its values are
+    integers."""
+    if not isinstance(prediction, dict) or set(prediction) != _PREDICTION_KEYS:
+        return None
+    if type(prediction["value"]) not in (str, int, float, bool, type(None)):
+        return None
+    if type(prediction["confidence"]) is not float:
+        return None
+    nb_samples = prediction["nb_samples"]
+    if type(nb_samples) is not int or not (
+        _INT32_RANGE[0] <= nb_samples < _INT32_RANGE[1]
+    ):
+        return None
+    distribution = prediction["distribution"]
+    if isinstance(distribution, list):
+        distribution_layout = len(distribution)
+        integers = _distribution_values(distribution)
+    elif isinstance(distribution, dict) and all(
+        isinstance(key, str) for key in distribution
+    ):
+        distribution_layout = tuple(distribution)
+        integers = _distribution_values(distribution.values())
+    else:
+        return None
+    if integers is None:
+        return None
+    return (tuple(prediction), distribution_layout, integers)
+
+
+class FlatTree(object):
+    """Decision tree whose nodes are stored in arrays instead of nested dicts,
+    to hold many trees in memory.
+
+    Each node is an index in the arrays of the tree, the children of a node
+    being contiguous. A node has the index of the property of its decision
+    rule in `properties`, the code of its operator, the index of its operand in
+    `operands`, where equal operands are stored once, the offset and count of
+    its children, and the index of its other keys, such as its prediction, in
+    `payloads`. -1 stands for a node without decision rule, children or
+    payload.
+
+    The predictions of the leaves of V2 trees are stored in arrays as well:
+    the index of the predicted value in `values`, where equal values are
+    stored once, the confidence, the number of samples, and the offset of the
+    distribution in `distribution_values`. The layout of each prediction, the
+    order of its keys and the keys or length of its distribution, is stored
+    once in `prediction_layouts`. A prediction that can't be stored in arrays
+    exactly as it is, as well as the leaves of V1 trees, are kept in the
+    payload of their node.
+
+    `craft_ai.Interpreter`, `craft_ai.CompiledTree` and the functions of
+    `craft_ai.tree_utils` take a flat tree as they take a tree dict.
+    """
+
+    def __init__(self, tree):
+        """
+        :param dict tree: decision tree, as retrieved from
+        `craft_ai.Client.get_agent_decision_tree`.
+
+        :raise CraftAiDecisionError: if the tree format is invalid.
+        """
+        if not isinstance(tree, dict) or not isinstance(tree.get("trees"), dict):
+            raise CraftAiDecisionError(
+                "Invalid decision tree format, no tree found in the given object."
+            )
+        # The other keys of the tree, such as its version and configuration
+        self.header = {key: value for key, value in tree.items() if key != "trees"}
+        self.properties = []
+        self.operators = list(OPERATOR_CODES)
+        self.operands = []
+        self.payloads = []
+        self.features = array("h")
+        self.operator_codes = array("b")
+        self.operand_indices = array("i")
+        self.child_offsets = array("i")
+        self.child_counts = array("i")
+        self.payload_indices = array("i")
+        self.values = []
+        self.prediction_layouts = []
+        self.prediction_layout_indices = array("h")
+        self.value_indices = array("i")
+        self.confidences = array("d")
+        self.nb_samples = array("i")
+        self.distribution_offsets = array("i")
+        self.distribution_values = array("d")
+        # Index of the root of each output tree
+        self.roots = {}
+
+        codes = {}
+        operand_indices = {}
+        value_indices = {}
+        layout_indices = {}
+        # Breadth first, so that the children of a node are contiguous
+        nodes = []
+        for output, root in tree["trees"].items():
+            self.roots[output] = len(nodes)
+            nodes.append(root)
+        for node in nodes:
+            decision_rule = node.get("decision_rule")
+            if decision_rule is None:
+                self.features.append(-1)
+                self.operator_codes.append(-1)
+                self.operand_indices.append(-1)
+            else:
+                try:
+                    property_name = decision_rule["property"]
+                    operator = decision_rule["operator"]
+                    operand = decision_rule["operand"]
+                except (KeyError, TypeError):
+                    raise CraftAiDecisionError(
+                        """Invalid decision tree format, {} is not a valid"""
+                        """ decision rule.""".format(decision_rule)
+                    )
+                self.features.append(
+                    self._code(codes, self.properties, ("property", property_name))
+                )
+                self.operator_codes.append(
+                    self._code(codes, self.operators, ("operator", operator))
+                )
+                operand_key = json.dumps(operand, sort_keys=True)
+                if operand_key not in operand_indices:
+                    operand_indices[operand_key] = len(self.operands)
+                    self.operands.append(operand)
+                self.operand_indices.append(operand_indices[operand_key])
+
+            children = node.get("children")
+            if children is None:
+                self.child_offsets.append(-1)
+                self.child_counts.append(0)
+            else:
+                self.child_offsets.append(len(nodes))
+                self.child_counts.append(len(children))
+                nodes.extend(children)
+
+            layout = _prediction_layout(node.get("prediction"))
+            if layout is None:
+                self.prediction_layout_indices.append(-1)
+                self.value_indices.append(-1)
+                self.confidences.append(0)
+                self.nb_samples.append(0)
+                self.distribution_offsets.append(-1)
+                stored_keys = _STRUCTURE_KEYS
+            else:
+                self._add_prediction(
+                    node["prediction"], layout, layout_indices, value_indices
+                )
+                stored_keys = _STRUCTURE_KEYS + ("prediction",)
+
+            payload = {
+                key: value for key, value in node.items() if key not in stored_keys
+            }
+            if payload:
+                self.payload_indices.append(len(self.payloads))
+                self.payloads.append(payload)
+            else:
+                self.payload_indices.append(-1)
+
+    def _add_prediction(self, prediction, layout, layout_indices, value_indices):
+        if layout not in layout_indices:
+            layout_indices[layout] = len(self.prediction_layouts)
+            self.prediction_layouts.append(layout)
+        self.prediction_layout_indices.append(layout_indices[layout])
+
+        value_key = json.dumps(prediction["value"])
+        if value_key not in value_indices:
+            value_indices[value_key] = len(self.values)
+            self.values.append(prediction["value"])
+        self.value_indices.append(value_indices[value_key])
+        self.confidences.append(prediction["confidence"])
+        self.nb_samples.append(prediction["nb_samples"])
+
+        distribution = prediction["distribution"]
+        if isinstance(distribution, dict):
+            distribution = distribution.values()
+        self.distribution_offsets.append(len(self.distribution_values))
+        self.distribution_values.extend(distribution)
+
+    def _prediction(self, index, layout_index):
+        """Gives the prediction of a node stored in the arrays."""
+        prediction_keys, distribution_layout, integers = self.prediction_layouts[
+            layout_index
+        ]
+        offset = self.distribution_offsets[index]
+        is_list = isinstance(distribution_layout, int)
+        size = distribution_layout if is_list else len(distribution_layout)
+        values = self.distribution_values[offset : offset + size].tolist()
+        if integers:
+            values = [int(value) for value in values]
+        prediction = {
+            "value": self.values[self.value_indices[index]],
+            "confidence": self.confidences[index],
+            "distribution": values
+            if is_list
+            else dict(zip(distribution_layout, values)),
+            "nb_samples": self.nb_samples[index],
+        }
+        return {key: prediction[key] for key in prediction_keys}
+
+    @staticmethod
+    def _code(codes, values, key):
+        """Gives the index of a value in the table of its kind, adding it."""
+        if key not in codes:
+            if key[1] in values:
+                codes[key] = values.index(key[1])
+            else:
+                codes[key] = len(values)
+                values.append(key[1])
+        return codes[key]
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def trees(self):
+        """The root of each output tree, by output, as read-only dicts."""
+        return {output: FlatNode(self, index) for output, index in self.roots.items()}
+
+    def as_tree(self):
+        """Gives the tree as a dict whose nodes are read from the arrays, in
+        the format of the trees retrieved from craft ai."""
+        return dict(self.header, trees=self.trees)
+
+    def to_dict(self):
+        """Gives the tree as nested dicts, as retrieved from craft ai.
+
+        :return: decision tree.
+        :rtype: dict.
+        """
+        return copy.deepcopy(
+            dict(
+                self.header,
+                trees={output: node.to_dict() for output, node in self.trees.items()},
+            )
+        )
+
+
+class FlatNode(Mapping):
+    """Node of a `FlatTree`, a read-only dict having the keys of the node of
+    the original tree."""
+
+    __slots__ = ("_tree", "_index")
+
+    def __init__(self, tree, index):
+        self._tree = tree
+        self._index = index
+
+    def __getitem__(self, key):
+        tree = self._tree
+        index = self._index
+        if key == "children":
+            offset = tree.child_offsets[index]
+            if offset < 0:
+                raise KeyError(key)
+            return [
+                FlatNode(tree, child)
+                for child in range(offset, offset + tree.child_counts[index])
+            ]
+        if key == "decision_rule":
+            feature = tree.features[index]
+            if feature < 0:
+                raise KeyError(key)
+            return {
+                "property": tree.properties[feature],
+                "operator": tree.operators[tree.operator_codes[index]],
+                "operand": tree.operands[tree.operand_indices[index]],
+            }
+        if key == "prediction":
+            layout_index = tree.prediction_layout_indices[index]
+            if layout_index >= 0:
+                return tree._prediction(index, layout_index)
+        payload_index = tree.payload_indices[index]
+        if payload_index < 0:
+            raise KeyError(key)
+        return tree.payloads[payload_index][key]
+
+    def __iter__(self):
+        tree = self._tree
+        index = self._index
+        if tree.features[index] >= 0:
+            yield "decision_rule"
+        if tree.child_offsets[index] >= 0:
+            yield "children"
+        if tree.prediction_layout_indices[index] >= 0:
+            yield "prediction"
+        payload_index = tree.payload_indices[index]
+        if payload_index >= 0:
+            yield from tree.payloads[payload_index]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        """Gives the node and its descendants as nested dicts."""
+        node = dict(self)
+        if "children" in node:
+            node["children"] = [child.to_dict() for child in node["children"]]
+        return node
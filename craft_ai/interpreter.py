@@ -2,6 +2,7 @@ import re
 import semver
 
 from craft_ai.errors import CraftAiDecisionError
+from craft_ai.flat_tree import FlatTree
 from craft_ai.time import Time
 from craft_ai.timezones import get_timezone_key, timezone_offset_in_standard_format
 from craft_ai.interpreter_v1 import InterpreterV1
@@ -145,6 +146,9 @@ class Interpreter(object):
 
     @staticmethod
     def _parse_tree(tree_object):
+        if isinstance(tree_object, FlatTree):
+            # Its nodes are read from its arrays
+            tree_object = tree_object.as_tree()
         # Checking definition of tree_object
         if not isinstance(tree_object, dict):
             raise CraftAiDecisionError(
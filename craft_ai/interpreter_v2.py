@@ -161,12 +161,21 @@ class InterpreterV2(object):
 
     @staticmethod
     def compute_distribution(node, output_values, output_type, path):
-        result = InterpreterV2._distribution(node, output_type)
+        return InterpreterV2._format_distribution(
+            InterpreterV2._distribution(node, output_type),
+            output_values,
+            output_type,
+            path,
+        )
+
+    @staticmethod
+    def _format_distribution(result, output_values, output_type, path):
         if output_type in ["enum", "boolean"]:
             distribution, nb_samples = result
             final_result = {
                 "predicted_value": output_values[distribution.index(max(distribution))],
-                "distribution": distribution,
+                # The distribution of a node may be computed once for many decisions
+                "distribution": list(distribution),
                 "nb_samples": nb_samples,
             }
         else:
@@ -214,6 +223,11 @@ class InterpreterV2(object):
             return InterpreterV2._distribution(_child, output_type)
 
         values_sizes = list(map(recurse, node.get("children")))
+        return InterpreterV2._mean_distribution(values_sizes, output_type)
+
+    @staticmethod
+    def _mean_distribution(values_sizes, output_type):
+        # Aggregates the distributions/means and sizes of the children of a node
         if output_type in ["enum", "boolean"]:
             # It is a classification problem
             values, sizes = zip(*values_sizes)
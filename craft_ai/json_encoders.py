@@ -0,0 +1,65 @@
+import json
+
+try:
+    import orjson
+
+    ORJSON_ENABLED = True
+except ImportError:
+    orjson = None
+    ORJSON_ENABLED = False
+
+
+class JsonEncoder(object):
+    """Serializes the payloads of the requests in json with python's json
+    module.
+
+    Any object with a `dumps` method returning the json of a payload in utf-8
+    bytes, and raising a `TypeError` for a payload that can't be serialized,
+    can be given as the `jsonEncoder` client configuration.
+    """
+
+    def dumps(self, payload):
+        """Serializes a payload in json.
+
+        :param payload: the payload to serialize.
+
+        :return: the json of the payload.
+        :rtype: bytes.
+
+        :raises TypeError: if the payload can't be serialized in json.
+        """
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonEncoder(JsonEncoder):
+    """Serializes the payloads of the requests in json with orjson, directly
+    into bytes.
+
+    It is given as the `jsonEncoder` client configuration to be used. Numpy
+    values are also serialized, as well as the non string keys of dicts, and
+    unlike `JsonEncoder` NaN and infinite floats are serialized as null, the
+    missing value. It requires the `orjson` extra
+    (`pip install craft-ai[orjson]`).
+    """
+
+    def __init__(self):
+        if not ORJSON_ENABLED:
+            raise ImportError(
+                "orjson is required to serialize the payloads with it, "
+                "install it with `pip install craft-ai[orjson]`."
+            )
+        self._option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, payload):
+        # orjson.JSONEncodeError is a TypeError
+        return orjson.dumps(payload, option=self._option)
+
+
+def join_json_array(encoded_values):
+    """Gives the json array of values already serialized in json.
+
+    :param list encoded_values: the json of each value, in bytes.
+
+    :rtype: bytes.
+    """
+    return b"[" + b",".join(encoded_values) + b"]"
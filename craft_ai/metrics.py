@@ -0,0 +1,378 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+from urllib.parse import urlparse
+
+# Upper bounds of the buckets of the latency histograms, in milliseconds
+DEFAULT_LATENCY_BUCKETS_MS = (
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    30000,
+    60000,
+)
+# Path segments followed by the id of an entity
+ENTITY_SEGMENTS = ("agents", "generators")
+
+# The call of a client method whose requests are being sent
+_current_call = contextvars.ContextVar("craft_ai_current_call", default=None)
+
+
+class Histogram(object):
+    """Distribution of values in buckets of fixed upper bounds."""
+
+    def __init__(self, bounds=DEFAULT_LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        # The last bucket counts the values above every bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates the `q`-quantile of the values, as the upper bound of its
+        bucket, the maximum value for the last bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulated = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulated += count
+            if cumulated >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            # The upper bound of the last bucket is None, for json exports
+            "buckets": [
+                [bound, count]
+                for bound, count in zip(self.bounds + (None,), self.counts)
+            ],
+        }
+
+
+class _Summary(object):
+    """Aggregates of the calls or requests of a same key."""
+
+    def __init__(self, bounds):
+        self.latency_ms = Histogram(bounds)
+        self.errors = 0
+        self.requests = 0
+        self.retries = 0
+        self.pages = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def record(self, event):
+        self.latency_ms.record(event["latency_ms"])
+        self.errors += int(event["error"] is not None)
+        self.requests += event.get("requests", 1)
+        self.retries += event["retries"]
+        self.pages += event.get("pages", 0)
+        self.request_bytes += event["request_bytes"]
+        self.response_bytes += event["response_bytes"]
+        status_code = event.get("status_code")
+        if status_code is not None:
+            self.statuses[str(status_code)] = self.statuses.get(str(status_code), 0) + 1
+
+    def to_dict(self):
+        return {
+            "latency_ms": self.latency_ms.to_dict(),
+            "errors": self.errors,
+            "requests": self.requests,
+            "retries": self.retries,
+            "pages": self.pages,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "statuses": dict(self.statuses),
+        }
+
+
+class Metrics(object):
+    """Instrumentation of the calls of the methods of a client and of their
+    HTTP requests, to be given as its `metrics` configuration.
+
+    Each call of a method, such as `add_agent_operations`, and each request
+    sent, retries included, is recorded in latency histograms by method, by
+    endpoint and by agent, along with the bytes sent and received, the
+    statuses of the responses, the retries and the pages of paginated
+    resources. The hooks are called with each of these events.
+
+    The same instance can be shared by several clients and threads.
+    """
+
+    def __init__(self, hooks=None, buckets_ms=DEFAULT_LATENCY_BUCKETS_MS):
+        """
+        :param list hooks: Optional. The functions called with the event of
+        each call and of each request, a dict whose "type" is "call" or
+        "request".
+        :default hooks: None.
+        :param buckets_ms: Optional. The upper bounds of the buckets of the
+        latency histograms, in milliseconds.
+        :type buckets_ms: tuple of float.
+        :default buckets_ms: from 5 milliseconds to a minute.
+        """
+        self.hooks = list(hooks or [])
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add_hook(self, hook):
+        """Adds a function called with the event of each call and of each
+        request."""
+        self.hooks.append(hook)
+
+    def reset(self):
+        """Forgets the calls and the requests recorded so far."""
+        with self._lock:
+            self._calls = {}
+            self._requests = {}
+            self._agents = {}
+
+    def _summary(self, summaries, key):
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = _Summary(self.buckets_ms)
+        return summary
+
+    def record_request(self, event):
+        """Records the event of a request, counted in the call it was sent
+        for."""
+        call = _current_call.get()
+        with self._lock:
+            if call is not None and call["metrics"] is self:
+                event["call"] = call["name"]
+                event["agent_id"] = call["agent_id"]
+                call["requests"] += 1
+                call["retries"] += event["retries"]
+                call["request_bytes"] += event["request_bytes"]
+                call["response_bytes"] += event["response_bytes"]
+            else:
+                event["call"] = None
+                event["agent_id"] = None
+            self._summary(
+                self._requests, "{} {}".format(event["method"], event["endpoint"])
+            ).record(event)
+        self._call_hooks(event)
+
+    def record_call(self, event):
+        """Records the event of a call, once it returned or raised."""
+        with self._lock:
+            self._summary(self._calls, event["name"]).record(event)
+            if event["agent_id"] is not None:
+                self._summary(self._agents, event["agent_id"]).record(event)
+        self._call_hooks(event)
+
+    def _call_hooks(self, event):
+        for hook in self.hooks:
+            hook(event)
+
+    def snapshot(self):
+        """Get the aggregates of the recorded calls and requests.
+
+        :return: the aggregates of the "calls" by method name, of the
+        "requests" by method and endpoint, such as "POST agents/{id}/context",
+        and of the calls of each agent in "agents", by agent id. Each has the
+        "latency_ms" histogram, the number of "errors", "requests", "retries"
+        and "pages", the "request_bytes" sent and "response_bytes" received,
+        and the number of responses by status code in "statuses". It can be
+        serialized in json.
+        :rtype: dict.
+        """
+        with self._lock:
+            return {
+                key: {name: summary.to_dict() for name, summary in summaries.items()}
+                for key, summaries in (
+                    ("calls", self._calls),
+                    ("requests", self._requests),
+                    ("agents", self._agents),
+                )
+            }
+
+
+def endpoint_of(url, base_url):
+    """Gives the endpoint of a request, the path of its url relative to the
+    base url of the client, the ids of the entities being replaced by "{id}".
+    """
+    path = urlparse(url).path
+    base_path = urlparse(base_url).path
+    if path.startswith(base_path):
+        path = path[len(base_path) :]
+    segments = path.strip("/").split("/")
+    for index in range(1, len(segments)):
+        if segments[index - 1] in ENTITY_SEGMENTS:
+            segments[index] = "{id}"
+    return "/".join(segments)
+
+
+def count_page():
+    """Counts a page received in the call being recorded, if any."""
+    call = _current_call.get()
+    if call is not None:
+        with call["metrics"]._lock:
+            call["pages"] += 1
+
+
+def _new_call(metrics, name, agent_id):
+    return {
+        "type": "call",
+        "name": name,
+        "agent_id": agent_id,
+        "metrics": metrics,
+        "requests": 0,
+        "retries": 0,
+        "pages": 0,
+        "request_bytes": 0,
+        "response_bytes": 0,
+        "start": time.perf_counter(),
+    }
+
+
+def _end_call(call, error=None):
+    event = dict(call)
+    metrics = event.pop("metrics")
+    start = event.pop("start")
+    event["latency_ms"] = 1000 * (time.perf_counter() - start)
+    event["error"] = None if error is None else type(error).__name__
+    metrics.record_call(event)
+
+
+def _iterate(call, iterator):
+    """Yields the items of an iterator given by a method, the call ending with
+    the iteration."""
+    error = None
+    try:
+        while True:
+            token = _current_call.set(call)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _current_call.reset(token)
+            yield item
+    except Exception as err:
+        error = err
+        raise
+    finally:
+        iterator.close()
+        _end_call(call, error)
+
+
+async def _aiterate(call, iterator):
+    """Yields the items of an asynchronous iterator given by a method, the
+    call ending with the iteration."""
+    error = None
+    try:
+        while True:
+            token = _current_call.set(call)
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _current_call.reset(token)
+            yield item
+    except Exception as err:
+        error = err
+        raise
+    finally:
+        await iterator.aclose()
+        _end_call(call, error)
+
+
+def instrumented(function):
+    """Decorates a method of a client so that its calls are recorded by the
+    `metrics` of the client.
+
+    The calls made by an instrumented call aren't recorded on their own, their
+    requests being counted in the outer call. The calls of the methods giving
+    an iterator end with the iteration.
+    """
+    parameters = list(inspect.signature(function).parameters)
+    agent_id_index = parameters.index("agent_id") if "agent_id" in parameters else None
+
+    def start_call(client, args, kwargs):
+        metrics = client._config.get("metrics")
+        if metrics is None or _current_call.get() is not None:
+            return None
+        agent_id = kwargs.get("agent_id")
+        if agent_id is None and agent_id_index is not None:
+            # The index of the arguments includes self
+            if len(args) >= agent_id_index:
+                agent_id = args[agent_id_index - 1]
+        return _new_call(metrics, function.__name__, agent_id)
+
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def async_wrapper(client, *args, **kwargs):
+            call = start_call(client, args, kwargs)
+            if call is None:
+                return await function(client, *args, **kwargs)
+            token = _current_call.set(call)
+            try:
+                result = await function(client, *args, **kwargs)
+            except Exception as err:
+                _end_call(call, err)
+                raise
+            finally:
+                _current_call.reset(token)
+            _end_call(call)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(client, *args, **kwargs):
+        call = start_call(client, args, kwargs)
+        if call is None:
+            return function(client, *args, **kwargs)
+        token = _current_call.set(call)
+        try:
+            result = function(client, *args, **kwargs)
+        except Exception as err:
+            _end_call(call, err)
+            raise
+        finally:
+            _current_call.reset(token)
+        if inspect.isgenerator(result):
+            return _iterate(call, result)
+        if inspect.isasyncgen(result):
+            return _aiterate(call, result)
+        _end_call(call)
+        return result
+
+    return wrapper
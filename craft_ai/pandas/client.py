@@ -1,23 +1,19 @@
-import json
 import pandas as pd
 
 from .. import Client as VanillaClient
 from ..constants import DEFAULT_DECISION_TREE_VERSION
 from ..errors import CraftAiBadRequestError
+from ..json_encoders import join_json_array
+from ..metrics import instrumented
+from .columnar import DataFrameBuilder, EncodedOperations, encode_operations
 from .interpreter import Interpreter
-from .utils import format_input, is_valid_property_value, create_timezone_df
-
-
-def chunker(to_be_chunked_df, chunk_size):
-    return (
-        to_be_chunked_df[pos : pos + chunk_size]
-        for pos in range(0, len(to_be_chunked_df), chunk_size)
-    )
+from .utils import create_timezone_df
 
 
 class Client(VanillaClient):
     """Client class for craft ai's API using pandas dataframe types"""
 
+    @instrumented
     def add_agent_operations(self, agent_id, operations):
         if isinstance(operations, pd.DataFrame):
             if not isinstance(operations.index, pd.DatetimeIndex):
@@ -30,7 +26,6 @@ class Client(VanillaClient):
                                      it must be tz-aware."""
                 )
             agent = super(Client, self).get_agent(agent_id)
-            operations = operations.copy(deep=True)
 
             tz_col = [
                 key
@@ -39,23 +34,17 @@ class Client(VanillaClient):
             ]
             if tz_col:
                 tz_col = tz_col[0]
+                # The given DataFrame isn't modified
+                operations = operations.copy(deep=False)
                 operations[tz_col] = create_timezone_df(operations, tz_col).iloc[:, 0]
 
-            chunk_size = self.config["operationsChunksSize"]
-            for chunk in chunker(operations, chunk_size):
-                chunk_operations = [
-                    {
-                        "timestamp": row.name.value
-                        // 10 ** 9,  # Timestamp.value returns nanoseconds
-                        "context": {
-                            col: format_input(row[col])
-                            for col in chunk.columns
-                            if is_valid_property_value(col, row[col])
-                        },
-                    }
-                    for _, row in chunk.iterrows()
-                ]
-                super(Client, self).add_agent_operations(agent_id, chunk_operations)
+            if len(operations):
+                self._add_agent_operations_chunks(
+                    agent_id,
+                    self._chunk_operations(
+                        self._encode_operations(operations), agent_id
+                    ),
+                )
 
             return {
                 "message": 'Successfully added %i operation(s) to the agent "%s/%s/%s" context.'
@@ -69,6 +58,7 @@ class Client(VanillaClient):
         else:
             return super(Client, self).add_agent_operations(agent_id, operations)
 
+    @instrumented
     def add_agents_operations_bulk(self, payload):
         """Add operations to a group of agents.
 
@@ -89,7 +79,7 @@ class Client(VanillaClient):
         referenced non existing agents or one of the operations is invalid.
         """
         # Check all ids, raise an error if all ids are invalid
-        valid_indices, _, _ = self._check_entity_id_bulk(
+        valid_indices, _, _, _ = self._check_entity_id_bulk(
             payload, check_serializable=False
         )
         valid_payload = [payload[i] for i in valid_indices]
@@ -109,22 +99,13 @@ class Client(VanillaClient):
                         "agent {}, it must be tz-aware.".format(agent["id"])
                     )
 
-                new_operations = [
+                new_payload.append(
                     {
-                        "timestamp": row.name.value
-                        // 10 ** 9,  # Timestamp.value returns nanoseconds
-                        "context": {
-                            col: row[col]
-                            for col in operations.columns
-                            if is_valid_property_value(col, row[col])
-                        },
+                        "id": agent["id"],
+                        "operations": self._encode_operations(operations),
                     }
-                    for _, row in operations.iterrows()
-                ]
-                new_payload.append({"id": agent["id"], "operations": new_operations})
+                )
             elif isinstance(operations, list):
-                # Check if the operations are serializable
-                json.dumps([agent])
                 new_payload.append({"id": agent["id"], "operations": operations})
             else:
                 raise CraftAiBadRequestError(
@@ -134,24 +115,63 @@ class Client(VanillaClient):
 
         return super(Client, self).add_agents_operations_bulk(new_payload)
 
-    def get_agent_operations(self, agent_id, start=None, end=None):
-        operations_list = super(Client, self).get_agent_operations(agent_id, start, end)
-        return pd.DataFrame(
-            [operation["context"] for operation in operations_list],
-            index=pd.to_datetime(
-                [operation["timestamp"] for operation in operations_list], unit="s"
-            ).tz_localize("UTC"),
+    def _encode_operations(self, operations_df):
+        try:
+            return encode_operations(operations_df, self._config["jsonEncoder"])
+        except TypeError as err:
+            raise CraftAiBadRequestError(
+                "Error while dumping the operations into json. {}".format(err)
+            )
+
+    def _dump_operations(self, operations):
+        if isinstance(operations, EncodedOperations):
+            return operations.to_json()
+        return super(Client, self)._dump_operations(operations)
+
+    def _dump_agents_operations(self, agents):
+        return join_json_array(
+            [
+                b'{"id":'
+                + self._encode_json(agent["id"])
+                + b',"operations":'
+                + self._dump_operations(agent["operations"])
+                + b"}"
+                for agent in agents
+            ]
         )
 
-    def get_agent_states(self, agent_id, start=None, end=None):
-        states = super(Client, self).get_agent_states(agent_id, start, end)
+    @instrumented
+    def get_agent_operations(self, agent_id, start=None, end=None, dtypes=None):
+        """Get the operations of an agent in a DataFrame, each page of operations
+        being added to the columns of the DataFrame once received.
 
-        return pd.DataFrame(
-            [state["sample"] for state in states],
-            index=pd.to_datetime(
-                [state["timestamp"] for state in states], unit="s"
-            ).tz_localize("UTC"),
-        )
+        :param dict dtypes: Optional. The dtype of some of the columns, e.g.
+        `craft_ai.pandas.columnar.dtypes_from_configuration(configuration)` for
+        the properties of an agent configuration.
+        :default dtypes: None, the dtypes are inferred from the values.
+
+        See `craft_ai.Client.get_agent_operations` for the other parameters.
+
+        :rtype: pandas.DataFrame.
+        """
+        builder = DataFrameBuilder(dtypes)
+        for operations in self.iter_agent_operations(
+            agent_id, start, end, by_page=True
+        ):
+            builder.extend(operations, "context")
+        return builder.build()
+
+    @instrumented
+    def get_agent_states(self, agent_id, start=None, end=None, dtypes=None):
+        """Get the states of an agent in a DataFrame, see
+        `craft_ai.pandas.Client.get_agent_operations` for the parameters.
+
+        :rtype: pandas.DataFrame.
+        """
+        builder = DataFrameBuilder(dtypes)
+        for states in self.iter_agent_states(agent_id, start, end, by_page=True):
+            builder.extend(states, "sample")
+        return builder.build()
 
     @staticmethod
     def decide_from_contexts_df(tree, contexts_df):
@@ -169,6 +189,7 @@ class Client(VanillaClient):
             raise CraftAiBadRequestError("Invalid data given, it is not a DataFrame.")
         return Interpreter.decide_from_contexts_df(tree, contexts_df)
 
+    @instrumented
     def get_agent_decision_tree(
         self, agent_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
     ):
@@ -178,6 +199,7 @@ class Client(VanillaClient):
 
         return super(Client, self).get_agent_decision_tree(agent_id, timestamp, version)
 
+    @instrumented
     def get_generator_decision_tree(
         self, generator_id, timestamp=None, version=DEFAULT_DECISION_TREE_VERSION
     ):
@@ -0,0 +1,272 @@
+import json
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from .constants import MISSING_VALUE, OPTIONAL_VALUE
+from ..json_encoders import JsonEncoder
+from .utils import DUMMY_COLUMN_NAME
+
+_FLOAT_TYPES = ["continuous", "time_of_day"]
+_INTEGER_TYPES = ["day_of_week", "day_of_month", "month_of_year"]
+
+
+def dtypes_from_configuration(configuration):
+    """Gives the dtype of the column of each context property of an agent
+    configuration, to be used as the `dtypes` of `DataFrameBuilder`.
+
+    Numerical properties are floats, missing values being NaN, enum and
+    timezone properties are categories and boolean properties are nullable
+    booleans.
+
+    :param dict configuration: the configuration of an agent.
+
+    :return: the dtype of each property.
+    :rtype: dict.
+    """
+    dtypes = {}
+    for property_name, property_configuration in configuration["context"].items():
+        property_type = property_configuration["type"]
+        if property_type in _FLOAT_TYPES or property_type in _INTEGER_TYPES:
+            dtypes[property_name] = "float64"
+        elif property_type in ["enum", "timezone"]:
+            dtypes[property_name] = "category"
+        elif property_type == "boolean":
+            dtypes[property_name] = "boolean"
+    return dtypes
+
+
+class _ColumnBuffer(object):
+    """Values of a column, NaN where the column isn't set.
+
+    Float columns are kept in an array of doubles and category columns in an
+    array of codes, other columns in a list of objects sharing the equal
+    strings. A value not fitting in a typed buffer turns it into a list,
+    ignoring the dtype of the column.
+    """
+
+    def __init__(self, dtype=None):
+        self.dtype = dtype
+        if dtype is not None and pd.api.types.is_float_dtype(dtype):
+            self._values = array("d")
+        elif dtype == "category":
+            self._values = array("i")
+            self._categories = {}
+        else:
+            self._values = []
+            self._strings = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def pad(self, length):
+        missing_count = length - len(self._values)
+        if missing_count <= 0:
+            return
+        if isinstance(self._values, list):
+            self._values.extend([np.nan] * missing_count)
+        elif self._values.typecode == "d":
+            self._values.extend(array("d", [np.nan]) * missing_count)
+        else:
+            self._values.extend(array("i", [-1]) * missing_count)
+
+    def append(self, value):
+        values = self._values
+        if isinstance(values, list):
+            if isinstance(value, str):
+                value = self._strings.setdefault(value, value)
+            values.append(value)
+        elif values.typecode == "d":
+            if value is None:
+                values.append(np.nan)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.append(value)
+            else:
+                self._to_list()
+                self.append(value)
+        elif value is None:
+            values.append(-1)
+        elif isinstance(value, str):
+            values.append(self._categories.setdefault(value, len(self._categories)))
+        else:
+            self._to_list()
+            self.append(value)
+
+    def _to_list(self):
+        values = self.to_array()
+        self._values = values.astype(object).tolist()
+        self._strings = {}
+        self.dtype = None
+
+    def to_array(self):
+        values = self._values
+        if isinstance(values, list):
+            return np.array(values, dtype=object)
+        if values.typecode == "d":
+            return np.frombuffer(values, dtype="float64") if values else np.empty(0)
+        codes = np.frombuffer(values, dtype=np.intc) if values else np.empty(0, np.intc)
+        return pd.Categorical.from_codes(codes, categories=list(self._categories))
+
+    def to_series(self, index):
+        values = self._values
+        if isinstance(values, list):
+            # Same dtype inference as a DataFrame built from a list of dicts
+            series = pd.Series(values, index=index)
+            series = series.infer_objects() if len(values) else series
+        else:
+            series = pd.Series(self.to_array(), index=index, copy=False)
+        if self.dtype is not None and series.dtype != self.dtype:
+            series = series.astype(self.dtype)
+        return series
+
+
+class DataFrameBuilder(object):
+    """Builds a time indexed DataFrame from timestamped values, the values of
+    each column being appended to a typed buffer.
+
+    Columns are in their order of appearance, a column being NaN for the rows
+    where it isn't set. The DataFrame is the same as the one built from the
+    list of the values when no `dtypes` are given.
+    """
+
+    def __init__(self, dtypes=None):
+        """
+        :param dict dtypes: Optional. The dtype of some of the columns.
+        """
+        self._dtypes = dtypes or {}
+        self._timestamps = array("q")
+        self._columns = {}
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def append(self, timestamp, values):
+        """Appends a row.
+
+        :param int timestamp: the timestamp of the row, in seconds.
+        :param dict values: the value of each column set in the row.
+        """
+        row = len(self._timestamps)
+        self._timestamps.append(timestamp)
+        columns = self._columns
+        for name, value in values.items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = _ColumnBuffer(self._dtypes.get(name))
+            if len(column) < row:
+                column.pad(row)
+            column.append(value)
+
+    def extend(self, items, key):
+        """Appends a row for each item, their values being the `key` of the
+        item and their timestamp its "timestamp"."""
+        for item in items:
+            self.append(item["timestamp"], item[key])
+
+    def build(self):
+        """Builds the DataFrame, in UTC.
+
+        :rtype: pandas.DataFrame.
+        """
+        index = pd.to_datetime(
+            np.array(self._timestamps, dtype="int64"), unit="s"
+        ).tz_localize("UTC")
+        columns = {}
+        for name, column in self._columns.items():
+            column.pad(len(index))
+            columns[name] = column.to_series(index)
+        return pd.DataFrame(columns, index=index)
+
+
+class EncodedOperations(list):
+    """Operations serialized in json, one string per operation, that the
+    pandas client sends as they are. Its slices are also encoded operations.
+    """
+
+    def __getitem__(self, index):
+        items = list.__getitem__(self, index)
+        return EncodedOperations(items) if isinstance(index, slice) else items
+
+    def to_json(self):
+        """Gives the json array of the operations, in utf-8 bytes."""
+        return ("[" + ",".join(self) + "]").encode("utf-8")
+
+
+def encode_operations(df, json_encoder=None):
+    """Serializes each row of a tz-aware time indexed DataFrame in json as an
+    operation, column by column.
+
+    Like for a row by row serialization, the context of an operation doesn't
+    have the null, NaN or sequence values of its row, MISSING_VALUE is
+    serialized as null and OPTIONAL_VALUE as {}.
+
+    :param pandas.DataFrame df: the operations.
+    :param json_encoder: Optional. The encoder serializing each distinct
+    value, such as the `jsonEncoder` of a client.
+    :default json_encoder: `craft_ai.json_encoders.JsonEncoder`.
+
+    :return: the operations in json.
+    :rtype: EncodedOperations.
+
+    :raises TypeError: if a value can't be serialized in json.
+    """
+    if json_encoder is None:
+        json_encoder = JsonEncoder()
+    fragments = np.full(len(df), "", dtype=object)
+    duplicated_columns = df.columns.duplicated(keep=False)
+    for position, name in enumerate(df.columns):
+        # Like the values of duplicated columns, sequences aren't sent
+        if name == DUMMY_COLUMN_NAME or duplicated_columns[position]:
+            continue
+        fragments += _encode_column(name, df.iloc[:, position], json_encoder)
+
+    # Removes the trailing comma of each non empty context
+    contexts = pd.Series(fragments, dtype=object).str[:-1].to_numpy()
+    timestamps = (df.index.asi8 // 10 ** 9).astype(str).astype(object)
+    operations = '{"timestamp":' + timestamps + ',"context":{' + contexts + "}}"
+    return EncodedOperations(operations.tolist())
+
+
+def _encode_value(value, json_encoder):
+    if value is MISSING_VALUE:
+        return "null"
+    if value is OPTIONAL_VALUE:
+        return "{}"
+    if (hasattr(value, "__len__") and not isinstance(value, str)) or pd.isna(value):
+        return None
+    return json_encoder.dumps(value).decode("utf-8")
+
+
+def _encode_column(name, series, json_encoder):
+    """Gives the `"name":value,` fragment of each value of a column, an empty
+    string for the values that aren't sent."""
+    prefix = json.dumps(str(name)) + ":"
+    try:
+        codes, uniques = pd.factorize(
+            series.array
+            if pd.api.types.is_categorical_dtype(series.dtype)
+            else series.to_numpy()
+        )
+        uniques = uniques.tolist()
+        # Equal booleans and numbers would get the same fragment
+        if series.dtype == object and any(isinstance(u, bool) for u in uniques):
+            raise TypeError()
+    except TypeError:
+        # Unhashable values or booleans mixed with numbers
+        fragments = np.empty(len(series), dtype=object)
+        for i, value in enumerate(series.tolist()):
+            encoded_value = _encode_value(value, json_encoder)
+            fragments[i] = "" if encoded_value is None else prefix + encoded_value + ","
+        return fragments
+
+    # Missing values, coded -1, take the last empty fragment
+    unique_fragments = np.empty(len(uniques) + 1, dtype=object)
+    for i, value in enumerate(uniques):
+        encoded_value = _encode_value(value, json_encoder)
+        unique_fragments[i] = (
+            "" if encoded_value is None else prefix + encoded_value + ","
+        )
+    unique_fragments[-1] = ""
+    return unique_fragments[codes]
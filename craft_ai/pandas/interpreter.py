@@ -1,15 +1,126 @@
+import numbers
+
+import numpy as np
 import pandas as pd
 
 from .. import Interpreter as VanillaInterpreter, Time
-from ..errors import CraftAiNullDecisionError
-from .utils import is_valid_property_value, create_timezone_df, format_input
+from ..compiled_tree import CompiledTree
+from ..errors import CraftAiNullDecisionError, CraftAiTimeError
+from ..interpreter_v2 import InterpreterV2
+from ..operators import OPERATORS, OPERATORS_FUNCTION
+from ..timezones import timezone_offset_in_standard_format
+from .utils import (
+    DUMMY_COLUMN_NAME,
+    is_valid_property_value,
+    create_time_features,
+    create_timezone_df,
+    format_input,
+)
+
+_OPERATORS_NAMES = {
+    OPERATORS_FUNCTION[operator]: operator for operator in OPERATORS.values()
+}
+
+
+def _interval(values, operand):
+    if operand[0] < operand[1]:
+        return (values >= operand[0]) & (values < operand[1])
+    return (values >= operand[0]) | (values < operand[1])
+
+
+# Operators that can be evaluated on a whole float column, missing values being NaN
+_NUMERICAL_OPERATORS_FUNCTION = {
+    OPERATORS["GTE"]: lambda values, operand: values >= operand,
+    OPERATORS["LT"]: lambda values, operand: values < operand,
+    OPERATORS["IN_INTERVAL"]: _interval,
+}
+
+
+class _FallbackToRows(Exception):
+    """The given contexts can't be handled column by column."""
+
+
+class _ContextColumn(object):
+    """Values taken by a context property in every row of a DataFrame.
+
+    Values are stored as `codes` indexing a list of distinct `uniques` values,
+    rows where the property is not defined have a -1 code. Numerical columns
+    also keep their values as floats, NaN standing for not defined.
+    """
+
+    def __init__(self, codes, uniques, floats=None):
+        self.codes = codes
+        self.uniques = uniques
+        self.present = codes >= 0
+        self._floats = floats
+
+    @staticmethod
+    def from_values(name, values):
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            codes, uniques = pd.factorize(values)
+            floats = values.astype(float)
+            return _ContextColumn(codes, uniques.tolist(), floats)
+
+        values = np.asarray(values, dtype=object)
+        try:
+            codes, uniques = pd.factorize(values)
+        except TypeError:
+            # Unhashable values, e.g. lists, are not valid property values
+            valid = np.array([is_valid_property_value(name, v) for v in values])
+            values = np.where(valid, values, None)
+            codes, uniques = pd.factorize(values)
+        valid_uniques = np.array(
+            [is_valid_property_value(name, u) for u in uniques] + [False]
+        )
+        codes = np.where(valid_uniques[codes], codes, -1)
+        return _ContextColumn(codes, [format_input(u) for u in uniques])
+
+    def floats(self):
+        if self._floats is None:
+            floats_uniques = []
+            for value in self.uniques:
+                if value is None or value == {}:
+                    floats_uniques.append(np.nan)
+                elif isinstance(value, numbers.Real):
+                    floats_uniques.append(float(value))
+                else:
+                    raise _FallbackToRows()
+            self._floats = np.array(floats_uniques + [np.nan])[self.codes]
+        return self._floats
+
+    def is_numerical(self):
+        if self._floats is None:
+            try:
+                self.floats()
+            except _FallbackToRows:
+                return False
+        return True
+
+    def evaluate(self, rows, function, operand):
+        """Evaluates a decision rule for the given rows, returns a boolean mask."""
+        operator = _OPERATORS_NAMES[function]
+        if operator in _NUMERICAL_OPERATORS_FUNCTION and self.is_numerical():
+            bounds = operand if operator == OPERATORS["IN_INTERVAL"] else [operand]
+            if all(isinstance(bound, numbers.Real) for bound in bounds):
+                return _NUMERICAL_OPERATORS_FUNCTION[operator](
+                    self.floats()[rows], operand
+                )
+        # Evaluate the operator once for each distinct value of the given rows
+        codes = self.codes[rows]
+        matches = np.zeros(len(self.uniques) + 1, dtype=bool)
+        for code in np.unique(codes):
+            value = self.uniques[code] if code >= 0 else None
+            matches[code] = function(value, operand)
+        return matches[codes]
 
 
 class Interpreter(VanillaInterpreter):
     @staticmethod
     def decide_from_contexts_df(tree, contexts_df):
-        bare_tree, configuration, tree_version = VanillaInterpreter._parse_tree(tree)
-        interpreter = VanillaInterpreter._get_interpreter(tree_version)
+        compiled_tree = CompiledTree(tree)
+        bare_tree = compiled_tree._bare_tree
+        configuration = compiled_tree.configuration
+        interpreter = compiled_tree._interpreter
 
         df = contexts_df.copy(deep=True)
         tz_col = [
@@ -24,20 +135,202 @@ class Interpreter(VanillaInterpreter):
             tz_col = tz_col[0]
             df[tz_col] = create_timezone_df(contexts_df, tz_col).iloc[:, 0]
 
-        predictions_iter = (
-            Interpreter.decide_from_row(
-                {
-                    "bare_tree": bare_tree,
-                    "context_ops": row,
-                    "tz_col": tz_col,
-                    "configuration": configuration,
-                    "feature_names": df.columns.values,
-                    "interpreter": interpreter,
-                }
+        def decide_from_rows(rows_df):
+            predictions_iter = (
+                Interpreter.decide_from_row(
+                    {
+                        "bare_tree": bare_tree,
+                        "context_ops": row,
+                        "tz_col": tz_col,
+                        "configuration": configuration,
+                        "feature_names": df.columns.values,
+                        "interpreter": interpreter,
+                    }
+                )
+                for row in rows_df.itertuples(name=None)
             )
-            for row in df.itertuples(name=None)
-        )
-        return pd.DataFrame(predictions_iter, index=df.index)
+            return pd.DataFrame(predictions_iter, index=rows_df.index)
+
+        if interpreter is not InterpreterV2 or not configuration or df.empty:
+            return decide_from_rows(df)
+
+        try:
+            result = Interpreter._decide_from_columns(compiled_tree, df, tz_col)
+        except _FallbackToRows:
+            return decide_from_rows(df)
+        if isinstance(result, int):
+            # Decisions can't be taken for this row, deciding from it raises
+            # the same error than the row by row decision.
+            decide_from_rows(df.iloc[[result]])
+            return decide_from_rows(df)
+        return result
+
+    @staticmethod
+    def _decide_from_columns(compiled_tree, df, tz_col):
+        """Takes the decisions for all the rows of `df` at once.
+
+        Each decision rule is evaluated as a boolean mask over the rows
+        reaching its node, rows are then routed to the matching child.
+
+        :return: the decisions DataFrame or, if the decision for one of the rows
+        raises an error, the index of the first of these rows.
+        """
+        nb_rows = len(df)
+
+        columns = Interpreter._context_columns(compiled_tree, df, tz_col)
+
+        # Rows after the first invalid context are never decided upon
+        first_error_row = nb_rows
+        for property_name, validator, is_optional in compiled_tree._validators:
+            column = columns.get(property_name)
+            if column is None:
+                return 0
+            valid_uniques = [
+                value is None
+                or validator is None
+                or validator(value)
+                or bool(is_optional and value == {})
+                for value in column.uniques
+            ]
+            valid_rows = np.array(valid_uniques + [False], dtype=bool)[column.codes]
+            if not valid_rows.all():
+                first_error_row = min(first_error_row, int(np.argmin(valid_rows)))
+
+        results = []
+        results_ids = {}
+        decisions = []
+        null_decision = None
+        for output, root, output_values, output_type in compiled_tree._roots:
+            if root.branches is None and root.error is not None:
+                err = root.error()
+                if isinstance(err, CraftAiNullDecisionError):
+                    null_decision = err.message
+                    break
+            decision = np.full(nb_rows, -1)
+            distributions = {}
+            stack = [(root, np.arange(first_error_row))]
+            while stack:
+                node, rows = stack.pop()
+                if not len(rows):
+                    continue
+                if node.branches is None:
+                    if node.error is not None:
+                        first_error_row = min(first_error_row, int(rows.min()))
+                        continue
+                    result = node.result
+                else:
+                    for property_name, function, operand, child, _ in node.branches:
+                        column = columns.get(property_name)
+                        if column is None:
+                            mask = np.full(len(rows), function(None, operand))
+                        else:
+                            mask = column.evaluate(rows, function, operand)
+                        stack.append((child, rows[mask]))
+                        rows = rows[~mask]
+                        if not len(rows):
+                            break
+                    if not len(rows):
+                        continue
+                    if id(node) not in distributions:
+                        try:
+                            distributions[id(node)] = CompiledTree._distribution_v2(
+                                node, output_values, output_type
+                            )
+                        except Exception:  # pylint: disable=broad-except
+                            distributions[id(node)] = None
+                    result = distributions[id(node)]
+                    if result is None:
+                        first_error_row = min(first_error_row, int(rows.min()))
+                        continue
+                if id(result) not in results_ids:
+                    results_ids[id(result)] = len(results)
+                    results.append((output, result))
+                decision[rows] = results_ids[id(result)]
+            decisions.append(decision)
+
+        if first_error_row < nb_rows:
+            return first_error_row
+
+        if null_decision is not None:
+            errors = {"error": np.full(nb_rows, null_decision, dtype=object)}
+            return pd.DataFrame(errors, index=df.index).infer_objects()
+        return Interpreter._build_decisions_df(df.index, decisions, results)
+
+    @staticmethod
+    def _context_columns(compiled_tree, df, tz_col):
+        columns = {}
+        for property_name in compiled_tree._context_properties:
+            if property_name in df.columns and property_name != DUMMY_COLUMN_NAME:
+                series = df[property_name]
+                if isinstance(series, pd.DataFrame):
+                    # Duplicated column names
+                    raise _FallbackToRows()
+                columns[property_name] = _ContextColumn.from_values(
+                    property_name, series.to_numpy()
+                )
+
+        if compiled_tree._generated_properties:
+            for property_name, values in Interpreter._generated_time_values(
+                compiled_tree, df, tz_col, columns
+            ).items():
+                codes, uniques = pd.factorize(values)
+                columns[property_name] = _ContextColumn(
+                    codes, uniques.tolist(), values.astype(float)
+                )
+
+        timezone_key = compiled_tree._timezone_key
+        if timezone_key in columns:
+            column = columns[timezone_key]
+            column.uniques = [
+                timezone_offset_in_standard_format(value) for value in column.uniques
+            ]
+        return columns
+
+    @staticmethod
+    def _generated_time_values(compiled_tree, df, tz_col, columns):
+        timezones = None
+        if tz_col:
+            timezones = columns.get(tz_col)
+            if timezones is None or not timezones.present.all():
+                raise _FallbackToRows()
+            timezones = np.array(timezones.uniques, dtype=object)[timezones.codes]
+        try:
+            time_features = create_time_features(df.index, timezones)
+        except CraftAiTimeError:
+            raise _FallbackToRows()
+        return {
+            property_name: time_features[property_type]
+            for property_name, property_type in compiled_tree._generated_properties
+        }
+
+    @staticmethod
+    def _build_decisions_df(index, decisions, results):
+        """Builds the decisions DataFrame from the index of the result of each
+        row for each output, the columns are the same as the ones of a DataFrame
+        built from the list of the flattened decisions."""
+        nb_rows = len(index)
+        # Columns are ordered by first appearance in the rows
+        decisions = np.stack(decisions, axis=1)
+        _, first_rows = np.unique(decisions, axis=0, return_index=True)
+        columns = {}
+        for row in sorted(first_rows):
+            for result_id in decisions[row]:
+                output, result = results[result_id]
+                for key in result:
+                    name = "{}_{}".format(output, key)
+                    if name not in columns:
+                        columns[name] = np.full(nb_rows, np.nan, dtype=object)
+
+        value = np.empty(1, dtype=object)
+        for output_decisions in decisions.T:
+            order = np.argsort(output_decisions, kind="stable")
+            result_ids, starts = np.unique(output_decisions[order], return_index=True)
+            for result_id, rows in zip(result_ids, np.split(order, starts[1:])):
+                output, result = results[result_id]
+                for key, result_value in result.items():
+                    value[0] = result_value
+                    columns["{}_{}".format(output, key)][rows] = value
+        return pd.DataFrame(columns, index=index).infer_objects()
 
     @staticmethod
     def decide_from_row(params):
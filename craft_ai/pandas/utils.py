@@ -4,6 +4,7 @@ import re
 import string
 import importlib
 
+import numpy as np
 import pandas as pd
 import semver
 from .constants import (
@@ -11,7 +12,9 @@ from .constants import (
     OPTIONAL_VALUE,
 )
 from ..constants import REACT_CRAFT_AI_DECISION_TREE_VERSION
-from ..errors import CraftAiError
+from ..errors import CraftAiError, CraftAiTimeError
+from ..flat_tree import FlatTree
+from ..timezones import is_timezone, timezone_offset_in_sec
 
 
 DUMMY_COLUMN_NAME = "CraftGeneratedDummy"
@@ -45,11 +48,85 @@ def create_timezone_df(df, name):
     timezone_df = pd.DataFrame(index=df.index)
     if name in df.columns:
         timezone_df[name] = df[name].fillna(method="ffill")
+    elif df.index.tz is None:
+        # Same as `df.index.strftime("%z")` for a tz-naive index
+        timezone_df[name] = ""
     else:
-        timezone_df[name] = df.index.strftime("%z")
+        # Same as `df.index.strftime("%z")`, formatting each distinct offset once
+        timezone_df[name] = format_timezone_offsets(
+            timezone_offsets_in_sec(df.index), separator=""
+        )
     return timezone_df
 
 
+def timezone_offsets_in_sec(index):
+    """Returns the UTC offset, in seconds, of each timestamp of a tz-aware
+    DatetimeIndex."""
+    local_index = index.tz_localize(None)
+    utc_index = index.tz_convert("UTC").tz_localize(None)
+    return np.asarray((local_index - utc_index) // pd.Timedelta(seconds=1))
+
+
+def format_timezone_offsets(offsets, separator=":"):
+    """Formats UTC offsets in seconds as "+hh:mm" timezones."""
+    codes, uniques = pd.factorize(offsets)
+    timezones = []
+    for offset in uniques.tolist():
+        hours, minutes = divmod(abs(offset) // 60, 60)
+        timezones.append(
+            "{}{:02d}{}{:02d}".format(
+                "-" if offset < 0 else "+", hours, separator, minutes
+            )
+        )
+    return np.array(timezones, dtype=object)[codes]
+
+
+def create_time_features(index, timezones=None):
+    """Computes the time features of each timestamp of a tz-aware DatetimeIndex,
+    as `craft_ai.Time(t, timezone).to_dict()` does for a single timestamp.
+
+    :param pandas.DatetimeIndex index: the tz-aware timestamps, sub-second
+    precision is ignored.
+    :param timezones: the timezone to use for each timestamp, defaults to the
+    timezone of the index.
+    :type timezones: sequence of int or str, optional
+
+    :return: the "timestamp", "timezone", "time_of_day", "day_of_week",
+    "day_of_month" and "month_of_year" of each timestamp.
+    :rtype: dict of numpy.ndarray
+
+    :raises CraftAiTimeError: if one of the given timezones is invalid.
+    """
+    utc_index = index.tz_convert("UTC").tz_localize(None)
+    timestamps = np.asarray((utc_index - pd.Timestamp(0)) // pd.Timedelta(seconds=1))
+    if timezones is None:
+        offsets = timezone_offsets_in_sec(index)
+    else:
+        codes, uniques = pd.factorize(np.asarray(timezones, dtype=object))
+        uniques = uniques.tolist()
+        if (codes < 0).any():
+            uniques.append(None)
+        for timezone in uniques:
+            if not is_timezone(timezone):
+                raise CraftAiTimeError(
+                    """Unable to instantiate Time with the given timezone."""
+                    """ {} is neither a string nor a timezone.""".format(timezone)
+                )
+        offsets = np.array([timezone_offset_in_sec(tz) for tz in uniques])[codes]
+
+    local_index = pd.to_datetime(timestamps + offsets, unit="s")
+    return {
+        "timestamp": timestamps,
+        "timezone": format_timezone_offsets(offsets),
+        "time_of_day": np.asarray(
+            local_index.hour + local_index.minute / 60 + local_index.second / 3600
+        ),
+        "day_of_week": np.asarray(local_index.dayofweek),
+        "day_of_month": np.asarray(local_index.day),
+        "month_of_year": np.asarray(local_index.month),
+    }
+
+
 def random_string(length=20):
     return "".join(choice(string.ascii_letters) for x in range(length))
 
@@ -91,6 +168,8 @@ def create_tree_html(tree_object, selected_node, edge_type, folded_nodes, height
     if height <= 0:
         raise CraftAiError("A strictly positive height value must be given.")
 
+    if isinstance(tree_object, FlatTree):
+        tree_object = tree_object.to_dict()
     # Checking definition of tree_object
     if not isinstance(tree_object, dict):
         raise CraftAiError(
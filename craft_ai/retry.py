@@ -0,0 +1,118 @@
+import datetime
+import random
+
+from email.utils import parsedate_to_datetime
+
+# Methods that can be sent again when the response wasn't received
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+# Statuses of the requests rejected before being processed
+DEFAULT_RETRY_STATUSES = (429, 503)
+
+
+class RetryPolicy(object):
+    """Policy of the retries of the requests of a client, to be given as its
+    `retryPolicy` configuration.
+
+    A request is sent again after an exponential backoff when it fails with a
+    network error, only for idempotent methods, or with one of the statuses of
+    `status_rules`, up to its maximum number of attempts. The delay given by a
+    `Retry-After` header takes precedence over the backoff.
+
+    The same backoff, without a maximum number of attempts, is used between
+    the requests of a decision tree still being computed by craft ai, until
+    `decisionTreeRetrievalTimeout`.
+
+    A client without a `retryPolicy` uses `RetryPolicy()`: the requests of
+    every method, POST included, are sent up to 3 times when they fail with a
+    429 or 503 status. A `retryPolicy` of None disables the retries.
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        backoff_factor=0.5,
+        max_backoff=30,
+        jitter=True,
+        status_rules=None,
+        retry_methods=IDEMPOTENT_METHODS,
+    ):
+        """
+        :param int max_attempts: Optional. The maximum number of times a
+        request is sent, 1 for no retries.
+        :default max_attempts: 3.
+        :param float backoff_factor: Optional. The delay before the first
+        retry, in seconds, doubling for each retry.
+        :default backoff_factor: 0.5.
+        :param float max_backoff: Optional. The maximum delay between two
+        attempts, in seconds.
+        :default max_backoff: 30.
+        :param bool jitter: Optional. Whether to wait a random delay between
+        half the backoff and the backoff, so that clients don't retry at the
+        same time.
+        :default jitter: True.
+        :param dict status_rules: Optional. The maximum number of attempts of
+        a request failing with each status, by status code.
+        :default status_rules: `max_attempts` for the 429 and 503 statuses.
+        :param retry_methods: Optional. The methods of the requests sent again
+        after a network error.
+        :type retry_methods: tuple of str.
+        :default retry_methods: the idempotent methods.
+        """
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        if status_rules is None:
+            status_rules = {status: max_attempts for status in DEFAULT_RETRY_STATUSES}
+        self.status_rules = status_rules
+        self.retry_methods = retry_methods
+
+    def should_retry_status(self, status_code, attempt):
+        """Whether to send again a request whose `attempt`-th response, from
+        1, has the given status."""
+        return attempt < self.status_rules.get(status_code, 0)
+
+    def should_retry_error(self, method, attempt):
+        """Whether to send again a request whose `attempt`-th sending, from 1,
+        failed with a network error."""
+        return method.upper() in self.retry_methods and attempt < self.max_attempts
+
+    def backoff(self, attempt, retry_after=None):
+        """Gives the delay before sending again a request.
+
+        :param int attempt: the number of times the request was sent.
+        :param retry_after: Optional. The `Retry-After` header of the
+        response.
+        :type retry_after: str.
+
+        :return: the delay, in seconds.
+        :rtype: float.
+        """
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return delay
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            delay *= random.uniform(0.5, 1)
+        return delay
+
+
+def parse_retry_after(retry_after):
+    """Gives the delay of a `Retry-After` header, in seconds, None if it isn't
+    given or is invalid."""
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
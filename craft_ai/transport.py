@@ -0,0 +1,64 @@
+import socket
+
+from requests.adapters import HTTPAdapter
+
+# Milliseconds to establish a connection to craft ai
+DEFAULT_CONNECT_TIMEOUT = 1000 * 10
+# Milliseconds without receiving anything from craft ai, long enough for the
+# requests computing a decision tree
+DEFAULT_READ_TIMEOUT = 1000 * 60 * 5
+
+
+class TransportAdapter(HTTPAdapter):
+    """Transport of the requests of a client, given as its `transportAdapter`
+    configuration, a requests HTTP adapter which can send TCP keep-alive
+    probes on idle connections.
+
+    Any requests transport adapter class, for instance of an HTTP/2 capable
+    backend, can be given as the `transportAdapter` configuration instead. It
+    is instantiated with the `pool_connections`, `pool_maxsize` and
+    `max_retries` keyword arguments, and `tcp_keep_alive_idle` when the
+    `tcpKeepAliveIdle` configuration is given.
+    """
+
+    # The attributes pickled with the adapter
+    __attrs__ = HTTPAdapter.__attrs__ + ["tcp_keep_alive_idle"]
+
+    def __init__(self, tcp_keep_alive_idle=None, **kwargs):
+        """
+        :param int tcp_keep_alive_idle: Optional. The seconds after which an
+        idle connection is probed by TCP keep-alive, to detect a connection
+        dropped by the network.
+        :default tcp_keep_alive_idle: None, no keep-alive probes are sent.
+
+        The other parameters are the ones of `requests.adapters.HTTPAdapter`.
+        """
+        self.tcp_keep_alive_idle = tcp_keep_alive_idle
+        super(TransportAdapter, self).__init__(**kwargs)
+
+    def _socket_options(self):
+        if self.tcp_keep_alive_idle is None:
+            return None
+        # Keeps the default options of urllib3, disabling Nagle's algorithm
+        options = [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        # Not available on every platform
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.tcp_keep_alive_idle)
+            )
+        return options
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = self._socket_options()
+        if socket_options is not None:
+            kwargs["socket_options"] = socket_options
+        super(TransportAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        socket_options = self._socket_options()
+        if socket_options is not None:
+            proxy_kwargs["socket_options"] = socket_options
+        return super(TransportAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
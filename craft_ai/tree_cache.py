@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+
+from collections import OrderedDict
+
+from .constants import DEFAULT_DECISION_TREE_VERSION
+
+
+class TreeCache(object):
+    """In-process cache of decision trees, to be given to a client as its
+    `decisionTreeCache` configuration.
+
+    Trees are identified by the type and id of their entity, the timestamp
+    they were computed at and their version. A tree computed at an explicit
+    timestamp doesn't change and stays in the cache until evicted. The latest
+    tree of an entity, fetched without a timestamp, expires after `ttl`
+    seconds and is invalidated by the client when operations are added to
+    its agent.
+
+    The least recently used trees are evicted to keep at most `max_entries`
+    trees, and `max_bytes` bytes of trees serialized in json. Cached trees are
+    shared by all of their users and must not be modified.
+
+    The cache can be used from several threads.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        """
+        :param int max_entries: Optional. The maximum number of cached trees.
+        :param int max_bytes: Optional. The maximum size of the cached trees
+        serialized in json.
+        :param float ttl: Optional. The duration in seconds before the latest
+        tree of an entity expires.
+        :default: No limits, the latest trees never expire.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        # key -> (tree, size, expiration)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(entity_id, timestamp, version, entity_type):
+        return (entity_type, entity_id, timestamp, str(version))
+
+    def get(
+        self,
+        entity_id,
+        timestamp=None,
+        version=DEFAULT_DECISION_TREE_VERSION,
+        entity_type="agent",
+    ):
+        """Get a cached decision tree.
+
+        :param str entity_id: the id of the agent or generator of the tree.
+        :param int timestamp: Optional. The timestamp the tree is computed at.
+        :default timestamp: None, the latest tree.
+        :param version: version of the tree.
+        :type version: str or int.
+        :param str entity_type: either "agent" or "generator".
+
+        :return: the decision tree, None if it is not cached.
+        :rtype: dict.
+        """
+        key = self._key(entity_id, timestamp, version, entity_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[2] is not None
+                and entry[2] < time.monotonic()
+            ):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(
+        self,
+        tree,
+        entity_id,
+        timestamp=None,
+        version=DEFAULT_DECISION_TREE_VERSION,
+        entity_type="agent",
+    ):
+        """Cache a decision tree, see `TreeCache.get` for the parameters."""
+        key = self._key(entity_id, timestamp, version, entity_type)
+        size = len(json.dumps(tree)) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expiration = None
+        if timestamp is None and self.ttl is not None:
+            expiration = time.monotonic() + self.ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (tree, size, expiration)
+            self.nbytes += size
+            while (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ) or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, entity_id=None, entity_type="agent", latest_only=False):
+        """Remove decision trees from the cache.
+
+        :param str entity_id: Optional. The id of the agent or generator whose
+        trees to remove.
+        :default entity_id: None, all the trees are removed.
+        :param str entity_type: either "agent" or "generator".
+        :param bool latest_only: Optional. Only remove the latest trees.
+
+        :return: the number of removed trees.
+        :rtype: int.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if entity_id is None
+                or (
+                    key[0] == entity_type
+                    and key[1] == entity_id
+                    and (not latest_only or key[2] is None)
+                )
+            ]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def stats(self):
+        """Get the counters of the cache.
+
+        :return: the number of "hits", "misses" and "evictions", and the current
+        number of "entries" and of "bytes" cached.
+        :rtype: dict.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
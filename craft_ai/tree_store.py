@@ -0,0 +1,326 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import DEFAULT_DECISION_TREE_VERSION
+
+INDEX_FILENAME = "index.jsonl"
+# Minimum number of seconds between two refreshes of a tree
+DEFAULT_REFRESH_INTERVAL = 60
+# The index is rewritten with one line per entry once it has this many lines
+# per entry, each refresh appending a line
+INDEX_COMPACTION_FACTOR = 4
+
+
+class TreeStore(object):
+    """On-disk store of the latest decision trees, to be given to a client as
+    its `decisionTreeStore` configuration.
+
+    The store keeps the last known tree of each entity and version, in a
+    directory of gzipped json files listed in an index. When a client gets the
+    latest tree of an entity, fetched without a timestamp, it returns the
+    stored tree right away and refreshes it in the background, unless it was
+    stored or refreshed less than `refresh_interval` seconds ago. The tree is
+    only retrieved from the API when it isn't stored yet.
+
+    The store can be used from several threads of a single process.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_refresh_workers=4,
+        refresh_interval=DEFAULT_REFRESH_INTERVAL,
+    ):
+        """
+        :param str directory: the directory of the store, created if it
+        doesn't exist.
+        :param int max_refresh_workers: Optional. The maximum number of trees
+        refreshed at the same time.
+        :default max_refresh_workers: 4.
+        :param float refresh_interval: Optional. The minimum number of seconds
+        between two refreshes of a tree, counted from the time it was stored or
+        its last refresh started.
+        :default refresh_interval: 60 seconds.
+        """
+        self.directory = directory
+        self.max_refresh_workers = max_refresh_workers
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        # key -> index entry
+        self._index = {}
+        # Number of lines of the index file
+        self._index_lines = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._index)
+
+    @staticmethod
+    def _key(entity_id, version, entity_type):
+        return (entity_type, entity_id, str(version))
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _load_index(self):
+        """Reads the index, the last line of an entry being the most recent,
+        and rewrites it with one line per entry."""
+        try:
+            with open(self._path(INDEX_FILENAME)) as index_file:
+                lines = index_file.readlines()
+        except FileNotFoundError:
+            lines = []
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                key = self._key(
+                    entry["entity_id"], entry["version"], entry["entity_type"]
+                )
+            except (ValueError, KeyError, TypeError):
+                # Line partially written when the process stopped
+                continue
+            if entry.get("removed"):
+                self._index.pop(key, None)
+            else:
+                self._index[key] = entry
+
+        self._write_index()
+
+    def _write_index(self):
+        tmp_path = self._path(INDEX_FILENAME + ".tmp")
+        with open(tmp_path, "w") as index_file:
+            for entry in self._index.values():
+                index_file.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self._path(INDEX_FILENAME))
+        self._index_lines = len(self._index)
+
+    def _append_to_index(self, entry):
+        """Appends an entry to the index, compacting it once it has too many
+        lines, to be called with the lock held."""
+        if self._index_lines >= INDEX_COMPACTION_FACTOR * max(len(self._index), 1):
+            self._write_index()
+            if entry.get("removed"):
+                # Already left out of the rewritten index
+                return
+        with open(self._path(INDEX_FILENAME), "a") as index_file:
+            index_file.write(json.dumps(entry) + "\n")
+        self._index_lines += 1
+
+    def get(
+        self, entity_id, version=DEFAULT_DECISION_TREE_VERSION, entity_type="agent"
+    ):
+        """Get the stored decision tree of an entity.
+
+        :param str entity_id: the id of the agent or generator of the tree.
+        :param version: version of the tree.
+        :type version: str or int.
+        :param str entity_type: either "agent" or "generator".
+
+        :return: the decision tree, None if it is not stored.
+        :rtype: dict.
+        """
+        with self._lock:
+            entry = self._index.get(self._key(entity_id, version, entity_type))
+        decision_tree = None
+        if entry is not None:
+            try:
+                with gzip.open(self._path(entry["file"]), "rt") as tree_file:
+                    decision_tree = json.load(tree_file)
+            except (OSError, ValueError):
+                # Missing or corrupted file, the tree is retrieved again
+                decision_tree = None
+        with self._lock:
+            if decision_tree is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return decision_tree
+
+    def set(
+        self,
+        decision_tree,
+        entity_id,
+        version=DEFAULT_DECISION_TREE_VERSION,
+        entity_type="agent",
+    ):
+        """Store the decision tree of an entity, see `TreeStore.get` for the
+        parameters."""
+        version = str(version)
+        filename = "{}-{}-v{}.json.gz".format(entity_type, entity_id, version)
+        tmp_path = self._path(
+            "{}.{}.{}.tmp".format(filename, os.getpid(), threading.get_ident())
+        )
+        with gzip.open(tmp_path, "wt") as tree_file:
+            json.dump(decision_tree, tree_file)
+        stored_at = time.time()
+        entry = {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "version": version,
+            "file": filename,
+            "stored_at": stored_at,
+            "refreshed_at": stored_at,
+        }
+        with self._lock:
+            os.replace(tmp_path, self._path(filename))
+            self._index[self._key(entity_id, version, entity_type)] = entry
+            self._append_to_index(entry)
+
+    def remove(self, entity_id, entity_type="agent"):
+        """Remove the stored decision trees of an entity.
+
+        :param str entity_id: the id of the agent or generator whose trees to
+        remove.
+        :param str entity_type: either "agent" or "generator".
+
+        :return: the number of removed trees.
+        :rtype: int.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._index
+                if key[0] == entity_type and key[1] == entity_id
+            ]
+            for key in keys:
+                entry = self._index.pop(key)
+                self._append_to_index({**entry, "removed": True})
+                try:
+                    os.remove(self._path(entry["file"]))
+                except FileNotFoundError:
+                    pass
+        return len(keys)
+
+    def refresh(
+        self,
+        get_decision_tree,
+        entity_id,
+        version=DEFAULT_DECISION_TREE_VERSION,
+        entity_type="agent",
+        on_refresh=None,
+    ):
+        """Store again the decision tree of an entity in the background.
+
+        :param get_decision_tree: function retrieving the up to date tree.
+        :param on_refresh: Optional. function called with the refreshed tree
+        once stored.
+
+        See `TreeStore.get` for the other parameters.
+
+        :return: the future of the refreshed tree, None if the tree is already
+        being refreshed or was refreshed less than `refresh_interval` seconds
+        ago.
+        :rtype: concurrent.futures.Future.
+        """
+        if not self.start_refresh(entity_id, version, entity_type):
+            return None
+
+        def refresh_tree():
+            succeeded = False
+            try:
+                decision_tree = get_decision_tree()
+                self.set(decision_tree, entity_id, version, entity_type)
+                succeeded = True
+            finally:
+                self.end_refresh(entity_id, version, entity_type, succeeded)
+            if on_refresh is not None:
+                on_refresh(decision_tree)
+            return decision_tree
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_refresh_workers)
+            return self._executor.submit(refresh_tree)
+
+    def start_refresh(
+        self, entity_id, version=DEFAULT_DECISION_TREE_VERSION, entity_type="agent"
+    ):
+        """Mark the decision tree of an entity as being refreshed by the
+        caller, who then stores it with `TreeStore.set` and calls
+        `TreeStore.end_refresh`. `TreeStore.refresh` does both in a background
+        thread.
+
+        See `TreeStore.get` for the parameters.
+
+        :return: False if the tree is already being refreshed or was refreshed
+        less than `refresh_interval` seconds ago, True otherwise.
+        :rtype: bool.
+        """
+        key = self._key(entity_id, version, entity_type)
+        now = time.time()
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            entry = self._index.get(key)
+            if entry is not None:
+                # The entries of the previous versions of the index have no
+                # refresh time
+                refreshed_at = entry.get("refreshed_at", entry["stored_at"])
+                if now - refreshed_at < self.refresh_interval:
+                    return False
+                # Failed refreshes are also spaced out
+                entry = {**entry, "refreshed_at": now}
+                self._index[key] = entry
+                self._append_to_index(entry)
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(
+        self,
+        entity_id,
+        version=DEFAULT_DECISION_TREE_VERSION,
+        entity_type="agent",
+        succeeded=True,
+    ):
+        """Mark the end of a refresh started with `TreeStore.start_refresh`.
+
+        :param bool succeeded: Optional. Whether the tree was refreshed.
+        :default succeeded: True.
+
+        See `TreeStore.get` for the other parameters.
+        """
+        with self._lock:
+            self._refreshing.discard(self._key(entity_id, version, entity_type))
+            if succeeded:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+
+    def wait_for_refreshes(self):
+        """Wait for the trees being refreshed in the background, and stop the
+        background workers until the next refresh."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        """Get the counters of the store.
+
+        :return: the number of "hits" and "misses", of successful "refreshes"
+        and of "refresh_errors", and the current number of "entries" stored.
+        :rtype: dict.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "entries": len(self._index),
+            }
@@ -1,5 +1,6 @@
 from copy import copy
 from .errors import CraftAiError
+from .flat_tree import FlatTree
 
 
 def _update_paths(paths, idx):
@@ -52,13 +53,16 @@ def extract_output_tree(tree, output_property=None):
     """
     Extract the output decision tree specific for a given output property from a full decision tree.
 
-    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`.
+    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`,
+    and `craft_ai.FlatTree` instances.
 
     Parameters:
         tree: A tree.
         output_property (optional): If provided, the output property for which the tree predicts
             values, otherwise the first defined tree is retrieved.
     """
+    if isinstance(tree, FlatTree):
+        tree = tree.as_tree()
     if not isinstance(tree, dict):
         raise CraftAiError(
             """Unable to retrieve the output tree, """
@@ -88,7 +92,8 @@ def extract_decision_paths_from_tree(tree):
     """
     Retrieve all the decision paths from a tree.
 
-    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`.
+    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`,
+    and `craft_ai.FlatTree` instances.
 
     Parameters:
         tree: A tree.
@@ -103,7 +108,8 @@ def extract_decision_path_neighbors(
     """
     Retrieve neighbor of a decision path in a tree.
 
-    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`.
+    This function accepts trees as retrieved from `craft_ai.Client.get_generator_decision_tree`,
+    and `craft_ai.FlatTree` instances.
 
     Parameters:
         tree: A tree.
@@ -0,0 +1,124 @@
+import json
+import threading
+
+import unittest
+
+from unittest import mock
+
+from craft_ai import AdaptiveChunksSize, Client, errors as craft_err
+
+from .utils import OFFLINE_CFG, fake_response
+
+
+class TestAdaptiveChunksSize(unittest.TestCase):
+    def test_grow(self):
+        chunks_size = AdaptiveChunksSize(initial_size=100, max_size=200)
+
+        self.assertEqual(chunks_size.size("agent"), 100)
+        chunks_size.record_success("agent", 100, 10)
+        self.assertEqual(chunks_size.size("agent"), 150)
+        # A partial chunk doesn't grow the size
+        chunks_size.record_success("agent", 20, 10)
+        self.assertEqual(chunks_size.size("agent"), 150)
+        chunks_size.record_success("agent", 150, 10)
+        self.assertEqual(chunks_size.size("agent"), 200)
+        # Each agent has its own size
+        self.assertEqual(chunks_size.size("other_agent"), 100)
+
+    def test_shrink(self):
+        chunks_size = AdaptiveChunksSize(initial_size=100, target_latency_ms=1000)
+
+        chunks_size.record_success("agent", 100, 1250)
+        self.assertEqual(chunks_size.size("agent"), 80)
+        # Shrinks at most by half
+        chunks_size.record_success("agent", 80, 10000)
+        self.assertEqual(chunks_size.size("agent"), 40)
+
+    def test_failure(self):
+        chunks_size = AdaptiveChunksSize(initial_size=100, min_size=10)
+
+        chunks_size.record_failure("agent", 100)
+        self.assertEqual(chunks_size.size("agent"), 50)
+        chunks_size.record_success("agent", 50, 10)
+        # Grows by half of the gap to the failed size
+        self.assertEqual(chunks_size.size("agent"), 75)
+        for _ in range(10):
+            chunks_size.record_success("agent", chunks_size.size("agent"), 10)
+        self.assertEqual(chunks_size.size("agent"), 99)
+
+        chunks_size.record_failure("agent", 15)
+        self.assertEqual(chunks_size.size("agent"), 10)
+        self.assertEqual(chunks_size.stats(), {"sizes": {"agent": 10}, "splits": 2})
+        self.assertEqual(
+            chunks_size.history()[0], {"agent_id": "agent", "size": 100, "split": True}
+        )
+
+
+class TestClientAdaptiveChunks(unittest.TestCase):
+    """Adds operations to an agent through a client whose requests are
+    rejected with a 413 status above `max_size` operations."""
+
+    def add_operations(self, count, max_size=50, **cfg):
+        client = Client({**OFFLINE_CFG, **cfg})
+        self.sent_sizes = []
+        self.added_timestamps = []
+        lock = threading.Lock()
+
+        def request(method, url, data=None, **kwargs):
+            operations = json.loads(data)
+            with lock:
+                self.sent_sizes.append(len(operations))
+                if len(operations) > max_size:
+                    return fake_response(413)
+                self.added_timestamps.extend(o["timestamp"] for o in operations)
+            return fake_response(
+                201,
+                {
+                    "message": "Successfully added {} operation(s)".format(
+                        len(operations)
+                    )
+                },
+            )
+
+        operations = [{"timestamp": t, "context": {"a": t}} for t in range(count)]
+        with mock.patch.object(client._requests_session, "request", request):
+            return client.add_agent_operations("agent", operations)
+
+    def test_split(self):
+        chunks_size = AdaptiveChunksSize(initial_size=100, target_latency_ms=60000)
+
+        response = self.add_operations(100, adaptiveChunksSize=chunks_size)
+
+        self.assertEqual(response["added_operations_count"], 100)
+        self.assertEqual(self.sent_sizes, [100, 50, 50])
+        self.assertEqual(self.added_timestamps, list(range(100)))
+        self.assertEqual(chunks_size.stats()["splits"], 1)
+        # Halved, then grown towards the size of the rejected chunk
+        self.assertEqual(chunks_size.size("agent"), 75)
+
+    def test_split_concurrently(self):
+        for max_concurrent_requests in [1, 4]:
+            chunks_size = AdaptiveChunksSize(initial_size=200, target_latency_ms=60000)
+
+            response = self.add_operations(
+                500,
+                adaptiveChunksSize=chunks_size,
+                maxConcurrentRequests=max_concurrent_requests,
+            )
+
+            with self.subTest(max_concurrent_requests=max_concurrent_requests):
+                self.assertEqual(response["added_operations_count"], 500)
+                self.assertEqual(sorted(self.added_timestamps), list(range(500)))
+                rejected_sizes = [size for size in self.sent_sizes if size > 50]
+                self.assertTrue(rejected_sizes)
+                self.assertEqual(chunks_size.stats()["splits"], len(rejected_sizes))
+                self.assertLessEqual(chunks_size.size("agent"), 100)
+
+    def test_no_split_without_adaptive_chunks(self):
+        self.assertRaises(
+            craft_err.CraftAiPayloadTooLargeError,
+            self.add_operations,
+            100,
+            operationsChunksSize=100,
+        )
+        self.assertEqual(self.sent_sizes, [100])
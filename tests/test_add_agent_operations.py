@@ -63,6 +63,33 @@ class TestAddOperationsSuccess(unittest.TestCase):
         self.assertTrue("message" in resp_keys)
         self.assertEqual(resp["added_operations_count"], len(operations))
 
+    def test_add_agent_operations_concurrently(self):
+        """add_agent_operations should succeed when sending chunks concurrently
+
+        It should give the count of all the added operations.
+        """
+        client = craft_ai.Client(
+            {
+                **settings.CRAFT_CFG,
+                "operationsChunksSize": 100,
+                "maxConcurrentRequests": 4,
+                "maxInFlightChunks": 8,
+            }
+        )
+        operations = copy.deepcopy(valid_data.VALID_OPERATIONS_SET[:])
+
+        while len(operations) < 1000:
+            new_operation = operations[-1].copy()
+            new_operation["timestamp"] += 10
+            operations.append(new_operation)
+
+        resp = client.add_agent_operations(
+            self.agent_id,
+            sorted(operations, key=lambda operation: operation["timestamp"]),
+        )
+
+        self.assertEqual(resp["added_operations_count"], len(operations))
+
     def test_add_agent_operations_with_some_duplicates(self):
         """add_agent_operations should succeed and lmerge duplicate timestamps
         """
@@ -151,6 +151,38 @@ class TestAddOperationsGroupAgentsBulkSuccess(unittest.TestCase):
 
         self.addCleanup(self.clean_up_agents, self.agents)
 
+    def test_add_agents_operations_bulk_group_agents_concurrently(self):
+        """add_agents_operations_bulk should succeed when sending the chunks of
+        agents concurrently.
+
+        It should give the responses in the order of the payload, with the
+        latency of the chunk of each agent.
+        """
+        client = Client(
+            {
+                **settings.CRAFT_CFG,
+                "operationsChunksSize": len(valid_data.VALID_OPERATIONS_SET),
+                "maxConcurrentRequests": 3,
+            }
+        )
+        payload = []
+        for agent_id in self.agents:
+            payload.append(
+                {"id": agent_id, "operations": valid_data.VALID_OPERATIONS_SET}
+            )
+
+        response = client.add_agents_operations_bulk(payload)
+
+        for i, resp in enumerate(response):
+            self.assertEqual(resp.get("id"), self.agents[i])
+            self.assertEqual(resp.get("status"), 201)
+            self.assertEqual(
+                resp["added_operations_count"], len(valid_data.VALID_OPERATIONS_SET)
+            )
+            self.assertGreater(resp["chunk_latency_ms"], 0)
+
+        self.addCleanup(self.clean_up_agents, self.agents)
+
 
 class TestAddOperationsBulkFailure(unittest.TestCase):
     """Checks that the client fail when adding operations to
@@ -0,0 +1,200 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+import asyncio
+
+import craft_ai
+from craft_ai.async_client import CRAFTAI_ASYNC_ENABLED
+
+from . import settings
+from .test_compiled_tree import SIMPLE_TREE
+from .utils import OFFLINE_CFG, generate_entity_id
+from .data import valid_data
+
+NB_AGENTS = 5
+
+
+@unittest.skipIf(CRAFTAI_ASYNC_ENABLED is False, "aiohttp is not installed")
+class TestAsyncClient(unittest.TestCase):
+    """Checks that the asynchronous client gives the same results as the
+    synchronous one"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = craft_ai.Client(settings.CRAFT_CFG)
+        cls.agent_ids = [
+            generate_entity_id("test_async_client") for i in range(NB_AGENTS)
+        ]
+
+    def setUp(self):
+        for agent_id in self.agent_ids:
+            self.client.delete_agent(agent_id)
+            self.client.create_agent(valid_data.VALID_CONFIGURATION, agent_id)
+
+    def tearDown(self):
+        for agent_id in self.agent_ids:
+            self.client.delete_agent(agent_id)
+
+    @staticmethod
+    def run_with_client(coroutine_function):
+        async def run():
+            async with craft_ai.AsyncClient(settings.CRAFT_CFG) as client:
+                return await coroutine_function(client)
+
+        return asyncio.get_event_loop().run_until_complete(run())
+
+    def test_get_agent(self):
+        agent = self.run_with_client(lambda client: client.get_agent(self.agent_ids[0]))
+
+        self.assertEqual(agent, self.client.get_agent(self.agent_ids[0]))
+
+    def test_get_unknown_agent(self):
+        self.client.delete_agent(self.agent_ids[0])
+
+        self.assertRaises(
+            craft_ai.errors.CraftAiNotFoundError,
+            self.run_with_client,
+            lambda client: client.get_agent(self.agent_ids[0]),
+        )
+
+    def test_add_operations_and_get_decision_trees_concurrently(self):
+        async def add_operations_and_get_tree(client, agent_id):
+            await client.add_agent_operations(agent_id, valid_data.VALID_OPERATIONS_SET)
+            return await client.get_agent_decision_tree(
+                agent_id, valid_data.VALID_LAST_TIMESTAMP
+            )
+
+        trees = self.run_with_client(
+            lambda client: asyncio.gather(
+                *[
+                    add_operations_and_get_tree(client, agent_id)
+                    for agent_id in self.agent_ids
+                ]
+            )
+        )
+
+        for agent_id, tree in zip(self.agent_ids, trees):
+            self.assertEqual(
+                tree,
+                self.client.get_agent_decision_tree(
+                    agent_id, valid_data.VALID_LAST_TIMESTAMP
+                ),
+            )
+
+
+class FakeResponse(object):
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = b"" if body is None else json.dumps(body).encode("utf-8")
+
+    async def read(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class FakeSession(object):
+    """Stubs the aiohttp session of a client, `respond(method, url, data)`
+    giving the status and body of the response of each request."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def request(self, method, url, data=None, **kwargs):
+        self.requests.append((method, url))
+        return FakeResponse(*self.respond(method, url, data))
+
+    async def close(self):
+        pass
+
+
+@unittest.skipIf(CRAFTAI_ASYNC_ENABLED is False, "aiohttp is not installed")
+class TestAsyncClientOffline(unittest.TestCase):
+    """Checks the asynchronous client with a stubbed aiohttp session"""
+
+    def run_with_session(self, respond, coroutine_function, cfg=None):
+        client = craft_ai.AsyncClient({**OFFLINE_CFG, **(cfg or {})})
+        session = FakeSession(respond)
+
+        async def run():
+            client._session = session
+            client._semaphore = asyncio.Semaphore(
+                client.config["maxConcurrentRequests"]
+            )
+            async with client:
+                return await coroutine_function(client)
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run()), session.requests
+        finally:
+            loop.close()
+
+    def test_no_requests_session(self):
+        client = craft_ai.AsyncClient(OFFLINE_CFG)
+
+        self.assertIsNone(client._requests_session)
+
+    @mock.patch("asyncio.sleep")
+    def test_retry_status(self, sleep):
+        async def no_sleep(delay):
+            pass
+
+        sleep.side_effect = no_sleep
+        statuses = [503, 200]
+
+        agent, requests = self.run_with_session(
+            lambda method, url, data: (statuses.pop(0), {"id": "agent"}),
+            lambda client: client.get_agent("agent"),
+        )
+
+        self.assertEqual(agent, {"id": "agent"})
+        self.assertEqual(len(requests), 2)
+
+    def test_add_operations_in_order(self):
+        operations = [
+            {"timestamp": timestamp, "context": {"color": "red"}}
+            for timestamp in range(10)
+        ]
+        sent_timestamps = []
+
+        def respond(method, url, data):
+            chunk = json.loads(data)
+            sent_timestamps.extend(operation["timestamp"] for operation in chunk)
+            return 201, {"message": "Successfully added %i operation(s)" % len(chunk)}
+
+        _, requests = self.run_with_session(
+            respond,
+            lambda client: client.add_agent_operations("agent", operations),
+            {"operationsChunksSize": 3},
+        )
+
+        self.assertEqual(len(requests), 4)
+        self.assertEqual(sent_timestamps, list(range(10)))
+
+    def test_delete_agent_invalidates_trees(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = craft_ai.TreeCache()
+        store = craft_ai.TreeStore(directory)
+        cache.set(SIMPLE_TREE, "agent")
+        store.set(SIMPLE_TREE, "agent")
+
+        self.run_with_session(
+            lambda method, url, data: (200, {"id": "agent"}),
+            lambda client: client.delete_agent("agent"),
+            {"decisionTreeCache": cache, "decisionTreeStore": store},
+        )
+
+        self.assertIsNone(cache.get("agent"))
+        self.assertIsNone(store.get("agent"))
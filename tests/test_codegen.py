@@ -0,0 +1,77 @@
+import copy
+import random
+
+import unittest
+
+from craft_ai import GeneratedTree, Interpreter, errors as craft_err
+from craft_ai.codegen import _compile_source
+
+from .test_compiled_tree import SIMPLE_TREE, STORES, random_tree
+
+PROPERTIES = ["peopleCount", "timeOfDay", "store", "open"]
+
+
+class TestGeneratedTree(unittest.TestCase):
+    def check_same_decisions(self, version):
+        rng = random.Random(11)
+        for _ in range(30):
+            tree = random_tree(rng, version, PROPERTIES, depth=4)
+            generated_tree = GeneratedTree(tree)
+            for _ in range(30):
+                context = {
+                    "peopleCount": rng.choice([None, -1, 0, 2.5, 3, 12, 24]),
+                    "timeOfDay": rng.choice([None, 0, 6, 12.25, 22, 23.9]),
+                    "store": rng.choice([None, "unknown_store"] + STORES),
+                    "open": rng.choice([None, True, False]),
+                }
+                if version == "1.1.0":
+                    context = {
+                        key: value
+                        for key, value in context.items()
+                        if value is not None
+                    }
+                with self.subTest(context=context):
+                    try:
+                        expected = Interpreter.decide(tree, [context])
+                    except craft_err.CraftAiDecisionError as err:
+                        with self.assertRaises(
+                            craft_err.CraftAiDecisionError
+                        ) as context_manager:
+                            generated_tree.decide(context)
+                        exception = context_manager.exception
+                        self.assertEqual(exception.message, err.message)
+                        self.assertEqual(exception.metadata, err.metadata)
+                    else:
+                        self.assertEqual(generated_tree.decide(context), expected)
+
+    def test_same_decisions_v2(self):
+        self.check_same_decisions("2.0.0")
+
+    def test_same_decisions_v1(self):
+        self.check_same_decisions("1.1.0")
+
+    def test_source(self):
+        generated_tree = GeneratedTree(SIMPLE_TREE)
+
+        self.assertIn("p0 < 0.5", generated_tree.source)
+        self.assertIn("p0 >= 0.5", generated_tree.source)
+        self.assertIsNone(
+            GeneratedTree(random_tree(random.Random(), "1.1.0", PROPERTIES)).source
+        )
+
+    def test_source_compiled_once(self):
+        GeneratedTree(SIMPLE_TREE)
+        hits = _compile_source.cache_info().hits
+
+        GeneratedTree(copy.deepcopy(SIMPLE_TREE))
+        self.assertEqual(_compile_source.cache_info().hits, hits + 1)
+
+    def test_results_are_not_shared(self):
+        generated_tree = GeneratedTree(SIMPLE_TREE)
+        context = {"peopleCount": None, "timeOfDay": 7.25, "timezone": "+02:00"}
+
+        decision = generated_tree.decide(context)
+        decision["output"]["lightbulbState"]["distribution"][0] = 12
+        self.assertEqual(
+            generated_tree.decide(context), Interpreter.decide(SIMPLE_TREE, [context])
+        )
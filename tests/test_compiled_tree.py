@@ -0,0 +1,264 @@
+import copy
+import json
+import math
+import os
+import random
+
+import unittest
+
+from craft_ai import CompiledTree, Interpreter, Time, errors as craft_err
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+
+# Assuming we are the test folder and the folder hierarchy is correctly
+# constructed
+EXPECS_DIR = os.path.join(HERE, "data", "interpreter", "decide", "expectations")
+TREES_DIR = os.path.join(HERE, "data", "interpreter", "decide", "trees")
+
+SIMPLE_TREE = {
+    "_version": "2.0.0",
+    "configuration": {
+        "context": {
+            "peopleCount": {"type": "continuous"},
+            "timeOfDay": {"type": "time_of_day"},
+            "timezone": {"type": "timezone"},
+            "lightbulbState": {"type": "enum"},
+        },
+        "output": ["lightbulbState"],
+    },
+    "trees": {
+        "lightbulbState": {
+            "output_values": ["OFF", "ON"],
+            "children": [
+                {
+                    "prediction": {
+                        "confidence": 0.6774609088897705,
+                        "distribution": [0.8, 0.2],
+                        "value": "OFF",
+                        "nb_samples": 5,
+                    },
+                    "decision_rule": {
+                        "operand": 0.5,
+                        "operator": "<",
+                        "property": "peopleCount",
+                    },
+                },
+                {
+                    "prediction": {
+                        "confidence": 0.8630361557006836,
+                        "distribution": [0.1, 0.9],
+                        "value": "ON",
+                        "nb_samples": 10,
+                    },
+                    "decision_rule": {
+                        "operand": 0.5,
+                        "operator": ">=",
+                        "property": "peopleCount",
+                    },
+                },
+            ],
+        }
+    },
+}
+
+
+class TestCompiledTree(unittest.TestCase):
+    def check_expectation(self, compiled_tree, expectation):
+        exp_context = expectation["context"]
+        exp_time = expectation.get("time")
+        time = Time(exp_time["t"], exp_time["tz"]) if exp_time else None
+
+        if expectation.get("error"):
+            with self.assertRaises(craft_err.CraftAiDecisionError) as context_manager:
+                compiled_tree.decide(exp_context, time)
+
+            exception = context_manager.exception
+            self.assertEqual(exception.message, expectation["error"]["message"])
+            self.assertEqual(
+                exception.metadata, expectation["error"].get("metadata", None)
+            )
+        else:
+            decision = compiled_tree.decide(exp_context, time)
+            self.assertEqual(decision, expectation["output"])
+
+    def test_compiled_tree_expectations(self):
+        versions = os.listdir(TREES_DIR)
+        for version in versions:
+            tree_files = os.listdir(os.path.join(TREES_DIR, version))
+            for tree_file in tree_files:
+                if os.path.splitext(tree_file)[1] == ".json":
+                    # Loading the json tree
+                    with open(os.path.join(TREES_DIR, version, tree_file)) as f:
+                        tree = json.load(f)
+                    # Loading the expectations for this tree
+                    with open(os.path.join(EXPECS_DIR, version, tree_file)) as f:
+                        expectations = json.load(f)
+
+                    for expectation in expectations:
+                        with self.subTest():
+                            expectation_tree = copy.deepcopy(tree)
+                            configuration = expectation.get("configuration")
+                            if configuration:
+                                expectation_tree["configuration"].update(configuration)
+                            try:
+                                compiled_tree = CompiledTree(expectation_tree)
+                            except craft_err.CraftAiDecisionError as err:
+                                # Invalid trees are rejected when compiling
+                                self.assertEqual(
+                                    err.message, expectation["error"]["message"]
+                                )
+                                continue
+                            self.check_expectation(compiled_tree, expectation)
+
+    def test_compiled_tree_same_as_interpreter(self):
+        compiled_tree = CompiledTree(SIMPLE_TREE)
+        for people_count in [0, 0.5, 3]:
+            context = {"peopleCount": people_count, "timeOfDay": 7.25, "timezone": 2}
+            self.assertEqual(
+                compiled_tree.decide(context),
+                Interpreter.decide(SIMPLE_TREE, [context]),
+            )
+
+    def test_compiled_tree_results_are_not_shared(self):
+        compiled_tree = CompiledTree(SIMPLE_TREE)
+        context = {"peopleCount": 3, "timeOfDay": 7.25, "timezone": "+02:00"}
+        decision = compiled_tree.decide(context)
+        decision["output"]["lightbulbState"]["decision_rules"][0]["operand"] = 12
+        self.assertEqual(
+            compiled_tree.decide(context)["output"]["lightbulbState"]["decision_rules"],
+            [{"operand": 0.5, "operator": ">=", "property": "peopleCount"}],
+        )
+
+    def test_compiled_tree_missing_value_distribution(self):
+        compiled_tree = CompiledTree(SIMPLE_TREE)
+        context = {"peopleCount": None, "timeOfDay": 7.25, "timezone": "+02:00"}
+        expected = Interpreter.decide(SIMPLE_TREE, [context])
+
+        decision = compiled_tree.decide(context)
+        self.assertEqual(decision, expected)
+        # The distribution of the root is computed once, and not shared
+        distribution, nb_samples = compiled_tree._roots[0][1].distribution
+        self.assertAlmostEqual(distribution[1], 2 / 3)
+        self.assertEqual(nb_samples, 15)
+        decision["output"]["lightbulbState"]["distribution"][0] = 12
+        self.assertEqual(compiled_tree.decide(context), expected)
+
+    def test_compiled_tree_invalid_operator(self):
+        tree = copy.deepcopy(SIMPLE_TREE)
+        tree["trees"]["lightbulbState"]["children"][1]["decision_rule"][
+            "operator"
+        ] = "foo"
+        self.assertRaises(craft_err.CraftAiDecisionError, CompiledTree, tree)
+
+
+STORES = ["store_{}".format(index) for index in range(12)]
+
+
+def random_tree(rng, version, properties, depth=3):
+    """Generates a tree split on the given properties, with overlapping,
+    wrapping, missing and unbounded intervals, and values missing from enum
+    splits."""
+    bounds = [-math.inf, 0, 2.5, 6, 12, 12.5, 18, 22, 23.75, math.inf]
+
+    def random_rule(property_name):
+        if property_name == "store":
+            operators = ["is"] if version == "1.1.0" else ["is", "in"]
+            operator = rng.choice(operators)
+            if operator == "in":
+                operand = rng.sample(STORES, rng.randint(1, 4))
+            else:
+                operand = rng.choice(STORES)
+        elif property_name == "open":
+            operator, operand = "is", rng.choice([True, False])
+        else:
+            operator = rng.choice(["[in[", ">=", "<"])
+            if operator == "[in[":
+                operand = [rng.choice(bounds), rng.choice(bounds)]
+            else:
+                operand = rng.choice(bounds)
+        return {"property": property_name, "operator": operator, "operand": operand}
+
+    def random_node(depth):
+        if depth == 0 or rng.random() < 0.2:
+            value = rng.choice(["OFF", "ON"])
+            confidence = rng.random()
+            if version == "1.1.0":
+                return {"predicted_value": value, "confidence": confidence}
+            on_probability = rng.random()
+            return {
+                "prediction": {
+                    "value": value,
+                    "confidence": confidence,
+                    "distribution": [1 - on_probability, on_probability],
+                    "nb_samples": rng.randint(1, 20),
+                }
+            }
+        property_name = rng.choice(properties)
+        children = []
+        for _ in range(rng.randint(2, 6)):
+            child = random_node(depth - 1)
+            # Siblings are usually split on the same property
+            if rng.random() < 0.9:
+                child["decision_rule"] = random_rule(property_name)
+            else:
+                child["decision_rule"] = random_rule(rng.choice(properties))
+            children.append(child)
+        return {"children": children}
+
+    root = random_node(depth)
+    if version != "1.1.0":
+        root["output_values"] = ["OFF", "ON"]
+    return {
+        "_version": version,
+        "configuration": {
+            "context": {
+                "peopleCount": {"type": "continuous"},
+                "timeOfDay": {"type": "time_of_day", "is_generated": False},
+                "store": {"type": "enum"},
+                "open": {"type": "boolean"},
+                "lightbulbState": {"type": "enum"},
+            },
+            "output": ["lightbulbState"],
+            "time_quantum": 600,
+        },
+        "trees": {"lightbulbState": root},
+    }
+
+
+class TestCompiledTreeDifferential(unittest.TestCase):
+    def check_same_decisions(self, properties):
+        rng = random.Random(42)
+        values = [-1, 0, 1e-9, 2.5, 3, 6, 11.999, 12, 12.25, 18, 22, 23.75, 23.9, 100]
+        for version in ["1.1.0", "2.0.0"]:
+            for _ in range(30):
+                tree = random_tree(rng, version, properties)
+                compiled_tree = CompiledTree(tree)
+                for _ in range(30):
+                    context = {
+                        "peopleCount": rng.choice(values),
+                        "timeOfDay": rng.choice(values[1:-1]),
+                        "store": rng.choice(STORES + ["unknown_store"]),
+                        "open": rng.choice([True, False]),
+                    }
+                    with self.subTest(version=version, context=context):
+                        try:
+                            expected = Interpreter.decide(tree, [context])
+                        except craft_err.CraftAiDecisionError as err:
+                            with self.assertRaises(
+                                craft_err.CraftAiDecisionError
+                            ) as context_manager:
+                                compiled_tree.decide(context)
+                            exception = context_manager.exception
+                            self.assertEqual(exception.message, err.message)
+                            self.assertEqual(exception.metadata, err.metadata)
+                        else:
+                            self.assertEqual(compiled_tree.decide(context), expected)
+
+    def test_interval_splits(self):
+        self.check_same_decisions(["peopleCount", "timeOfDay"])
+
+    def test_value_splits(self):
+        self.check_same_decisions(["store", "open"])
+
+    def test_mixed_splits(self):
+        self.check_same_decisions(["peopleCount", "timeOfDay", "store", "open"])
@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import unittest
+
+from craft_ai.compression import CompressionStats, gzip_body
+
+OPERATIONS = [
+    {"timestamp": 1600000000 + i, "context": {"presence": "home", "temperature": i}}
+    for i in range(100)
+]
+
+
+class TestCompression(unittest.TestCase):
+    def test_gzip_body(self):
+        json_pl = json.dumps(OPERATIONS).encode("utf-8")
+        body, content_encoding = gzip_body(json_pl)
+
+        self.assertEqual(content_encoding, "gzip")
+        self.assertLess(len(body), len(json_pl))
+        self.assertEqual(gzip.decompress(body), json_pl)
+
+    def test_small_body(self):
+        json_pl = json.dumps(OPERATIONS[:1]).encode("utf-8")
+
+        self.assertEqual(gzip_body(json_pl), (json_pl, None))
+        body, content_encoding = gzip_body(json_pl, min_bytes=0)
+        self.assertEqual(content_encoding, "gzip")
+        self.assertEqual(gzip.decompress(body), json_pl)
+
+    def test_stats(self):
+        stats = CompressionStats()
+        stats.record_request(1000, 100, True)
+        stats.record_request(10, 10, False)
+        stats.record_response(500, 50, True)
+
+        self.assertEqual(
+            stats.to_dict(),
+            {
+                "requests": 2,
+                "compressed_requests": 1,
+                "request_bytes": 1010,
+                "request_sent_bytes": 110,
+                "responses": 1,
+                "compressed_responses": 1,
+                "response_bytes": 500,
+                "response_received_bytes": 50,
+            },
+        )
@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+
+import unittest
+
+from craft_ai import Client
+
+from .utils import OFFLINE_CFG
+
+
+class TestMapConcurrently(unittest.TestCase):
+    def setUp(self):
+        self.client = Client({**OFFLINE_CFG, "maxConcurrentRequests": 4})
+        self.called_items = []
+        self.lock = threading.Lock()
+
+    def call(self, item, failing_item=None):
+        with self.lock:
+            self.called_items.append(item)
+        if item == failing_item:
+            raise ValueError(item)
+        time.sleep(random.uniform(0, 0.01))
+        return item
+
+    def test_order(self):
+        for max_in_flight in [None, 1, 3, 8]:
+            with self.subTest(max_in_flight=max_in_flight):
+                results = self.client._map_concurrently(
+                    self.call, range(50), max_in_flight
+                )
+                self.assertEqual(list(results), list(range(50)))
+
+    def test_error(self):
+        max_in_flight = 3
+        pulled_items = []
+
+        def items():
+            for item in range(50):
+                pulled_items.append(item)
+                yield item
+
+        results = self.client._map_concurrently(
+            lambda item: self.call(item, failing_item=10), items(), max_in_flight
+        )
+
+        with self.assertRaises(ValueError) as context_manager:
+            list(results)
+        self.assertEqual(context_manager.exception.args, (10,))
+        # Nothing is called after the window of the failed call
+        self.assertLess(max(self.called_items), 10 + max_in_flight)
+        self.assertLessEqual(max(pulled_items), 10 + max_in_flight)
+
+    def test_sequential_error(self):
+        client = Client(OFFLINE_CFG)
+
+        results = client._map_concurrently(
+            lambda item: self.call(item, failing_item=3), range(10)
+        )
+
+        self.assertRaises(ValueError, list, results)
+        self.assertEqual(self.called_items, [0, 1, 2, 3])
@@ -0,0 +1,157 @@
+import copy
+import json
+import pickle
+import random
+
+import unittest
+
+from craft_ai import (
+    CompiledTree,
+    FlatTree,
+    Interpreter,
+    errors as craft_err,
+    extract_decision_path_neighbors,
+    extract_decision_paths_from_tree,
+)
+
+from .test_compiled_tree import SIMPLE_TREE, STORES, random_tree
+
+PROPERTIES = ["peopleCount", "timeOfDay", "store", "open"]
+
+
+class TestFlatTree(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(7)
+        for version in ["1.1.0", "2.0.0"]:
+            for _ in range(20):
+                tree = random_tree(rng, version, PROPERTIES)
+                with self.subTest(version=version):
+                    self.assertEqual(FlatTree(tree).to_dict(), tree)
+
+    def test_layout(self):
+        flat_tree = FlatTree(SIMPLE_TREE)
+
+        self.assertEqual(len(flat_tree), 3)
+        self.assertEqual(flat_tree.properties, ["peopleCount"])
+        # Both children share their operand
+        self.assertEqual(flat_tree.operands, [0.5])
+        self.assertEqual(list(flat_tree.child_offsets), [1, -1, -1])
+        self.assertEqual(list(flat_tree.child_counts), [2, 0, 0])
+        self.assertEqual(list(flat_tree.features), [-1, 0, 0])
+        self.assertEqual(
+            [flat_tree.operators[code] for code in flat_tree.operator_codes[1:]],
+            ["<", ">="],
+        )
+        # The payload of the root holds its output values, the predictions of
+        # the leaves are in the arrays
+        self.assertEqual(list(flat_tree.payload_indices), [0, -1, -1])
+        self.assertEqual(flat_tree.payloads, [{"output_values": ["OFF", "ON"]}])
+        self.assertEqual(list(flat_tree.prediction_layout_indices), [-1, 0, 0])
+        self.assertEqual(flat_tree.values, ["OFF", "ON"])
+        self.assertEqual(list(flat_tree.nb_samples[1:]), [5, 10])
+        self.assertEqual(list(flat_tree.distribution_values), [0.8, 0.2, 0.1, 0.9])
+
+    def test_round_trip_predictions(self):
+        leaves = [
+            # Regression
+            {
+                "value": 3.5,
+                "confidence": 0.25,
+                "distribution": {"standard_deviation": 1.5, "min": 0.0, "max": 7.0},
+                "nb_samples": 4,
+            },
+            # Integer distribution
+            {"nb_samples": 2, "value": "ON", "confidence": 0.5, "distribution": [0, 1]},
+            # Kept in the payload
+            {"value": "OFF", "confidence": 1, "distribution": [1, 0], "nb_samples": 3},
+            {"value": "OFF", "distribution": [0.5, 0.5]},
+            {
+                "value": "OFF",
+                "confidence": 0.5,
+                "distribution": [0.5, 1],
+                "nb_samples": 3,
+            },
+        ]
+        tree = copy.deepcopy(SIMPLE_TREE)
+        tree["trees"]["lightbulbState"]["children"] = [
+            {
+                "prediction": prediction,
+                "decision_rule": {
+                    "property": "peopleCount",
+                    "operator": "<",
+                    "operand": 1,
+                },
+            }
+            for prediction in leaves
+        ]
+        flat_tree = FlatTree(tree)
+
+        self.assertEqual(
+            list(flat_tree.prediction_layout_indices), [-1, 0, 1, -1, -1, -1]
+        )
+        self.assertEqual(len(flat_tree.payloads), 4)
+        restored_tree = flat_tree.to_dict()
+        self.assertEqual(restored_tree, tree)
+        for leaf, restored_leaf in zip(
+            leaves, restored_tree["trees"]["lightbulbState"]["children"]
+        ):
+            prediction = restored_leaf["prediction"]
+            self.assertEqual(list(prediction), list(leaf))
+            self.assertEqual(
+                json.dumps(prediction["distribution"]),
+                json.dumps(leaf["distribution"]),
+            )
+
+    def test_same_decisions(self):
+        rng = random.Random(7)
+        for version in ["1.1.0", "2.0.0"]:
+            for _ in range(20):
+                tree = random_tree(rng, version, PROPERTIES)
+                flat_tree = FlatTree(tree)
+                for _ in range(10):
+                    context = {
+                        "peopleCount": rng.choice([-1, 0, 3, 12, 24]),
+                        "timeOfDay": rng.choice([0, 6, 12.25, 23]),
+                        "store": rng.choice(STORES),
+                        "open": rng.choice([True, False]),
+                    }
+                    with self.subTest(version=version, context=context):
+                        try:
+                            expected = Interpreter.decide(tree, [context])
+                        except craft_err.CraftAiDecisionError as err:
+                            with self.assertRaises(
+                                craft_err.CraftAiDecisionError
+                            ) as context_manager:
+                                Interpreter.decide(flat_tree, [context])
+                            self.assertEqual(
+                                context_manager.exception.message, err.message
+                            )
+                            continue
+                        self.assertEqual(
+                            Interpreter.decide(flat_tree, [context]), expected
+                        )
+                        self.assertEqual(
+                            CompiledTree(flat_tree).decide(context), expected
+                        )
+
+    def test_tree_utils(self):
+        rng = random.Random(7)
+        tree = random_tree(rng, "2.0.0", PROPERTIES)
+        flat_tree = FlatTree(tree)
+
+        paths = extract_decision_paths_from_tree(tree)
+        self.assertEqual(extract_decision_paths_from_tree(flat_tree), paths)
+        for path in paths:
+            self.assertEqual(
+                extract_decision_path_neighbors(flat_tree, path),
+                extract_decision_path_neighbors(tree, path),
+            )
+
+    def test_pickle(self):
+        flat_tree = pickle.loads(pickle.dumps(FlatTree(SIMPLE_TREE)))
+
+        self.assertEqual(flat_tree.to_dict(), SIMPLE_TREE)
+
+    def test_invalid_tree(self):
+        self.assertRaises(craft_err.CraftAiDecisionError, FlatTree, None)
+        self.assertRaises(craft_err.CraftAiDecisionError, FlatTree, {"trees": []})
@@ -4,6 +4,8 @@ import random
 import datetime
 import semver
 
+from concurrent.futures import ThreadPoolExecutor
+
 import craft_ai
 from craft_ai.constants import DEFAULT_DECISION_TREE_VERSION
 
@@ -106,6 +108,22 @@ class TestGetAgentDecisionTreeWithOperation(unittest.TestCase):
         self.assertNotEqual(decision_tree.get("configuration"), None)
         self.assertNotEqual(decision_tree.get("trees"), None)
 
+    def test_get_decision_tree_versions_from_threads(self):
+        versions = [1, 2] * 4
+        with ThreadPoolExecutor(len(versions)) as executor:
+            decision_trees = list(
+                executor.map(
+                    lambda version: self.client.get_agent_decision_tree(
+                        self.agent_id, valid_data.VALID_TIMESTAMP, version
+                    ),
+                    versions,
+                )
+            )
+
+        for version, decision_tree in zip(versions, decision_trees):
+            tree_version = semver.parse(decision_tree.get("_version"))
+            self.assertEqual(tree_version["major"], version)
+
     def test_get_decision_tree_without_timestamp(self):
         # test if we get the latest decision tree
         decision_tree = self.client.get_agent_decision_tree(self.agent_id)
@@ -29,6 +29,20 @@ class TestGetOperationsListSuccess(unittest.TestCase):
         self.assertIsInstance(ops, list)
         self.assertEqual(ops, valid_data.VALID_OPERATIONS_SET_COMPLETE_1)
 
+    def test_iter_agent_operations(self):
+        ops = self.client.iter_agent_operations(self.agent_id)
+        self.assertEqual(list(ops), valid_data.VALID_OPERATIONS_SET_COMPLETE_1)
+
+        pages = list(self.client.iter_agent_operations(self.agent_id, by_page=True))
+        self.assertEqual(
+            [op for page in pages for op in page],
+            valid_data.VALID_OPERATIONS_SET_COMPLETE_1,
+        )
+
+    def test_iter_agent_operations_with_prefetched_pages(self):
+        ops = self.client.iter_agent_operations(self.agent_id, prefetch_pages=2)
+        self.assertEqual(list(ops), valid_data.VALID_OPERATIONS_SET_COMPLETE_1)
+
     @unittest.skip("Remove temporary due to beta performance issues")
     def test_get_agent_operations_with_lower_bound(self):
         lower_bound = 1464356844
@@ -94,3 +108,11 @@ class TestGetOperationsListFailure(unittest.TestCase):
                 self.client.get_agent_operations,
                 invalid_data.UNDEFINED_KEY[empty_id],
             )
+
+    def test_iter_agent_operations_with_invalid_id(self):
+        for empty_id in invalid_data.UNDEFINED_KEY:
+            self.assertRaises(
+                craft_ai.errors.CraftAiBadRequestError,
+                self.client.iter_agent_operations,
+                invalid_data.UNDEFINED_KEY[empty_id],
+            )
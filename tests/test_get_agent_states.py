@@ -96,6 +96,10 @@ class TestGetAgentStatesSuccess(unittest.TestCase):
             ],
         )
 
+    def test_iter_agent_states(self):
+        states = list(self.client.iter_agent_states(self.agent_id))
+        self.assertEqual(states, self.client.get_agent_states(self.agent_id))
+
     def test_get_agent_states_with_lower_bound(self):
         lower_bound = valid_data.VALID_TIMESTAMP + valid_data.VALID_TQ
         states = self.client.get_agent_states(self.agent_id, lower_bound)
@@ -229,6 +229,32 @@ class TestGetGroupDecisionTreesBulkSuccess(unittest.TestCase):
 
         self.addCleanup(self.clean_up_agents, self.agents)
 
+    def test_get_group_decision_trees_in_batches(self):
+        """get_agents_decision_trees_bulk should give the trees in the order of
+        the payload when they are requested in concurrent batches.
+        """
+        client = Client(
+            {
+                **settings.CRAFT_CFG,
+                "decisionTreesBulkSize": 2,
+                "maxConcurrentRequests": 2,
+            }
+        )
+        payload = [
+            {"id": agent_id, "timestamp": valid_data.VALID_LAST_TIMESTAMP}
+            for agent_id in self.agents
+        ]
+
+        decision_trees = client.get_agents_decision_trees_bulk(payload)
+
+        self.assertEqual(
+            [decision_tree["id"] for decision_tree in decision_trees], self.agents
+        )
+        for decision_tree in decision_trees:
+            self.assertIsInstance(decision_tree.get("tree"), dict)
+
+        self.addCleanup(self.clean_up_agents, self.agents)
+
 
 class TestGetDecisionTreesBulkFailure(unittest.TestCase):
     """Checks that the client succeeds when getting
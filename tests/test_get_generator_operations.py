@@ -98,6 +98,12 @@ class TestGetGeneratorOperationsListSuccess(unittest.TestCase):
         self.assertEqual(len(ops), len(self.expected_operations))
         self.assertEqual(ops[1], self.expected_operations[1])
 
+    def test_iter_generator_operations(self):
+        ops = list(self.client.iter_generator_operations(self.generator_id))
+        self.assertEqual(
+            ops, self.client.get_generator_operations(self.generator_id),
+        )
+
     def test_get_generator_operations_with_lower_bound(self):
         lower_bound = 1464600406
         ops = self.client.get_generator_operations(self.generator_id, lower_bound)
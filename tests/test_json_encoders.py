@@ -0,0 +1,73 @@
+import json
+import math
+
+import unittest
+
+import numpy as np
+
+from craft_ai import Client
+from craft_ai.json_encoders import (
+    ORJSON_ENABLED,
+    JsonEncoder,
+    OrjsonEncoder,
+    join_json_array,
+)
+
+from .test_jwt_decode import JWT_IO_EXAMPLE
+
+PAYLOAD = {"id": "agent", "operations": [{"timestamp": 1, "context": {"a": "é"}}]}
+
+
+class TestJsonEncoder(unittest.TestCase):
+    def test_dumps(self):
+        encoded = JsonEncoder().dumps(PAYLOAD)
+
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(json.loads(encoded), PAYLOAD)
+
+    def test_dumps_invalid(self):
+        self.assertRaises(TypeError, JsonEncoder().dumps, {"a": object()})
+
+    def test_join_json_array(self):
+        encoder = JsonEncoder()
+        encoded = join_json_array([encoder.dumps(PAYLOAD), encoder.dumps(1)])
+
+        self.assertEqual(json.loads(encoded), [PAYLOAD, 1])
+        self.assertEqual(json.loads(join_json_array([])), [])
+
+
+@unittest.skipUnless(ORJSON_ENABLED, "orjson is not installed")
+class TestOrjsonEncoder(unittest.TestCase):
+    def test_dumps(self):
+        encoder = OrjsonEncoder()
+
+        self.assertEqual(json.loads(encoder.dumps(PAYLOAD)), PAYLOAD)
+        self.assertEqual(
+            json.loads(encoder.dumps({1: np.int64(2), "b": np.float64(0.5)})),
+            {"1": 2, "b": 0.5},
+        )
+
+    def test_dumps_invalid(self):
+        self.assertRaises(TypeError, OrjsonEncoder().dumps, {"a": object()})
+
+    def test_dumps_nan(self):
+        # Opting in for orjson changes how non finite floats are sent
+        self.assertEqual(OrjsonEncoder().dumps([math.nan, math.inf]), b"[null,null]")
+
+
+class TestClientJsonEncoder(unittest.TestCase):
+    def test_default_encoder(self):
+        # The default encoder doesn't depend on the installed extras
+        client = Client(
+            {
+                "token": JWT_IO_EXAMPLE,
+                "owner": "owner",
+                "project": "project",
+                "url": "https://craft.ai",
+            }
+        )
+        self.assertIsInstance(client._config["jsonEncoder"], JsonEncoder)
+        self.assertEqual(
+            client._encode_json([math.nan, math.inf]),
+            JsonEncoder().dumps([math.nan, math.inf]),
+        )
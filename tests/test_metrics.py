@@ -0,0 +1,136 @@
+import json
+
+import unittest
+
+from craft_ai import Metrics
+from craft_ai.metrics import Histogram, endpoint_of, instrumented
+
+
+class FakeClient(object):
+    def __init__(self, metrics):
+        self._config = {"metrics": metrics}
+
+    def send(self, bytes_count):
+        if self._config["metrics"] is None:
+            return
+        self._config["metrics"].record_request(
+            {
+                "type": "request",
+                "method": "GET",
+                "endpoint": "agents/{id}",
+                "status_code": 200,
+                "latency_ms": 1,
+                "retries": 1,
+                "request_bytes": bytes_count,
+                "response_bytes": 2 * bytes_count,
+                "error": None,
+            }
+        )
+
+    @instrumented
+    def get_agent(self, agent_id):
+        self.send(10)
+        return self.get_generator("g")
+
+    @instrumented
+    def get_generator(self, generator_id):
+        self.send(5)
+        return generator_id
+
+    @instrumented
+    def iter_pages(self, agent_id, count):
+        for page in range(count):
+            self.send(1)
+            yield page
+
+    @instrumented
+    def fail(self):
+        raise ValueError("failed")
+
+
+class TestHistogram(unittest.TestCase):
+    def test_record(self):
+        histogram = Histogram((10, 100))
+        for value in (1, 5, 50, 500):
+            histogram.record(value)
+
+        summary = histogram.to_dict()
+        self.assertEqual(summary["buckets"], [[10, 2], [100, 1], [None, 1]])
+        self.assertEqual(summary["count"], 4)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 500)
+        self.assertEqual(summary["p50"], 10)
+        self.assertEqual(summary["p99"], 500)
+
+
+class TestEndpointOf(unittest.TestCase):
+    def test_entity_ids(self):
+        base_url = "https://beta.craft.ai/api/v1/owner/project"
+
+        self.assertEqual(
+            endpoint_of(base_url + "/agents/my_agent/context?t=12", base_url),
+            "agents/{id}/context",
+        )
+        self.assertEqual(
+            endpoint_of(base_url + "/bulk/agents", base_url), "bulk/agents"
+        )
+        self.assertEqual(
+            endpoint_of(base_url + "/generators/gen/tree", base_url),
+            "generators/{id}/tree",
+        )
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.metrics = Metrics(hooks=[self.events.append])
+        self.client = FakeClient(self.metrics)
+
+    def test_nested_calls(self):
+        self.assertEqual(self.client.get_agent("my_agent"), "g")
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(list(snapshot["calls"]), ["get_agent"])
+        call = snapshot["calls"]["get_agent"]
+        self.assertEqual(call["requests"], 2)
+        self.assertEqual(call["retries"], 2)
+        self.assertEqual(call["request_bytes"], 15)
+        self.assertEqual(call["response_bytes"], 30)
+        self.assertEqual(snapshot["agents"]["my_agent"]["requests"], 2)
+        self.assertEqual(
+            snapshot["requests"]["GET agents/{id}"]["statuses"], {"200": 2}
+        )
+        self.assertEqual(
+            [(event["type"], event.get("call")) for event in self.events],
+            [("request", "get_agent"), ("request", "get_agent"), ("call", None)],
+        )
+        # The snapshot can be exported
+        json.dumps(snapshot)
+
+    def test_iterator(self):
+        pages = self.client.iter_pages(agent_id="my_agent", count=3)
+        self.assertEqual(self.metrics.snapshot()["calls"], {})
+
+        self.assertEqual(list(pages), [0, 1, 2])
+        call = self.metrics.snapshot()["calls"]["iter_pages"]
+        self.assertEqual(call["requests"], 3)
+        self.assertEqual(self.events[-1]["agent_id"], "my_agent")
+
+    def test_error(self):
+        self.assertRaises(ValueError, self.client.fail)
+
+        self.assertEqual(self.metrics.snapshot()["calls"]["fail"]["errors"], 1)
+        self.assertEqual(self.events[-1]["error"], "ValueError")
+
+    def test_without_metrics(self):
+        client = FakeClient(None)
+
+        self.assertEqual(client.get_generator("g"), "g")
+
+    def test_reset(self):
+        self.client.get_generator("g")
+        self.metrics.reset()
+
+        self.assertEqual(
+            self.metrics.snapshot(), {"calls": {}, "requests": {}, "agents": {}}
+        )
@@ -174,6 +174,16 @@ class TestPandasSimpleAgentWithData(unittest.TestCase):
             pd.Timestamp("2020-01-01 04:59:00", tz="Europe/Paris"),
         )
 
+    def test_get_agent_operations_df_with_dtypes(self):
+        df = CLIENT.get_agent_operations(
+            self.agent_id, dtypes={"a": "float32", "b": "float32"}
+        )
+
+        self.assertEqual(len(df), 300)
+        self.assertEqual(df["a"].dtype, "float32")
+        self.assertEqual(df["b"].dtype, "float32")
+        self.assertEqual(df["c"].dtype, "float64")
+
     def test_get_agent_states_df(self):
         df = CLIENT.get_agent_states(self.agent_id)
 
@@ -0,0 +1,198 @@
+import json
+import unittest
+
+from craft_ai.json_encoders import ORJSON_ENABLED, JsonEncoder, OrjsonEncoder
+from craft_ai.pandas import CRAFTAI_PANDAS_ENABLED
+
+if CRAFTAI_PANDAS_ENABLED:
+    import numpy as np
+    import pandas as pd
+
+    from craft_ai.pandas import MISSING_VALUE, OPTIONAL_VALUE
+    from craft_ai.pandas.columnar import (
+        DataFrameBuilder,
+        dtypes_from_configuration,
+        encode_operations,
+    )
+
+OPERATIONS = [
+    {"timestamp": 1577836800, "context": {"presence": "home", "temperature": 18}},
+    {"timestamp": 1577836860, "context": {"temperature": 18.5, "heater": True}},
+    {"timestamp": 1577836920, "context": {"presence": None, "timezone": "+01:00"}},
+    {"timestamp": 1577836980, "context": {"presence": "away", "temperature": None}},
+]
+
+CONFIGURATION = {
+    "context": {
+        "presence": {"type": "enum"},
+        "temperature": {"type": "continuous"},
+        "heater": {"type": "boolean"},
+        "timezone": {"type": "timezone"},
+        "timeOfDay": {"type": "time_of_day"},
+    },
+    "output": ["heater"],
+}
+
+
+@unittest.skipIf(CRAFTAI_PANDAS_ENABLED is False, "pandas is not enabled")
+class TestDataFrameBuilder(unittest.TestCase):
+    def build(self, operations, dtypes=None):
+        builder = DataFrameBuilder(dtypes)
+        builder.extend(operations[:2], "context")
+        builder.extend(operations[2:], "context")
+        return builder.build()
+
+    def test_same_as_list_of_dicts(self):
+        expected_df = pd.DataFrame(
+            [operation["context"] for operation in OPERATIONS],
+            index=pd.to_datetime(
+                [operation["timestamp"] for operation in OPERATIONS], unit="s"
+            ).tz_localize("UTC"),
+        )
+
+        pd.testing.assert_frame_equal(self.build(OPERATIONS), expected_df)
+
+    def test_empty(self):
+        df = self.build([])
+
+        self.assertEqual(len(df), 0)
+        self.assertEqual(len(df.columns), 0)
+        self.assertEqual(str(df.index.tz), "UTC")
+
+    def test_dtypes(self):
+        df = self.build(OPERATIONS, dtypes_from_configuration(CONFIGURATION))
+
+        self.assertEqual(df["temperature"].dtype, "float64")
+        self.assertEqual(df["presence"].dtype, "category")
+        self.assertEqual(df["timezone"].dtype, "category")
+        self.assertEqual(df["heater"].dtype, "boolean")
+        self.assertEqual(df["presence"].tolist(), ["home", np.nan, np.nan, "away"])
+        self.assertTrue(np.isnan(df["temperature"].iloc[3]))
+
+    def test_dtypes_unexpected_value(self):
+        operations = OPERATIONS + [
+            {"timestamp": 1577837040, "context": {"presence": {}, "temperature": {}}}
+        ]
+
+        df = self.build(operations, {"presence": "category", "temperature": "float64"})
+
+        self.assertEqual(df["presence"].dtype, object)
+        self.assertEqual(df["presence"].iloc[4], {})
+        self.assertEqual(df["temperature"].iloc[4], {})
+
+
+@unittest.skipIf(CRAFTAI_PANDAS_ENABLED is False, "pandas is not enabled")
+class TestEncodeOperations(unittest.TestCase):
+    def test_encode_operations(self):
+        df = pd.DataFrame(
+            {
+                "presence": pd.Categorical(["home", None, "away"]),
+                "temperature": [18.5, np.nan, 20],
+                "heater": [True, False, True],
+                "count": [1, 2, 3],
+                "mixed": [MISSING_VALUE, OPTIONAL_VALUE, [1, 2]],
+                "CraftGeneratedDummy": [0, 0, 0],
+            },
+            index=pd.date_range(
+                "2020-01-01 01:00", periods=3, freq="T", tz="Europe/Paris"
+            ),
+        )
+
+        operations = encode_operations(df)
+
+        self.assertEqual(
+            json.loads(operations.to_json()),
+            [
+                {
+                    "timestamp": 1577836800,
+                    "context": {
+                        "presence": "home",
+                        "temperature": 18.5,
+                        "heater": True,
+                        "count": 1,
+                        "mixed": None,
+                    },
+                },
+                {
+                    "timestamp": 1577836860,
+                    "context": {"heater": False, "count": 2, "mixed": {}},
+                },
+                {
+                    "timestamp": 1577836920,
+                    "context": {
+                        "presence": "away",
+                        "temperature": 20.0,
+                        "heater": True,
+                        "count": 3,
+                    },
+                },
+            ],
+        )
+        self.assertEqual(json.loads(operations[1:].to_json())[0]["context"]["count"], 2)
+
+    def test_encode_operations_booleans_and_numbers(self):
+        df = pd.DataFrame(
+            {"value": [True, 1, 0.5, {"a": 1}]},
+            index=pd.date_range("2020-01-01", periods=4, freq="T", tz="UTC"),
+        )
+
+        operations = json.loads(encode_operations(df).to_json())
+
+        self.assertEqual(
+            [operation["context"] for operation in operations],
+            [{"value": True}, {"value": 1}, {"value": 0.5}, {}],
+        )
+        self.assertIsInstance(operations[1]["context"]["value"], int)
+
+    def test_encode_operations_infinite_values(self):
+        df = pd.DataFrame(
+            {"temperature": [np.inf, -np.inf, np.nan, 1.5]},
+            index=pd.date_range("2020-01-01", periods=4, freq="T", tz="UTC"),
+        )
+        rows = [{"temperature": value} for value in df["temperature"].tolist()[:2]]
+
+        # The same json as the row by row serialization
+        self.assertEqual(
+            encode_operations(df)[:2],
+            [
+                '{{"timestamp":{},"context":{}}}'.format(
+                    timestamp, JsonEncoder().dumps(row).decode("utf-8")
+                )
+                for timestamp, row in zip([1577836800, 1577836860], rows)
+            ],
+        )
+        self.assertEqual(
+            [
+                operation["context"]
+                for operation in json.loads(encode_operations(df).to_json())
+            ],
+            [
+                {"temperature": np.inf},
+                {"temperature": -np.inf},
+                {},
+                {"temperature": 1.5},
+            ],
+        )
+
+    @unittest.skipUnless(ORJSON_ENABLED, "orjson is not installed")
+    def test_encode_operations_json_encoder(self):
+        df = pd.DataFrame(
+            {"temperature": [np.inf, 1.5]},
+            index=pd.date_range("2020-01-01", periods=2, freq="T", tz="UTC"),
+        )
+
+        operations = json.loads(encode_operations(df, OrjsonEncoder()).to_json())
+
+        # orjson sends infinite values as missing values
+        self.assertEqual(
+            [operation["context"] for operation in operations],
+            [{"temperature": None}, {"temperature": 1.5}],
+        )
+
+    def test_encode_operations_invalid_value(self):
+        df = pd.DataFrame(
+            {"value": [object()]},
+            index=pd.date_range("2020-01-01", periods=1, freq="T", tz="UTC"),
+        )
+
+        self.assertRaises(TypeError, encode_operations, df)
@@ -0,0 +1,246 @@
+import json
+import unittest
+
+from craft_ai import FlatTree, Interpreter, Time
+from craft_ai.pandas import CRAFTAI_PANDAS_ENABLED
+
+if CRAFTAI_PANDAS_ENABLED:
+    import craft_ai.pandas
+    import numpy as np
+    import pandas as pd
+
+    from craft_ai.pandas import MISSING_VALUE
+    from craft_ai.pandas.utils import create_time_features, create_timezone_df
+
+from .test_compiled_tree import SIMPLE_TREE
+
+TREE = {
+    "_version": "2.0.0",
+    "configuration": {
+        "context": {
+            "presence": {"type": "enum", "is_optional": True},
+            "temperature": {"type": "continuous"},
+            "timeOfDay": {"type": "time_of_day"},
+            "timezone": {"type": "timezone"},
+            "heater": {"type": "continuous"},
+        },
+        "output": ["heater"],
+    },
+    "trees": {
+        "heater": {
+            "output_values": [],
+            "children": [
+                {
+                    "decision_rule": {
+                        "operand": ["home", "office"],
+                        "operator": "in",
+                        "property": "presence",
+                    },
+                    "children": [
+                        {
+                            "decision_rule": {
+                                "operand": [22, 7],
+                                "operator": "[in[",
+                                "property": "timeOfDay",
+                            },
+                            "prediction": {
+                                "value": 12.5,
+                                "confidence": 0.8,
+                                "distribution": {
+                                    "standard_deviation": 1.5,
+                                    "min": 10,
+                                    "max": 15,
+                                },
+                                "nb_samples": 4,
+                            },
+                        },
+                        {
+                            "decision_rule": {
+                                "operand": [7, 22],
+                                "operator": "[in[",
+                                "property": "timeOfDay",
+                            },
+                            "prediction": {
+                                "value": 19.5,
+                                "confidence": 0.9,
+                                "distribution": {
+                                    "standard_deviation": 0.5,
+                                    "min": 19,
+                                    "max": 21,
+                                },
+                                "nb_samples": 12,
+                            },
+                        },
+                    ],
+                },
+                {
+                    "decision_rule": {
+                        "operand": ["away"],
+                        "operator": "in",
+                        "property": "presence",
+                    },
+                    "children": [
+                        {
+                            "decision_rule": {
+                                "operand": 10,
+                                "operator": "<",
+                                "property": "temperature",
+                            },
+                            "prediction": {
+                                "value": 8,
+                                "confidence": 0.6,
+                                "distribution": {
+                                    "standard_deviation": 2,
+                                    "min": 5,
+                                    "max": 10,
+                                },
+                                "nb_samples": 6,
+                            },
+                        },
+                        {
+                            "decision_rule": {
+                                "operand": 10,
+                                "operator": ">=",
+                                "property": "temperature",
+                            },
+                            "prediction": {
+                                "value": 0,
+                                "confidence": 0.9,
+                                "distribution": {
+                                    "standard_deviation": 0,
+                                    "min": 0,
+                                    "max": 0,
+                                },
+                                "nb_samples": 10,
+                            },
+                        },
+                    ],
+                },
+            ],
+        }
+    },
+}
+
+
+@unittest.skipIf(CRAFTAI_PANDAS_ENABLED is False, "pandas is not enabled")
+class TestPandasInterpreter(unittest.TestCase):
+    def setUp(self):
+        self.contexts_df = pd.DataFrame(
+            {
+                "presence": ["home", "away", MISSING_VALUE, "office", "away", "gym"],
+                "temperature": [18.5, 4, 12, 21, 25, 3],
+            },
+            index=pd.date_range(
+                "2020-01-01 05:00", periods=6, freq="5H", tz="Europe/Paris"
+            ),
+        )
+
+    def test_decide_from_contexts_df_same_as_interpreter(self):
+        df = craft_ai.pandas.Interpreter.decide_from_contexts_df(TREE, self.contexts_df)
+
+        self.assertEqual(len(df), len(self.contexts_df))
+        self.assertTrue(df.index.equals(self.contexts_df.index))
+        for (timestamp, row), (_, decision) in zip(
+            self.contexts_df.iterrows(), df.iterrows()
+        ):
+            context = {
+                "timezone": "+01:00",
+                "temperature": row["temperature"],
+                "presence": None
+                if row["presence"] is MISSING_VALUE
+                else row["presence"],
+            }
+            expected_decision = Interpreter.decide(
+                TREE, [context, Time(timestamp.value // 10 ** 9, "+01:00")]
+            )["output"]["heater"]
+            self.assertEqual(
+                decision["heater_predicted_value"], expected_decision["predicted_value"]
+            )
+            self.assertEqual(
+                decision["heater_decision_rules"], expected_decision["decision_rules"]
+            )
+
+    def test_decide_from_contexts_df_invalid_context(self):
+        contexts_df = self.contexts_df.copy()
+        contexts_df.loc[contexts_df.index[4], "temperature"] = np.nan
+        contexts_df.loc[contexts_df.index[3], "presence"] = "home"
+
+        self.assertRaises(
+            craft_ai.errors.CraftAiDecisionError,
+            craft_ai.pandas.Interpreter.decide_from_contexts_df,
+            TREE,
+            contexts_df,
+        )
+
+    def test_decide_from_contexts_df_columns(self):
+        contexts_df = pd.DataFrame(
+            {"peopleCount": [0, 1], "timezone": ["+02:00", "+02:00"]},
+            index=pd.date_range("2020-01-01", periods=2, freq="H", tz="UTC"),
+        )
+
+        df = craft_ai.pandas.Interpreter.decide_from_contexts_df(
+            SIMPLE_TREE, contexts_df
+        )
+
+        self.assertEqual(
+            list(df.columns),
+            [
+                "lightbulbState_predicted_value",
+                "lightbulbState_confidence",
+                "lightbulbState_decision_rules",
+                "lightbulbState_nb_samples",
+                "lightbulbState_decision_path",
+                "lightbulbState_distribution",
+            ],
+        )
+        self.assertEqual(df["lightbulbState_predicted_value"].tolist(), ["OFF", "ON"])
+
+    def test_flat_tree(self):
+        flat_tree = FlatTree(TREE)
+
+        self.assertTrue(
+            craft_ai.pandas.Interpreter.decide_from_contexts_df(
+                flat_tree, self.contexts_df
+            ).equals(
+                craft_ai.pandas.Interpreter.decide_from_contexts_df(
+                    TREE, self.contexts_df
+                )
+            )
+        )
+        self.assertIn(
+            json.dumps(flat_tree.to_dict()),
+            craft_ai.pandas.utils.create_tree_html(flat_tree, "", "constant", None),
+        )
+
+    def test_create_time_features_same_as_time(self):
+        index = pd.date_range(
+            "2020-03-28 22:30", periods=12, freq="7H", tz="Europe/Paris"
+        )
+        for timezones in [None, ["+02:00", -5, "CET", "+0530"] * 3]:
+            time_features = create_time_features(index, timezones)
+            for i, timestamp in enumerate(index):
+                expected_time = Time(
+                    timestamp.value // 10 ** 9, timezones[i] if timezones else index.tz,
+                ).to_dict()
+                for key, values in time_features.items():
+                    self.assertEqual(values[i], expected_time[key])
+
+    def test_create_time_features_invalid_timezone(self):
+        index = pd.date_range("2020-01-01", periods=2, freq="H", tz="UTC")
+        self.assertRaises(
+            craft_ai.errors.CraftAiTimeError,
+            create_time_features,
+            index,
+            ["+02:00", "foo"],
+        )
+
+    def test_create_timezone_df_same_as_strftime(self):
+        for tz in ["Europe/Paris", None]:
+            df = pd.DataFrame(
+                {"a": range(12)},
+                index=pd.date_range("2020-03-28 22:30", periods=12, freq="7H", tz=tz),
+            )
+            timezone_df = create_timezone_df(df, "timezone")
+            self.assertEqual(
+                timezone_df["timezone"].tolist(), df.index.strftime("%z").tolist()
+            )
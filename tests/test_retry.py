@@ -0,0 +1,145 @@
+import datetime
+
+import unittest
+
+from email.utils import format_datetime
+from unittest import mock
+
+from craft_ai import Client, RetryPolicy, errors as craft_err
+from craft_ai.retry import parse_retry_after
+
+from .test_compiled_tree import SIMPLE_TREE
+from .utils import OFFLINE_CFG, fake_response
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=0.5, max_backoff=3, jitter=False)
+
+        self.assertEqual(
+            [policy.backoff(attempt) for attempt in range(1, 6)], [0.5, 1, 2, 3, 3]
+        )
+        self.assertEqual(policy.backoff(1, "10"), 10)
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff_factor=1)
+
+        for _ in range(100):
+            self.assertTrue(1 <= policy.backoff(2) <= 2)
+
+    def test_should_retry_status(self):
+        policy = RetryPolicy(max_attempts=3, status_rules={503: 2, 500: 4})
+
+        self.assertTrue(policy.should_retry_status(503, 1))
+        self.assertFalse(policy.should_retry_status(503, 2))
+        self.assertTrue(policy.should_retry_status(500, 3))
+        self.assertFalse(policy.should_retry_status(429, 1))
+        self.assertTrue(RetryPolicy().should_retry_status(429, 1))
+
+    def test_should_retry_error(self):
+        policy = RetryPolicy(max_attempts=2)
+
+        self.assertTrue(policy.should_retry_error("GET", 1))
+        self.assertTrue(policy.should_retry_error("delete", 1))
+        self.assertFalse(policy.should_retry_error("GET", 2))
+        # The request could have been processed
+        self.assertFalse(policy.should_retry_error("POST", 1))
+
+    def test_parse_retry_after(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(parse_retry_after("2"), 2)
+        self.assertEqual(parse_retry_after("-2"), 0)
+
+        date = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=60
+        )
+        self.assertTrue(
+            50 < parse_retry_after(format_datetime(date, usegmt=True)) <= 60
+        )
+
+
+@mock.patch("time.sleep")
+class TestClientRetries(unittest.TestCase):
+    def client(self, **cfg):
+        client = Client({**OFFLINE_CFG, **cfg})
+        self.request = mock.patch.object(client._requests_session, "request").start()
+        self.addCleanup(mock.patch.stopall)
+        return client
+
+    def test_retry_status(self, sleep):
+        client = self.client(retryPolicy=RetryPolicy(jitter=False))
+        self.request.side_effect = [
+            fake_response(503),
+            fake_response(200, {"id": "agent"}),
+        ]
+
+        self.assertEqual(client.get_agent("agent"), {"id": "agent"})
+        self.assertEqual(self.request.call_count, 2)
+        sleep.assert_called_once_with(0.5)
+
+    def test_retry_post(self, sleep):
+        client = self.client()
+        self.request.side_effect = [fake_response(429), fake_response(201, {})]
+
+        client.create_agent({}, "agent")
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_max_attempts(self, sleep):
+        client = self.client(retryPolicy=RetryPolicy(max_attempts=4, jitter=False))
+        self.request.side_effect = lambda *args, **kwargs: fake_response(503)
+
+        self.assertRaises(craft_err.CraftAiNetworkError, client.get_agent, "agent")
+        self.assertEqual(self.request.call_count, 4)
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [0.5, 1, 2])
+
+    def test_no_retries(self, sleep):
+        client = self.client(retryPolicy=None)
+        self.request.side_effect = [fake_response(429), fake_response(200, {})]
+
+        self.assertRaises(craft_err.CraftAiUnknownError, client.get_agent, "agent")
+        self.assertEqual(self.request.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_retry_after_date(self, sleep):
+        client = self.client()
+        retry_after = format_datetime(
+            datetime.datetime.now(datetime.timezone.utc)
+            + datetime.timedelta(seconds=30),
+            usegmt=True,
+        )
+        self.request.side_effect = [
+            fake_response(503, headers={"Retry-After": retry_after}),
+            fake_response(200, {}),
+        ]
+
+        client.get_agent("agent")
+        self.assertTrue(28 <= sleep.call_args[0][0] <= 30)
+
+    def test_decision_tree_being_computed(self, sleep):
+        client = self.client(retryPolicy=RetryPolicy(jitter=False))
+        self.request.side_effect = [
+            fake_response(202, {"message": "computing"}),
+            fake_response(202, {"message": "computing"}, {"Retry-After": "3"}),
+            fake_response(200, SIMPLE_TREE),
+        ]
+
+        self.assertEqual(client.get_agent_decision_tree("agent"), SIMPLE_TREE)
+        self.assertEqual(self.request.call_count, 3)
+        # The backoff of the policy, then the delay given by the response
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [0.5, 3])
+
+    def test_decision_tree_retrieval_timeout(self, sleep):
+        client = self.client(
+            retryPolicy=RetryPolicy(jitter=False), decisionTreeRetrievalTimeout=1200
+        )
+        self.request.side_effect = lambda *args, **kwargs: fake_response(202, {})
+
+        self.assertRaises(
+            craft_err.CraftAiLongRequestTimeOutError,
+            client.get_agent_decision_tree,
+            "agent",
+        )
+        # No time passes while sleeping, waiting 2 seconds would exceed the
+        # timeout
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [0.5, 1])
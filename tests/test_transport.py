@@ -0,0 +1,39 @@
+import pickle
+import socket
+
+import unittest
+
+from craft_ai.transport import TransportAdapter
+
+
+class TestTransportAdapter(unittest.TestCase):
+    def test_tcp_keep_alive(self):
+        adapter = TransportAdapter(tcp_keep_alive_idle=30, pool_maxsize=4)
+
+        socket_options = adapter.poolmanager.connection_pool_kw["socket_options"]
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), socket_options)
+        self.assertIn((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), socket_options)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30), socket_options)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"], 4)
+
+    def test_tcp_keep_alive_through_proxy(self):
+        adapter = TransportAdapter(tcp_keep_alive_idle=30)
+
+        manager = adapter.proxy_manager_for("http://localhost:3128")
+        self.assertIn(
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            manager.connection_pool_kw["socket_options"],
+        )
+
+    def test_default_socket_options(self):
+        adapter = TransportAdapter(max_retries=2)
+
+        self.assertNotIn("socket_options", adapter.poolmanager.connection_pool_kw)
+        self.assertEqual(adapter.max_retries.total, 2)
+
+    def test_pickle(self):
+        adapter = pickle.loads(pickle.dumps(TransportAdapter(tcp_keep_alive_idle=30)))
+
+        self.assertEqual(adapter.tcp_keep_alive_idle, 30)
+        self.assertIn("socket_options", adapter.poolmanager.connection_pool_kw)
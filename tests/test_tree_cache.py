@@ -0,0 +1,80 @@
+import json
+import time
+
+import unittest
+
+from craft_ai import TreeCache
+
+from .test_compiled_tree import SIMPLE_TREE
+
+
+class TestTreeCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = TreeCache()
+
+        self.assertIsNone(cache.get("agent"))
+        cache.set(SIMPLE_TREE, "agent")
+        self.assertIs(cache.get("agent"), SIMPLE_TREE)
+        self.assertIsNone(cache.get("agent", 1234))
+        self.assertIsNone(cache.get("agent", version=1))
+        self.assertIsNone(cache.get("agent", entity_type="generator"))
+        self.assertEqual(
+            cache.stats(),
+            {"hits": 1, "misses": 4, "evictions": 0, "entries": 1, "bytes": 0},
+        )
+
+    def test_max_entries(self):
+        cache = TreeCache(max_entries=2)
+        cache.set(SIMPLE_TREE, "agent", 1)
+        cache.set(SIMPLE_TREE, "agent", 2)
+        # Uses the tree at 1 so that the tree at 2 is the least recently used
+        cache.get("agent", 1)
+        cache.set(SIMPLE_TREE, "agent", 3)
+
+        self.assertIsNotNone(cache.get("agent", 1))
+        self.assertIsNone(cache.get("agent", 2))
+        self.assertIsNotNone(cache.get("agent", 3))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_max_bytes(self):
+        tree_size = len(json.dumps(SIMPLE_TREE))
+        cache = TreeCache(max_bytes=2 * tree_size)
+        for timestamp in range(3):
+            cache.set(SIMPLE_TREE, "agent", timestamp)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["bytes"], 2 * tree_size)
+        self.assertIsNone(cache.get("agent", 0))
+
+        # A tree bigger than the whole cache is not cached
+        small_cache = TreeCache(max_bytes=tree_size - 1)
+        small_cache.set(SIMPLE_TREE, "agent")
+        self.assertEqual(len(small_cache), 0)
+
+    def test_ttl(self):
+        cache = TreeCache(ttl=0.05)
+        cache.set(SIMPLE_TREE, "agent")
+        cache.set(SIMPLE_TREE, "agent", 1234)
+
+        self.assertIsNotNone(cache.get("agent"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("agent"))
+        # The tree at an explicit timestamp doesn't expire
+        self.assertIsNotNone(cache.get("agent", 1234))
+
+    def test_invalidate(self):
+        cache = TreeCache()
+        for entity_id in ["agent1", "agent2"]:
+            cache.set(SIMPLE_TREE, entity_id)
+            cache.set(SIMPLE_TREE, entity_id, 1234)
+        cache.set(SIMPLE_TREE, "agent1", entity_type="generator")
+
+        self.assertEqual(cache.invalidate("agent1", latest_only=True), 1)
+        self.assertIsNone(cache.get("agent1"))
+        self.assertIsNotNone(cache.get("agent1", 1234))
+        self.assertIsNotNone(cache.get("agent1", entity_type="generator"))
+
+        self.assertEqual(cache.invalidate("agent2"), 2)
+        self.assertEqual(cache.invalidate(), 2)
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import unittest
+
+from craft_ai import TreeStore
+from craft_ai.tree_store import INDEX_COMPACTION_FACTOR, INDEX_FILENAME
+
+from .test_compiled_tree import SIMPLE_TREE
+
+
+class TestTreeStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_set(self):
+        store = TreeStore(self.directory)
+
+        self.assertIsNone(store.get("agent"))
+        store.set(SIMPLE_TREE, "agent")
+        self.assertEqual(store.get("agent"), SIMPLE_TREE)
+        self.assertIsNone(store.get("agent", version=1))
+        self.assertIsNone(store.get("agent", entity_type="generator"))
+        self.assertEqual(
+            store.stats(),
+            {"hits": 1, "misses": 3, "refreshes": 0, "refresh_errors": 0, "entries": 1},
+        )
+
+    def test_persistence(self):
+        store = TreeStore(self.directory)
+        store.set(SIMPLE_TREE, "agent1")
+        store.set(SIMPLE_TREE, "agent2", version=1)
+        store.set(SIMPLE_TREE, "generator", entity_type="generator")
+        self.assertEqual(store.remove("agent1"), 1)
+        # A partially written line of the index is ignored
+        with open(os.path.join(self.directory, "index.jsonl"), "a") as index_file:
+            index_file.write('{"entity_type": "agent", "enti')
+
+        store = TreeStore(self.directory)
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get("agent1"))
+        self.assertEqual(store.get("agent2", version="1"), SIMPLE_TREE)
+        self.assertEqual(store.get("generator", entity_type="generator"), SIMPLE_TREE)
+
+    def test_missing_file(self):
+        store = TreeStore(self.directory)
+        store.set(SIMPLE_TREE, "agent")
+        os.remove(os.path.join(self.directory, "agent-agent-v2.json.gz"))
+
+        self.assertIsNone(store.get("agent"))
+
+    def test_refresh(self):
+        store = TreeStore(self.directory, refresh_interval=0)
+        store.set(SIMPLE_TREE, "agent")
+        refreshed_tree = {**SIMPLE_TREE, "_version": "2.0.1"}
+        can_return = threading.Event()
+
+        def get_decision_tree():
+            can_return.wait()
+            return refreshed_tree
+
+        refreshed_trees = []
+        future = store.refresh(
+            get_decision_tree, "agent", on_refresh=refreshed_trees.append
+        )
+        # The tree is refreshed only once at a time
+        self.assertIsNone(store.refresh(get_decision_tree, "agent"))
+        self.assertEqual(store.get("agent"), SIMPLE_TREE)
+        can_return.set()
+
+        self.assertEqual(future.result(), refreshed_tree)
+        self.assertEqual(refreshed_trees, [refreshed_tree])
+        self.assertEqual(store.get("agent"), refreshed_tree)
+        self.assertEqual(store.stats()["refreshes"], 1)
+
+    def test_refresh_error(self):
+        store = TreeStore(self.directory, refresh_interval=0)
+        store.set(SIMPLE_TREE, "agent")
+
+        def get_decision_tree():
+            raise ValueError()
+
+        future = store.refresh(get_decision_tree, "agent")
+        self.assertRaises(ValueError, future.result)
+        store.wait_for_refreshes()
+        self.assertEqual(store.get("agent"), SIMPLE_TREE)
+        self.assertEqual(store.stats()["refresh_errors"], 1)
+
+    def test_refresh_interval(self):
+        store = TreeStore(self.directory, refresh_interval=3600)
+        store.set(SIMPLE_TREE, "agent")
+        downloads = []
+
+        def get_decision_tree():
+            downloads.append(1)
+            return SIMPLE_TREE
+
+        # A tree stored recently isn't downloaded again on each read
+        for _ in range(3):
+            self.assertEqual(store.get("agent"), SIMPLE_TREE)
+            self.assertIsNone(store.refresh(get_decision_tree, "agent"))
+        self.assertEqual(downloads, [])
+
+        # Nor once refreshed, the refresh time being kept in the index
+        store = TreeStore(self.directory, refresh_interval=0)
+        store.refresh(get_decision_tree, "agent").result()
+        store = TreeStore(self.directory, refresh_interval=3600)
+        self.assertIsNone(store.refresh(get_decision_tree, "agent"))
+        self.assertEqual(downloads, [1])
+
+    def test_start_end_refresh(self):
+        store = TreeStore(self.directory, refresh_interval=0)
+        store.set(SIMPLE_TREE, "agent")
+
+        self.assertTrue(store.start_refresh("agent"))
+        self.assertFalse(store.start_refresh("agent"))
+        store.end_refresh("agent", succeeded=False)
+        self.assertTrue(store.start_refresh("agent"))
+        store.end_refresh("agent")
+        self.assertEqual(
+            (store.stats()["refreshes"], store.stats()["refresh_errors"]), (1, 1)
+        )
+
+    def test_index_compaction(self):
+        store = TreeStore(self.directory, refresh_interval=0)
+        store.set(SIMPLE_TREE, "agent")
+        store.set(SIMPLE_TREE, "other_agent")
+
+        for _ in range(100):
+            store.start_refresh("agent")
+            store.end_refresh("agent")
+
+        with open(os.path.join(self.directory, INDEX_FILENAME)) as index_file:
+            lines = index_file.readlines()
+        self.assertLessEqual(len(lines), INDEX_COMPACTION_FACTOR * 2)
+        store = TreeStore(self.directory)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get("agent"), SIMPLE_TREE)
@@ -1,9 +1,23 @@
+import json
+
 from os import environ
 
+import requests
+
+from .test_jwt_decode import JWT_IO_EXAMPLE
+
 JOB_ID = environ.get("TRAVIS_JOB_ID", "loc")
 ENTITY_MAX_LEN = 36
 BASE_NAME_MAX_LEN = ENTITY_MAX_LEN - 3 - 3 - 2
 
+# Configuration of the clients whose requests aren't sent to craft ai
+OFFLINE_CFG = {
+    "token": JWT_IO_EXAMPLE,
+    "owner": "owner",
+    "project": "project",
+    "url": "https://craft.ai",
+}
+
 counters = {}
 
 
@@ -14,3 +28,12 @@ def generate_entity_id(base_name="entity"):
     counter += 1
     counters[base_name] = counter
     return "{}_{:03}_{}".format(base_name, counter, JOB_ID[-3:])
+
+
+def fake_response(status_code, body=None, headers=None):
+    """Gives a response of the session of a client, with a json body."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b"" if body is None else json.dumps(body).encode("utf-8")
+    response.headers.update(headers or {})
+    return response